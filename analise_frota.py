@@ -0,0 +1,343 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional
+from analise_tempo import (COLUNAS_ANALISE, PARES_EVENTOS_CONSECUTIVOS, LIMIAR_LOG_NS, _grupos_log_pos_igf,
+                           converter_data_hora, ler_csv_decodificado, ler_parquet_decodificado)
+from metricas_gt06 import debug
+
+# Intervalos esperados dos detectores de analisar_intervalos_tempo: (tipo, referência, segundos)
+INTERVALOS_ESPERADOS = {
+    'Anomalias_Posicionamento': ('Posicionamento por tempo em movimento', 'IGN', 180),
+    'Anomalias_Modo_Eco': ('Modo econômico', 'IGF', 3600),
+}
+
+def carregar_frota_csv(pasta_entrada: str, colunas: List[str] = COLUNAS_ANALISE) -> pd.DataFrame:
+    """
+    Junta os CSVs decodificados de uma pasta em uma única tabela por IMEI
+
+    Só as colunas usadas pelas análises são lidas, com os tipos de
+    ler_csv_decodificado, e o IMEI ausente vem do nome do arquivo.
+    """
+    partes = []
+    for arquivo in sorted(glob.glob(os.path.join(pasta_entrada, "*.csv"))):
+        df = ler_csv_decodificado(arquivo, colunas)
+
+        imei_arquivo = os.path.basename(arquivo).split('_')[0]
+        if 'IMEI' not in df.columns:
+            df['IMEI'] = imei_arquivo
+        elif df['IMEI'].hasnans:
+            df['IMEI'] = df['IMEI'].astype(object).fillna(imei_arquivo)
+        partes.append(df)
+        debug(f"✅ {os.path.basename(arquivo)}: {len(df)} registros")
+
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+
+    # Categorias diferentes entre arquivos viram object no concat; recodifica
+    frota = pd.concat(partes, ignore_index=True)
+    for coluna in ('IMEI', 'Tipo Mensagem'):
+        if coluna in frota.columns:
+            frota[coluna] = frota[coluna].astype('category')
+    return frota
+
+def carregar_frota_parquet(pasta_parquet: str, colunas: List[str] = COLUNAS_ANALISE) -> pd.DataFrame:
+    """Lê todas as partições da saída Parquet em uma única tabela por IMEI"""
+    frota = ler_parquet_decodificado(pasta_parquet, colunas=colunas)
+    frota['IMEI'] = frota['IMEI'].astype('category')
+    return frota
+
+def _contar(codigos: np.ndarray, mascara: np.ndarray, total_imeis: int) -> np.ndarray:
+    """Quantidade de linhas marcadas por IMEI (código da categoria)"""
+    return np.bincount(codigos[mascara], minlength=total_imeis)
+
+def _somar(codigos: np.ndarray, valores: np.ndarray, total_imeis: int) -> np.ndarray:
+    return np.bincount(codigos, weights=valores, minlength=total_imeis)
+
+def _hodometro_por_imei(df: pd.DataFrame, codigos: np.ndarray, total_imeis: int) -> Dict[str, np.ndarray]:
+    """
+    Primeiro/último KM válido (> 0) por data do evento e distância, como
+    calcular_distancia_hodometro, ignorando leituras sem data do evento
+    """
+    primeiro = np.full(total_imeis, np.nan)
+    ultimo = np.full(total_imeis, np.nan)
+
+    if 'Hodômetro Total' in df.columns:
+        # Sem data do evento não há como ordenar a leitura: fica de fora
+        hodometro = pd.to_numeric(df['Hodômetro Total'], errors='coerce').to_numpy()
+        validos = (hodometro > 0) & df['Data/Hora Evento'].notna().to_numpy()
+        registros = pd.DataFrame({
+            'codigo': codigos[validos],
+            'evento': df['Data/Hora Evento'].to_numpy()[validos],
+            'km': hodometro[validos],
+        }).sort_values(['codigo', 'evento'], kind='stable')
+
+        primeiros = registros.drop_duplicates('codigo', keep='first')
+        ultimos = registros.drop_duplicates('codigo', keep='last')
+        primeiro[primeiros['codigo'].to_numpy()] = primeiros['km'].to_numpy()
+        ultimo[ultimos['codigo'].to_numpy()] = ultimos['km'].to_numpy()
+
+    # Reset do hodômetro (último < primeiro): considera só o último valor
+    distancia = np.where(ultimo >= primeiro, ultimo - primeiro, ultimo)
+    return {'Primeiro_KM': primeiro, 'Ultimo_KM': ultimo, 'Distancia_KM': distancia}
+
+def _eventos_pares(df: pd.DataFrame) -> pd.DataFrame:
+    """Eventos dos pares IGN/IGF e de velocidade sem duplicatas, ordenados por IMEI e evento"""
+    pares = list(PARES_EVENTOS_CONSECUTIVOS['ignicao']) + list(PARES_EVENTOS_CONSECUTIVOS['velocidade'])
+    eventos = df[df['Tipo Mensagem'].isin(pares)]
+    duplicatas = eventos.duplicated(subset=['IMEI', 'Tipo Mensagem', 'Sequência', 'Data/Hora Evento'], keep='first')
+    return eventos[~duplicatas].sort_values(['IMEI', 'Data/Hora Evento'], kind='stable')
+
+def _viagens_por_imei(ignicao: pd.DataFrame, total_imeis: int) -> Dict[str, np.ndarray]:
+    """Pareamento IGN→IGF de _parear_viagens aplicado a todos os IMEIs de uma vez"""
+    codigos = ignicao['IMEI'].cat.codes.to_numpy()
+    tipos = ignicao['Tipo Mensagem'].to_numpy()
+    eventos = ignicao['Data/Hora Evento'].to_numpy(dtype='datetime64[ns]')
+
+    mesmo_imei = codigos[1:] == codigos[:-1]
+    eh_ign = tipos == 'IGN'
+    eh_igf = tipos == 'IGF'
+    proximo_igf = np.append(eh_igf[1:] & mesmo_imei, False)
+    anterior_ign = np.insert(eh_ign[:-1] & mesmo_imei, 0, False)
+
+    inicios = np.flatnonzero(eh_ign & proximo_igf)
+    duracoes = pd.Series(eventos[inicios + 1] - eventos[inicios]).dt.total_seconds().to_numpy() / 3600
+
+    return {
+        'Viagens_Completas': _contar(codigos, eh_ign & proximo_igf, total_imeis),
+        'IGN_Sem_IGF': _contar(codigos, eh_ign & ~proximo_igf, total_imeis),
+        'IGF_Sem_IGN': _contar(codigos, eh_igf & ~anterior_ign, total_imeis),
+        'Horas_Ignicao': _somar(codigos[inicios], np.nan_to_num(duracoes), total_imeis),
+    }
+
+def _consecutivos_por_imei(eventos: pd.DataFrame, total_imeis: int) -> np.ndarray:
+    """Repetições consecutivas (_eventos_consecutivos_ordenados) por IMEI"""
+    codigos = eventos['IMEI'].cat.codes.to_numpy()
+    tipos = eventos['Tipo Mensagem'].to_numpy()
+    sequencias = eventos['Sequência'].to_numpy()
+
+    repetidos = (tipos[:-1] == tipos[1:]) & (sequencias[:-1] != sequencias[1:]) & (codigos[:-1] == codigos[1:])
+    return _contar(codigos[:-1], repetidos, total_imeis)
+
+def _intervalos_por_imei(df: pd.DataFrame, codigos: np.ndarray, tipo_alvo: str, tipo_inicio: str,
+                         esperado_segundos: int, total_imeis: int) -> np.ndarray:
+    """
+    Anomalias de intervalo (_anomalias_intervalo) por IMEI: diferença para a
+    referência anterior do mesmo IMEI fora de esperado ±2s, em segundos inteiros
+    """
+    tipos = df['Tipo Mensagem']
+    posicoes = np.flatnonzero(tipos.isin([tipo_alvo, tipo_inicio]).to_numpy())
+    if len(posicoes) < 2:
+        return np.zeros(total_imeis, dtype=np.int64)
+
+    eventos = df['Data/Hora Evento'].to_numpy(dtype='datetime64[ns]')[posicoes]
+    atuais = posicoes[1:]
+    diffs = pd.Series(eventos[1:] - eventos[:-1]).dt.total_seconds().to_numpy()
+
+    medidos = ((tipos.to_numpy()[atuais] == tipo_alvo) & (codigos[atuais] == codigos[posicoes[:-1]])
+               & ~np.isnan(diffs))
+    fora = medidos & (np.abs(np.trunc(np.nan_to_num(diffs)) - esperado_segundos) > 2)
+    return _contar(codigos[atuais], fora, total_imeis)
+
+def analisar_frota(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Executa os detectores de analisar_dataframe para todos os IMEIs de uma vez
+
+    A tabela da frota é ordenada uma única vez por IMEI, inclusão e sequência;
+    cada detector roda como operação agrupada pelo código do IMEI, sem
+    separar um DataFrame por dispositivo.
+
+    Returns:
+        (por_imei, resumo): uma linha de indicadores por IMEI e o resumo da frota
+    """
+    df = converter_data_hora(df)
+    if not isinstance(df['IMEI'].dtype, pd.CategoricalDtype):
+        df = df.assign(IMEI=df['IMEI'].astype(str).astype('category'))
+
+    df = df.sort_values(['IMEI', 'Data/Hora Inclusão', 'Sequência'], ignore_index=True)
+    df['IMEI'] = df['IMEI'].cat.remove_unused_categories()
+    imeis = df['IMEI'].cat.categories
+    total_imeis = len(imeis)
+    codigos = df['IMEI'].cat.codes.to_numpy()
+
+    inclusao = df['Data/Hora Inclusão']
+    evento = df['Data/Hora Evento']
+    tipos = df['Tipo Mensagem'].to_numpy()
+    mesmo_imei = codigos[1:] == codigos[:-1]
+    inicio_imei = np.insert(~mesmo_imei, 0, True)
+
+    por_imei = pd.DataFrame({'IMEI': imeis.astype(str)})
+    por_imei['Registros'] = np.bincount(codigos, minlength=total_imeis)
+    por_imei['Inicio'] = evento.groupby(codigos).min().reindex(range(total_imeis)).to_numpy()
+    por_imei['Fim'] = evento.groupby(codigos).max().reindex(range(total_imeis)).to_numpy()
+    dias = pd.DataFrame({'codigo': codigos, 'dia': evento.dt.normalize()}).dropna().drop_duplicates()
+    por_imei['Dias_Com_Dados'] = np.bincount(dias['codigo'].to_numpy(), minlength=total_imeis)
+
+    for coluna, valores in _hodometro_por_imei(df, codigos, total_imeis).items():
+        por_imei[coluna] = valores
+
+    # Viagens e eventos consecutivos: pares deduplicados e ordenados por evento dentro do IMEI
+    pares = _eventos_pares(df)
+    ignicao = pares[pares['Tipo Mensagem'].isin(PARES_EVENTOS_CONSECUTIVOS['ignicao'])]
+    velocidade = pares[pares['Tipo Mensagem'].isin(PARES_EVENTOS_CONSECUTIVOS['velocidade'])]
+    for coluna, valores in _viagens_por_imei(ignicao, total_imeis).items():
+        por_imei[coluna] = valores
+    por_imei['Anomalias_Ignicao'] = _consecutivos_por_imei(ignicao, total_imeis)
+    por_imei['Anomalias_Velocidade'] = _consecutivos_por_imei(velocidade, total_imeis)
+
+    # Reboot: sequência caiu em relação à mensagem anterior do mesmo IMEI e voltou para ≤ 10
+    sequencias = df['Sequência'].to_numpy()
+    reboots = (sequencias[1:] < sequencias[:-1]) & (sequencias[1:] <= 10) & mesmo_imei
+    por_imei['Reboots'] = _contar(codigos[1:], reboots, total_imeis)
+
+    for coluna, (tipo_alvo, tipo_inicio, esperado) in INTERVALOS_ESPERADOS.items():
+        por_imei[coluna] = _intervalos_por_imei(df, codigos, tipo_alvo, tipo_inicio, esperado, total_imeis)
+
+    # Modo LOG: incidência geral e grupos após IGF, sem atravessar a troca de IMEI
+    diff_ns = (inclusao - evento).to_numpy(dtype='timedelta64[ns]').astype(np.int64)
+    validos = (inclusao.notna() & evento.notna()).to_numpy()
+    em_log = validos & (diff_ns > LIMIAR_LOG_NS)
+    por_imei['Registros_Com_Datas'] = _contar(codigos, validos, total_imeis)
+    por_imei['Mensagens_LOG'] = _contar(codigos, em_log, total_imeis)
+    por_imei['Percentual_LOG'] = 100 * por_imei['Mensagens_LOG'] / np.maximum(por_imei['Registros_Com_Datas'], 1)
+
+    if len(df):
+        membros, trecho, _ = _grupos_log_pos_igf(diff_ns, validos, tipos == 'IGF', inicio_imei)
+        grupos = pd.DataFrame({'codigo': codigos[membros], 'trecho': trecho[membros]}).drop_duplicates()
+        por_imei['Grupos_LOG_Pos_IGF'] = np.bincount(grupos['codigo'].to_numpy(), minlength=total_imeis)
+        por_imei['Mensagens_LOG_Pos_IGF'] = _contar(codigos, membros, total_imeis)
+    else:
+        por_imei['Grupos_LOG_Pos_IGF'] = 0
+        por_imei['Mensagens_LOG_Pos_IGF'] = 0
+
+    dias_com_dados = np.maximum(por_imei['Dias_Com_Dados'], 1)
+    por_imei['Viagens_Por_Dia'] = por_imei['Viagens_Completas'] / dias_com_dados
+    por_imei['Reboots_Por_Dia'] = por_imei['Reboots'] / dias_com_dados
+
+    return por_imei, resumir_frota(por_imei)
+
+def resumir_frota(por_imei: pd.DataFrame) -> Dict:
+    """Indicadores da frota a partir das linhas por IMEI"""
+    dias_dispositivo = int(por_imei['Dias_Com_Dados'].sum())
+    com_datas = int(por_imei['Registros_Com_Datas'].sum())
+
+    return {
+        'total_imeis': len(por_imei),
+        'total_registros': int(por_imei['Registros'].sum()),
+        'inicio': por_imei['Inicio'].min(),
+        'fim': por_imei['Fim'].max(),
+        'dias_dispositivo': dias_dispositivo,
+        'distancia_total_km': float(np.nansum(por_imei['Distancia_KM'])),
+        'imeis_sem_hodometro': int(por_imei['Distancia_KM'].isna().sum()),
+        'viagens_completas': int(por_imei['Viagens_Completas'].sum()),
+        'horas_ignicao': float(por_imei['Horas_Ignicao'].sum()),
+        'viagens_por_dia': float(por_imei['Viagens_Completas'].sum() / max(dias_dispositivo, 1)),
+        'ign_sem_igf': int(por_imei['IGN_Sem_IGF'].sum()),
+        'igf_sem_ign': int(por_imei['IGF_Sem_IGN'].sum()),
+        'reboots': int(por_imei['Reboots'].sum()),
+        'reboots_por_dia': float(por_imei['Reboots'].sum() / max(dias_dispositivo, 1)),
+        'imeis_com_reboot': int((por_imei['Reboots'] > 0).sum()),
+        'anomalias_posicionamento': int(por_imei['Anomalias_Posicionamento'].sum()),
+        'anomalias_modo_eco': int(por_imei['Anomalias_Modo_Eco'].sum()),
+        'anomalias_ignicao': int(por_imei['Anomalias_Ignicao'].sum()),
+        'anomalias_velocidade': int(por_imei['Anomalias_Velocidade'].sum()),
+        'mensagens_log': int(por_imei['Mensagens_LOG'].sum()),
+        'percentual_log': float(100 * por_imei['Mensagens_LOG'].sum() / com_datas) if com_datas else 0.0,
+        'grupos_log_pos_igf': int(por_imei['Grupos_LOG_Pos_IGF'].sum()),
+        'imeis_com_log_pos_igf': int((por_imei['Grupos_LOG_Pos_IGF'] > 0).sum()),
+    }
+
+def montar_relatorio_frota(resumo: Dict, por_imei: pd.DataFrame, destaques: int = 10) -> List[str]:
+    """Linhas do relatório TXT da frota, com os IMEIs de maior incidência em cada indicador"""
+    relatorio_txt = []
+    relatorio_txt.append("="*100)
+    relatorio_txt.append("🚚 RELATÓRIO DA FROTA")
+    relatorio_txt.append("="*100)
+
+    relatorio_txt.append(f"📊 RESUMO GERAL:")
+    relatorio_txt.append(f"   📟 IMEIs: {resumo['total_imeis']}")
+    relatorio_txt.append(f"   📁 Total de Registros: {resumo['total_registros']}")
+    relatorio_txt.append(f"   📅 Período: {resumo['inicio']} até {resumo['fim']}")
+    relatorio_txt.append(f"   🗓️ Dias-dispositivo com dados: {resumo['dias_dispositivo']}")
+
+    relatorio_txt.append(f"\n🚗 HODÔMETRO E VIAGENS:")
+    relatorio_txt.append(f"   📏 Distância total: {resumo['distancia_total_km']:.2f} km "
+                         f"({resumo['imeis_sem_hodometro']} IMEIs sem hodômetro válido)")
+    relatorio_txt.append(f"   ✅ Viagens completas (IGN→IGF): {resumo['viagens_completas']} "
+                         f"({resumo['viagens_por_dia']:.2f} por dia-dispositivo)")
+    relatorio_txt.append(f"   ⏱️ Horas de ignição nas viagens: {resumo['horas_ignicao']:.1f} h")
+    relatorio_txt.append(f"   🔴 IGN sem IGF correspondente: {resumo['ign_sem_igf']}")
+    relatorio_txt.append(f"   🟠 IGF sem IGN anterior: {resumo['igf_sem_ign']}")
+
+    relatorio_txt.append(f"\n🔄 REBOOTS:")
+    relatorio_txt.append(f"   🔢 Total: {resumo['reboots']} ({resumo['reboots_por_dia']:.3f} por dia-dispositivo, "
+                         f"{resumo['imeis_com_reboot']} IMEIs)")
+
+    relatorio_txt.append(f"\n⏰ ANOMALIAS:")
+    relatorio_txt.append(f"   🎯 Posicionamento (esperado 3min ±2s): {resumo['anomalias_posicionamento']}")
+    relatorio_txt.append(f"   💤 Modo Econômico (esperado 1h ±2s): {resumo['anomalias_modo_eco']}")
+    relatorio_txt.append(f"   🔑 Ignição consecutiva: {resumo['anomalias_ignicao']}")
+    relatorio_txt.append(f"   🏎️ Velocidade consecutiva: {resumo['anomalias_velocidade']}")
+
+    relatorio_txt.append(f"\n📝 MODO LOG:")
+    relatorio_txt.append(f"   📈 Mensagens em LOG: {resumo['mensagens_log']} ({resumo['percentual_log']:.2f}%)")
+    relatorio_txt.append(f"   🚨 Grupos em LOG após IGF: {resumo['grupos_log_pos_igf']} "
+                         f"({resumo['imeis_com_log_pos_igf']} IMEIs)")
+
+    for titulo, coluna in (("MAIOR DISTÂNCIA (km)", 'Distancia_KM'), ("MAIS REBOOTS", 'Reboots'),
+                           ("MAIOR PERCENTUAL EM LOG", 'Percentual_LOG'),
+                           ("MAIS GRUPOS EM LOG APÓS IGF", 'Grupos_LOG_Pos_IGF')):
+        maiores = por_imei.nlargest(destaques, coluna)
+        maiores = maiores[maiores[coluna] > 0]
+        if maiores.empty:
+            continue
+        relatorio_txt.append(f"\n🏆 {titulo}:")
+        for i, (imei, valor) in enumerate(zip(maiores['IMEI'], maiores[coluna]), 1):
+            relatorio_txt.append(f"   {i:2d}. {imei}: {valor:.2f}" if isinstance(valor, float) else f"   {i:2d}. {imei}: {valor}")
+
+    relatorio_txt.append("="*100)
+    return relatorio_txt
+
+def salvar_analise_frota(resumo: Dict, por_imei: pd.DataFrame, pasta_saida: str):
+    """Grava frota_resumo.txt e frota_por_imei.csv na pasta de saída"""
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    txt_output = os.path.join(pasta_saida, "frota_resumo.txt")
+    with open(txt_output, "w", encoding="utf-8") as f:
+        f.write("\n".join(montar_relatorio_frota(resumo, por_imei)))
+    debug(f"💾 Relatório da frota salvo: {txt_output}")
+
+    csv_output = os.path.join(pasta_saida, "frota_por_imei.csv")
+    por_imei.to_csv(csv_output, sep=",", index=False)
+    debug(f"💾 Indicadores por IMEI salvos: {csv_output}")
+
+def processar_frota(pasta_entrada: str, pasta_saida: str = "analises", parquet: bool = False) -> Optional[Dict]:
+    """
+    Analisa a frota inteira de uma vez e grava o resumo e as linhas por IMEI
+
+    Args:
+        pasta_entrada: pasta com os *_decoded.csv ou, com parquet=True, a
+            saída Parquet particionada por IMEI e data
+        pasta_saida: pasta onde serão salvos frota_resumo.txt e frota_por_imei.csv
+
+    Returns:
+        dict: resumo da frota, ou None se não houver dados
+    """
+    if not os.path.isdir(pasta_entrada):
+        print(f"❌ Pasta não encontrada: {pasta_entrada}")
+        return None
+
+    df = carregar_frota_parquet(pasta_entrada) if parquet else carregar_frota_csv(pasta_entrada)
+    if df.empty:
+        print(f"❌ Nenhum registro encontrado em: {pasta_entrada}")
+        return None
+
+    por_imei, resumo = analisar_frota(df)
+    salvar_analise_frota(resumo, por_imei, pasta_saida)
+    print(f"✅ Frota analisada: {resumo['total_imeis']} IMEIs, {resumo['total_registros']} registros")
+    return resumo
+
+
+if __name__ == "__main__":
+    processar_frota("Decoder_GT06/decoded", "Decoder_GT06/analises")
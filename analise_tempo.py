@@ -1,8 +1,68 @@
 import pandas as pd
+import numpy as np
 import os
 from typing import Dict, List, Tuple, Optional
 from datetime import timedelta
 import glob
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from metricas_gt06 import debug
+from datas_gt06 import FORMATO_DATA_HORA, converter_coluna, datas_invalidas
+from parquet_gt06 import PARTICAO_INVALIDA
+
+# pyarrow é opcional: necessário apenas para ler a saída em Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+# Colunas usadas pelas análises; as demais não precisam ser lidas do Parquet
+COLUNAS_ANALISE = ['Data/Hora Inclusão', 'Data/Hora Evento', 'IMEI', 'Sequência', 'Tipo Mensagem', 'Hodômetro Total']
+
+COLUNAS_DATA_HORA = ['Data/Hora Inclusão', 'Data/Hora Evento']
+
+# Tipos do CSV decodificado usados por ler_csv_decodificado. Textos e códigos
+# com poucos valores distintos viram category; os inteiros usam o menor tipo
+# que comporta o campo do protocolo (nullable, pois ficam vazios nas mensagens
+# que não os trazem). Latitude/Longitude ficam em float64: float32 tem ~7
+# dígitos significativos e perderia a 6ª casa decimal gravada pelo decoder.
+TIPOS_DECODED = {
+    'IMEI': 'category',
+    'Sequência': 'UInt16',
+    'Tipo Mensagem': 'category',
+    'Tipo Dispositivo': 'category',
+    'Versão Protocolo': 'category',
+    'Versão Firmware': 'category',
+    'Bateria interna interna': 'category',
+    'Analog Input Status': 'UInt8',
+    'Satélites': 'UInt8',
+    'Velocidade': 'UInt8',
+    'Azimuth': 'UInt16',
+    'MCC': 'category',
+    'MNC': 'category',
+    'LAC': 'category',
+    'Cell ID': 'category',
+    'Realtime positioning': 'UInt8',
+    'GPS valido': 'UInt8',
+    'Tipo de Rede': 'category',
+    'Qualidade do sinal de GSM': 'category',
+    'Terminal information': 'category',
+    'Carregamento': 'category',
+    'Funcionamento': 'category',
+    'Alarmes internos': 'category',
+    'Rastramento': 'category',
+    'Gás/Oléo': 'category',
+}
+
+# Sufixos ":MM:SS" indexados pelo resto em segundos dentro da hora
+_MINUTOS_SEGUNDOS = np.array([f":{m:02}:{s:02}" for m in range(60) for s in range(60)], dtype=object)
+
+# Diferença inclusão - evento acima da qual a mensagem está em modo LOG (1 minuto, em ns)
+LIMIAR_LOG_NS = 60 * 10**9
 
 def format_timedelta(td):
     """Formata timedelta para HH:MM:SS"""
@@ -13,6 +73,35 @@ def format_timedelta(td):
     minutos, segundos = divmod(resto, 60)
     return f"{horas:02}:{minutos:02}:{segundos:02}"
 
+def converter_data_hora(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte para datetime as colunas de data/hora que ainda estão em texto
+    (datas_gt06.converter_coluna: formato detectado uma vez por coluna e
+    valores inválidos contados); se já estiverem convertidas, devolve o df
+    """
+    convertidas = {coluna: converter_coluna(df[coluna], coluna)
+                   for coluna in COLUNAS_DATA_HORA
+                   if coluna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[coluna])}
+    return df.assign(**convertidas) if convertidas else df
+
+def ler_csv_decodificado(caminho: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lê um CSV decodificado com os tipos de TIPOS_DECODED e as datas convertidas
+
+    colunas limita as colunas lidas (None lê todas); as demais análises
+    recebem o DataFrame já tipado e não convertem as datas de novo.
+    """
+    usecols = None if colunas is None else (lambda coluna: coluna.strip() in colunas)
+    df = pd.read_csv(caminho, sep=",", usecols=usecols, dtype=TIPOS_DECODED)
+    df.columns = df.columns.str.strip()
+    return converter_data_hora(df)
+
+def _texto_data_hora(valor):
+    """Data/hora no formato do CSV decodificado (milissegundos), para o relatório"""
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime(FORMATO_DATA_HORA)[:-3]
+    return valor
+
 def calcular_distancia_hodometro(df: pd.DataFrame) -> Dict:
     """Calcula a distância percorrida baseada no hodômetro"""
     resultado = {
@@ -25,17 +114,19 @@ def calcular_distancia_hodometro(df: pd.DataFrame) -> Dict:
     }
     
     if 'Hodômetro Total' not in df.columns:
-        print("⚠️ Coluna 'Hodômetro Total' não encontrada!")
+        debug("⚠️ Coluna 'Hodômetro Total' não encontrada!")
         return resultado
     
-    df_work = df.copy()
-    df_work['Hodômetro Total'] = pd.to_numeric(df_work['Hodômetro Total'], errors='coerce')
-    
-    registros_validos = df_work.dropna(subset=['Hodômetro Total'])
-    registros_validos = registros_validos[registros_validos['Hodômetro Total'] > 0]
+    # Trabalha só com as duas colunas usadas, sem copiar o DataFrame inteiro
+    hodometro = pd.to_numeric(df['Hodômetro Total'], errors='coerce')
+    validos = hodometro > 0
+    registros_validos = pd.DataFrame({
+        'Data/Hora Evento': df['Data/Hora Evento'][validos],
+        'Hodômetro Total': hodometro[validos],
+    })
     
     if len(registros_validos) == 0:
-        print("⚠️ Nenhum registro válido de hodômetro encontrado!")
+        debug("⚠️ Nenhum registro válido de hodômetro encontrado!")
         return resultado
     
     registros_validos = registros_validos.sort_values('Data/Hora Evento')
@@ -45,20 +136,28 @@ def calcular_distancia_hodometro(df: pd.DataFrame) -> Dict:
     
     resultado['primeiro_km'] = primeiro_registro['Hodômetro Total']
     resultado['ultimo_km'] = ultimo_registro['Hodômetro Total']
-    resultado['data_primeiro'] = primeiro_registro['Data/Hora Evento']
-    resultado['data_ultimo'] = ultimo_registro['Data/Hora Evento']
+    resultado['data_primeiro'] = _texto_data_hora(primeiro_registro['Data/Hora Evento'])
+    resultado['data_ultimo'] = _texto_data_hora(ultimo_registro['Data/Hora Evento'])
     resultado['total_registros_validos'] = len(registros_validos)
     
     if resultado['ultimo_km'] >= resultado['primeiro_km']:
         resultado['distancia_percorrida'] = resultado['ultimo_km'] - resultado['primeiro_km']
     else:
         resultado['distancia_percorrida'] = resultado['ultimo_km']
-        print(f"⚠️ Possível reset do hodômetro detectado (último < primeiro)")
+        debug(f"⚠️ Possível reset do hodômetro detectado (último < primeiro)")
     
     return resultado
 
 def contar_viagens(df: pd.DataFrame) -> Dict:
     """Conta viagens baseadas nos eventos IGN→IGF"""
+    df_ignicao = converter_data_hora(df[df['Tipo Mensagem'].isin(['IGN', 'IGF'])])
+    df_ignicao = remover_mensagens_duplicadas(df_ignicao)
+    df_ignicao = df_ignicao.sort_values('Data/Hora Evento').reset_index(drop=True)
+    
+    return _parear_viagens(df_ignicao)
+
+def _parear_viagens(df_ignicao: pd.DataFrame) -> Dict:
+    """Pareia IGN→IGF em eventos de ignição já deduplicados e ordenados por Data/Hora Evento"""
     resultado = {
         'total_viagens_completas': 0,
         'igf_sem_ign': 0,
@@ -68,122 +167,98 @@ def contar_viagens(df: pd.DataFrame) -> Dict:
         'ign_orfaos': []
     }
     
-    df_ignicao = df[df['Tipo Mensagem'].isin(['IGN', 'IGF'])].copy()
-    df_ignicao["Data/Hora Evento"] = pd.to_datetime(df_ignicao["Data/Hora Evento"], errors="coerce")
-    df_ignicao = remover_mensagens_duplicadas(df_ignicao)
-    df_ignicao = df_ignicao.sort_values('Data/Hora Evento').reset_index(drop=True)
-    
     if len(df_ignicao) == 0:
-        print("⚠️ Nenhum evento de ignição encontrado!")
+        debug("⚠️ Nenhum evento de ignição encontrado!")
         return resultado
     
-    print(f"🔍 Analisando {len(df_ignicao)} eventos de ignição...")
-    
-    i = 0
-    while i < len(df_ignicao):
-        evento_atual = df_ignicao.iloc[i]
-        
-        if evento_atual['Tipo Mensagem'] == 'IGN':
-            igf_encontrado = False
-            j = i + 1
-            
-            while j < len(df_ignicao):
-                proximo_evento = df_ignicao.iloc[j]
-                
-                if proximo_evento['Tipo Mensagem'] == 'IGF':
-                    resultado['total_viagens_completas'] += 1
-                    duracao = proximo_evento['Data/Hora Evento'] - evento_atual['Data/Hora Evento']
-                    
-                    resultado['detalhes_viagens'].append({
-                        'viagem_numero': resultado['total_viagens_completas'],
-                        'ignicao_ligada': evento_atual['Data/Hora Evento'],
-                        'ignicao_desligada': proximo_evento['Data/Hora Evento'],
-                        'duracao': duracao,
-                        'duracao_formatada': format_timedelta(duracao),
-                        'sequencia_ign': evento_atual['Sequência'],
-                        'sequencia_igf': proximo_evento['Sequência']
-                    })
-                    
-                    igf_encontrado = True
-                    i = j + 1
-                    break
-                    
-                elif proximo_evento['Tipo Mensagem'] == 'IGN':
-                    break
-                    
-                j += 1
-            
-            if not igf_encontrado:
-                resultado['ign_sem_igf'] += 1
-                resultado['ign_orfaos'].append({
-                    'data_hora': evento_atual['Data/Hora Evento'],
-                    'sequencia': evento_atual['Sequência'],
-                    'status': 'IGN sem IGF correspondente'
-                })
-                i += 1
-        
-        elif evento_atual['Tipo Mensagem'] == 'IGF':
-            resultado['igf_sem_ign'] += 1
-            resultado['igf_orfaos'].append({
-                'data_hora': evento_atual['Data/Hora Evento'],
-                'sequencia': evento_atual['Sequência'],
-                'status': 'IGF sem IGN anterior'
-            })
-            i += 1
-        
-        else:
-            i += 1
+    debug(f"🔍 Analisando {len(df_ignicao)} eventos de ignição...")
+    
+    # Só há IGN/IGF na sequência ordenada, então um IGN fecha viagem apenas
+    # com o IGF imediatamente seguinte; os demais eventos ficam órfãos
+    tipos = df_ignicao['Tipo Mensagem'].to_numpy()
+    eh_ign = tipos == 'IGN'
+    eh_igf = tipos == 'IGF'
+    proximo_igf = np.append(eh_igf[1:], False)
+    anterior_ign = np.insert(eh_ign[:-1], 0, False)
+    
+    inicios = np.flatnonzero(eh_ign & proximo_igf)
+    ign_orfaos = np.flatnonzero(eh_ign & ~proximo_igf)
+    igf_orfaos = np.flatnonzero(eh_igf & ~anterior_ign)
+    
+    eventos = df_ignicao['Data/Hora Evento']
+    sequencias = df_ignicao['Sequência'].to_numpy()
+    
+    duracoes = eventos.iloc[inicios + 1].reset_index(drop=True) - eventos.iloc[inicios].reset_index(drop=True)
+    duracoes_formatadas = format_timedelta_series(duracoes)
+    
+    for numero, (i, duracao, duracao_formatada) in enumerate(zip(inicios, duracoes, duracoes_formatadas), 1):
+        resultado['detalhes_viagens'].append({
+            'viagem_numero': numero,
+            'ignicao_ligada': eventos.iloc[i],
+            'ignicao_desligada': eventos.iloc[i + 1],
+            'duracao': duracao,
+            'duracao_formatada': duracao_formatada,
+            'sequencia_ign': sequencias[i],
+            'sequencia_igf': sequencias[i + 1]
+        })
+    resultado['total_viagens_completas'] = len(inicios)
+    
+    for i in ign_orfaos:
+        resultado['ign_orfaos'].append({
+            'data_hora': eventos.iloc[i],
+            'sequencia': sequencias[i],
+            'status': 'IGN sem IGF correspondente'
+        })
+    resultado['ign_sem_igf'] = len(ign_orfaos)
+    
+    for i in igf_orfaos:
+        resultado['igf_orfaos'].append({
+            'data_hora': eventos.iloc[i],
+            'sequencia': sequencias[i],
+            'status': 'IGF sem IGN anterior'
+        })
+    resultado['igf_sem_ign'] = len(igf_orfaos)
     
     return resultado
 
+def format_timedelta_series(td: pd.Series) -> pd.Series:
+    """Versão vetorizada de format_timedelta: HH:MM:SS por elemento, None onde for NaT"""
+    validos = td.notna().to_numpy()
+    textos = np.full(len(td), None, dtype=object)
+
+    if validos.any():
+        total_seconds = np.trunc(td[validos].dt.total_seconds().to_numpy()).astype(np.int64)
+        horas, resto = np.divmod(total_seconds, 3600)
+        textos[validos] = pd.Series(horas).astype(str).str.zfill(2).to_numpy(dtype=object) \
+            + _MINUTOS_SEGUNDOS[resto]
+
+    return pd.Series(textos, index=td.index, dtype=object)
+
+def _diff_desde_referencia(evento: pd.Series, tipo: pd.Series, tipo_alvo: str, tipo_inicio: str) -> pd.Series:
+    """
+    Diferença entre cada mensagem tipo_alvo e a referência anterior, que é
+    a última mensagem tipo_alvo ou tipo_inicio (IGN/IGF) vista antes dela
+    """
+    referencias = evento[tipo.isin([tipo_alvo, tipo_inicio])]
+    diffs = referencias - referencias.shift(1)
+    return diffs[tipo[referencias.index] == tipo_alvo].reindex(evento.index)
+
 def adicionar_diffs(df: pd.DataFrame) -> pd.DataFrame:
     """Adiciona colunas de diferença de tempo para posicionamento e modo econômico, além da coluna LOG"""
-    df_work = df.copy()
+    # A ordenação já gera o DataFrame de trabalho; o df recebido não é alterado
+    df_work = converter_data_hora(df).sort_values(by=["Data/Hora Inclusão", "Sequência"], ignore_index=True)
     
-    df_work["Data/Hora Inclusão"] = pd.to_datetime(df_work["Data/Hora Inclusão"], errors="coerce")
-    df_work["Data/Hora Evento"] = pd.to_datetime(df_work["Data/Hora Evento"], errors="coerce")
-    df_work.sort_values(by=["Data/Hora Inclusão", "Sequência"], inplace=True, ignore_index=True)
+    evento = df_work["Data/Hora Evento"]
+    tipo = df_work["Tipo Mensagem"]
     
-    df_work["LOG"] = None
-    df_work["Diff_Posicionamento"] = None
-    df_work["Diff_ModoEco"] = None
+    df_work["LOG"] = format_timedelta_series(df_work["Data/Hora Inclusão"] - evento)
     
-    for i, row in df_work.iterrows():
-        inclusao_time = row["Data/Hora Inclusão"]
-        evento_time = row["Data/Hora Evento"]
-        
-        if pd.notna(inclusao_time) and pd.notna(evento_time):
-            diff_log = inclusao_time - evento_time
-            df_work.at[i, "LOG"] = format_timedelta(diff_log)
-
-    last_pos_time = None
-    last_eco_time = None
-
-    for i, row in df_work.iterrows():
-        tipo = row["Tipo Mensagem"]
-        evento_time = row["Data/Hora Evento"]
-
-        if tipo == "IGN":
-            last_pos_time = evento_time
-
-        if tipo == "IGF":
-            last_eco_time = evento_time
-
-        if tipo == "Posicionamento por tempo em movimento":
-            if last_pos_time is None:
-                df_work.at[i, "Diff_Posicionamento"] = None
-            else:
-                diff = evento_time - last_pos_time
-                df_work.at[i, "Diff_Posicionamento"] = format_timedelta(diff)
-            last_pos_time = evento_time
-
-        if tipo == "Modo econômico":
-            if last_eco_time is None:
-                df_work.at[i, "Diff_ModoEco"] = None
-            else:
-                diff = evento_time - last_eco_time
-                df_work.at[i, "Diff_ModoEco"] = format_timedelta(diff)
-            last_eco_time = evento_time
+    # A referência de posicionamento reinicia no IGN e a de modo econômico no IGF
+    diff_pos = _diff_desde_referencia(evento, tipo, "Posicionamento por tempo em movimento", "IGN")
+    diff_eco = _diff_desde_referencia(evento, tipo, "Modo econômico", "IGF")
+    
+    df_work["Diff_Posicionamento"] = format_timedelta_series(diff_pos)
+    df_work["Diff_ModoEco"] = format_timedelta_series(diff_eco)
 
     cols = list(df_work.columns)
     
@@ -203,245 +278,433 @@ def adicionar_diffs(df: pd.DataFrame) -> pd.DataFrame:
 
 def remover_mensagens_duplicadas(df: pd.DataFrame) -> pd.DataFrame:
     """Remove mensagens duplicadas baseadas em Tipo Mensagem, Sequência e Data/Hora Evento"""
-    df_clean = df.copy()
-    
-    duplicatas = df_clean.duplicated(subset=['Tipo Mensagem', 'Sequência', 'Data/Hora Evento'], keep='first')
+    duplicatas = df.duplicated(subset=['Tipo Mensagem', 'Sequência', 'Data/Hora Evento'], keep='first')
     total_duplicatas = duplicatas.sum()
     
     if total_duplicatas > 0:
-        print(f"🧹 Removendo {total_duplicatas} mensagens duplicadas...")
+        debug(f"🧹 Removendo {total_duplicatas} mensagens duplicadas...")
     
-    df_clean = df_clean.drop_duplicates(subset=['Tipo Mensagem', 'Sequência', 'Data/Hora Evento'], keep='first')
-    
-    return df_clean
+    # A máscara já calculada evita um segundo drop_duplicates
+    return df[~duplicatas]
 
 def contar_reboots(df: pd.DataFrame) -> Tuple[int, List[Dict]]:
     """Conta quantas vezes houve reboot (sequência zerada)"""
+    df_sorted = df.sort_values(['Data/Hora Inclusão', 'Sequência']).reset_index(drop=True)
+    return _reboots_ordenados(df_sorted)
+
+def _reboots_ordenados(df_sorted: pd.DataFrame) -> Tuple[int, List[Dict]]:
+    """Detecta reboots em um DataFrame já ordenado por Data/Hora Inclusão e Sequência"""
     reboots = []
-    reboot_count = 0
     
-    df_sorted = df.sort_values(['Data/Hora Inclusão', 'Sequência']).reset_index(drop=True)
+    # Reboot: a sequência caiu em relação à mensagem anterior e voltou para ≤ 10
+    sequencias = df_sorted['Sequência'].to_numpy()
+    posicoes = np.flatnonzero((sequencias[1:] < sequencias[:-1]) & (sequencias[1:] <= 10)) + 1
     
-    for i in range(1, len(df_sorted)):
-        seq_anterior = df_sorted.iloc[i-1]['Sequência']
-        seq_atual = df_sorted.iloc[i]['Sequência']
-        
-        if seq_atual < seq_anterior and seq_atual <= 10:
-            reboot_count += 1
-            reboots.append({
-                'Reboot_Numero': reboot_count,
-                'Data_Hora': df_sorted.iloc[i]['Data/Hora Inclusão'],
-                'Sequencia_Anterior': seq_anterior,
-                'Sequencia_Nova': seq_atual,
-                'Tipo_Mensagem': df_sorted.iloc[i]['Tipo Mensagem']
-            })
-    
-    return reboot_count, reboots
+    inclusoes = df_sorted['Data/Hora Inclusão']
+    tipos = df_sorted['Tipo Mensagem'].to_numpy()
+    
+    for reboot_count, i in enumerate(posicoes, 1):
+        reboots.append({
+            'Reboot_Numero': reboot_count,
+            'Data_Hora': inclusoes.iloc[i],
+            'Sequencia_Anterior': sequencias[i - 1],
+            'Sequencia_Nova': sequencias[i],
+            'Tipo_Mensagem': tipos[i]
+        })
+    
+    return len(posicoes), reboots
+
+def _anomalias_intervalo(df: pd.DataFrame, tipo_mensagem: str, coluna_diff: str,
+                         esperado: timedelta, esperado_texto: str, nome: str) -> List[Dict]:
+    """Mensagens tipo_mensagem cujo diff (texto H:MM:SS) sai de esperado ±2s"""
+    anomalias = []
+    
+    diffs = df[coluna_diff]
+    selecionadas = (df['Tipo Mensagem'] == tipo_mensagem) & diffs.map(lambda valor: isinstance(valor, str))
+    if not selecionadas.any():
+        return anomalias
+    
+    textos = diffs[selecionadas]
+    partes = textos.str.split(':', expand=True)
+    if partes.shape[1] < 3:
+        partes = partes.reindex(columns=range(3))
+    numeros = [pd.to_numeric(partes[c], errors='coerce') for c in range(3)]
+    validos = (numeros[0] % 1 == 0) & (numeros[1] % 1 == 0) & (numeros[2] % 1 == 0)
+    
+    for diff_str in textos[~validos]:
+        debug(f"⚠️ Erro ao processar diff {nome}: {diff_str}")
+    
+    segundos = numeros[0] * 3600 + numeros[1] * 60 + numeros[2]
+    diferenca = (segundos - esperado.total_seconds())[validos]
+    fora = diferenca.abs() > 2
+    
+    indices = fora.index[fora.to_numpy()]
+    linhas = zip(df.loc[indices, 'Sequência'].tolist(), df.loc[indices, 'Data/Hora Evento'],
+                 textos[indices], diferenca[indices].tolist())
+    for sequencia, data_hora, diff_str, diferenca_segundos in linhas:
+        anomalias.append({
+            'Sequencia': sequencia,
+            'Data_Hora': data_hora,
+            'Tempo_Esperado': esperado_texto,
+            'Tempo_Real': diff_str,
+            'Diferenca_Segundos': diferenca_segundos,
+            'Status': 'Fora da tolerância (±2s)'
+        })
+    
+    return anomalias
 
 def analisar_intervalos_tempo(df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
     """Analisa intervalos de tempo para posicionamento e modo econômico"""
-    anomalias_posicionamento = []
-    anomalias_modo_eco = []
-    
-    tolerancia = timedelta(seconds=2)
-    tempo_esperado_pos = timedelta(minutes=3)
-    tempo_esperado_eco = timedelta(hours=1)
-    
-    for i, row in df.iterrows():
-        if row['Tipo Mensagem'] == 'Posicionamento por tempo em movimento':
-            diff_str = row['Diff_Posicionamento']
-            if not pd.isna(diff_str) and isinstance(diff_str, str):
-                try:
-                    parts = diff_str.split(':')
-                    diff_time = timedelta(hours=int(parts[0]), minutes=int(parts[1]), seconds=int(parts[2]))
-                    
-                    if not (tempo_esperado_pos - tolerancia <= diff_time <= tempo_esperado_pos + tolerancia):
-                        anomalias_posicionamento.append({
-                            'Sequencia': row['Sequência'],
-                            'Data_Hora': row['Data/Hora Evento'],
-                            'Tempo_Esperado': '00:03:00',
-                            'Tempo_Real': diff_str,
-                            'Diferenca_Segundos': (diff_time - tempo_esperado_pos).total_seconds(),
-                            'Status': 'Fora da tolerância (±2s)'
-                        })
-                except (ValueError, IndexError, TypeError):
-                    print(f"⚠️ Erro ao processar diff posicionamento: {diff_str}")
-        
-        if row['Tipo Mensagem'] == 'Modo econômico':
-            diff_str = row['Diff_ModoEco']
-            if not pd.isna(diff_str) and isinstance(diff_str, str):
-                try:
-                    parts = diff_str.split(':')
-                    diff_time = timedelta(hours=int(parts[0]), minutes=int(parts[1]), seconds=int(parts[2]))
-                    
-                    if not (tempo_esperado_eco - tolerancia <= diff_time <= tempo_esperado_eco + tolerancia):
-                        anomalias_modo_eco.append({
-                            'Sequencia': row['Sequência'],
-                            'Data_Hora': row['Data/Hora Evento'],
-                            'Tempo_Esperado': '01:00:00',
-                            'Tempo_Real': diff_str,
-                            'Diferenca_Segundos': (diff_time - tempo_esperado_eco).total_seconds(),
-                            'Status': 'Fora da tolerância (±2s)'
-                        })
-                except (ValueError, IndexError, TypeError):
-                    print(f"⚠️ Erro ao processar diff modo econômico: {diff_str}")
+    anomalias_posicionamento = _anomalias_intervalo(
+        df, 'Posicionamento por tempo em movimento', 'Diff_Posicionamento',
+        timedelta(minutes=3), '00:03:00', 'posicionamento')
+    anomalias_modo_eco = _anomalias_intervalo(
+        df, 'Modo econômico', 'Diff_ModoEco',
+        timedelta(hours=1), '01:00:00', 'modo econômico')
     
     return anomalias_posicionamento, anomalias_modo_eco
 
-def detectar_anomalias_ignicao(df: pd.DataFrame) -> List[Dict]:
-    """Detecta anomalias de ignição (IGN/IGF consecutivos não duplicados)"""
+# Pares de eventos que devem se alternar; dois iguais seguidos indicam perda
+PARES_EVENTOS_CONSECUTIVOS = {
+    'ignicao': ('IGN', 'IGF'),
+    'velocidade': ('Excesso de velocidade', 'Retorno de velocidade'),
+    'bloqueio': ('Bloqueio', 'Desbloqueio'),
+}
+
+def detectar_eventos_consecutivos(df: pd.DataFrame, par_eventos: Tuple[str, str]) -> List[Dict]:
+    """
+    Detecta eventos de um par alternado (ex.: IGN/IGF) que aparecem repetidos
+    em sequência com números de sequência diferentes (não duplicados)
+    """
+    df_eventos = df[df['Tipo Mensagem'].isin(list(par_eventos))]
+    df_eventos = remover_mensagens_duplicadas(df_eventos)
+    df_eventos = df_eventos.sort_values('Data/Hora Evento').reset_index(drop=True)
+    
+    return _eventos_consecutivos_ordenados(df_eventos)
+
+def _eventos_consecutivos_ordenados(df_eventos: pd.DataFrame) -> List[Dict]:
+    """Repetições consecutivas em eventos de um par já deduplicados e ordenados por Data/Hora Evento"""
     anomalias = []
     
-    df_ignicao = df[df['Tipo Mensagem'].isin(['IGN', 'IGF'])].copy()
-    df_ignicao = remover_mensagens_duplicadas(df_ignicao)
-    df_ignicao = df_ignicao.sort_values('Data/Hora Evento').reset_index(drop=True)
+    tipos = df_eventos['Tipo Mensagem'].to_numpy()
+    sequencias = df_eventos['Sequência'].to_numpy()
+    eventos = df_eventos['Data/Hora Evento']
     
-    for i in range(len(df_ignicao) - 1):
-        atual = df_ignicao.iloc[i]
-        proximo = df_ignicao.iloc[i + 1]
-        
-        if atual['Tipo Mensagem'] == proximo['Tipo Mensagem']:
-            if atual['Sequência'] != proximo['Sequência']:
-                anomalias.append({
-                    'Tipo_Anomalia': f'{atual["Tipo Mensagem"]} Consecutivos',
-                    'Sequencia_1': atual['Sequência'],
-                    'Sequencia_2': proximo['Sequência'],
-                    'Data_Hora_1': atual['Data/Hora Evento'],
-                    'Data_Hora_2': proximo['Data/Hora Evento'],
-                    'Diferenca_Tempo': proximo['Data/Hora Evento'] - atual['Data/Hora Evento'],
-                    'Status': 'Possível perda de evento intermediário'
-                })
+    # Mesmo tipo da mensagem seguinte e sequência diferente
+    posicoes = np.flatnonzero((tipos[:-1] == tipos[1:]) & (sequencias[:-1] != sequencias[1:]))
+    
+    for i in posicoes:
+        anomalias.append({
+            'Tipo_Anomalia': f'{tipos[i]} Consecutivos',
+            'Sequencia_1': sequencias[i],
+            'Sequencia_2': sequencias[i + 1],
+            'Data_Hora_1': eventos.iloc[i],
+            'Data_Hora_2': eventos.iloc[i + 1],
+            'Diferenca_Tempo': eventos.iloc[i + 1] - eventos.iloc[i],
+            'Status': 'Possível perda de evento intermediário'
+        })
     
     return anomalias
 
+def detectar_anomalias_ignicao(df: pd.DataFrame) -> List[Dict]:
+    """Detecta anomalias de ignição (IGN/IGF consecutivos não duplicados)"""
+    return detectar_eventos_consecutivos(df, PARES_EVENTOS_CONSECUTIVOS['ignicao'])
+
 def detectar_anomalias_velocidade(df: pd.DataFrame) -> List[Dict]:
     """Detecta anomalias de velocidade (excesso/retorno consecutivos não duplicados)"""
-    anomalias = []
-    
-    df_velocidade = df[df['Tipo Mensagem'].isin(['Excesso de velocidade', 'Retorno de velocidade'])].copy()
-    df_velocidade = remover_mensagens_duplicadas(df_velocidade)
-    df_velocidade = df_velocidade.sort_values('Data/Hora Evento').reset_index(drop=True)
+    return detectar_eventos_consecutivos(df, PARES_EVENTOS_CONSECUTIVOS['velocidade'])
+
+def _grupos_log_pos_igf(diff_ns: np.ndarray, validos: np.ndarray, igf: np.ndarray,
+                        inicio_bloco: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Marca as mensagens em LOG que seguem um IGF, em linhas ordenadas por inclusão
+
+    Args:
+        diff_ns: inclusão - evento em ns
+        validos: linhas com inclusão e evento
+        igf: linhas IGF
+        inicio_bloco: linhas que começam um novo bloco independente (ex.:
+            troca de IMEI); nenhum grupo atravessa o início de um bloco
+
+    Returns:
+        (membros, trecho, primeiro_igf): máscara das mensagens agrupadas, id
+            do trecho de cada linha (que também identifica o grupo) e posição
+            do primeiro IGF de cada trecho (len(linhas) quando não há IGF)
+    """
+    # Linhas sem inclusão ou evento não entram no grupo nem o encerram
+    em_log = validos & (diff_ns > LIMIAR_LOG_NS)
+    quebras = validos & ~em_log
+    if inicio_bloco is not None:
+        quebras = quebras | inicio_bloco
+    trecho = np.cumsum(quebras)
     
-    for i in range(len(df_velocidade) - 1):
-        atual = df_velocidade.iloc[i]
-        proximo = df_velocidade.iloc[i + 1]
-        
-        if atual['Tipo Mensagem'] == proximo['Tipo Mensagem']:
-            if atual['Sequência'] != proximo['Sequência']:
-                anomalias.append({
-                    'Tipo_Anomalia': f'{atual["Tipo Mensagem"]} Consecutivos',
-                    'Sequencia_1': atual['Sequência'],
-                    'Sequencia_2': proximo['Sequência'],
-                    'Data_Hora_1': atual['Data/Hora Evento'],
-                    'Data_Hora_2': proximo['Data/Hora Evento'],
-                    'Diferenca_Tempo': proximo['Data/Hora Evento'] - atual['Data/Hora Evento'],
-                    'Status': 'Possível perda de evento intermediário'
-                })
+    posicoes = np.arange(len(diff_ns))
+    primeiro_igf = np.full(trecho[-1] + 1, len(diff_ns))
+    trechos_com_igf, primeiros = np.unique(trecho[igf], return_index=True)
+    primeiro_igf[trechos_com_igf] = posicoes[igf][primeiros]
     
-    return anomalias
+    membros = em_log & (posicoes > primeiro_igf[trecho])
+    return membros, trecho, primeiro_igf
 
 def detectar_mensagens_log_pos_igf(df: pd.DataFrame) -> List[Dict]:
     """
     Detecta grupos de mensagens em modo LOG (diff > 1min entre inclusão e evento)
     que ocorrem SOMENTE após eventos IGF (ignição desligada).
+
+    A diferença inclusão - evento é calculada uma vez para todas as linhas.
+    Cada mensagem válida fora do modo LOG encerra a sequência em andamento, então
+    a soma acumulada dessas quebras numera os trechos; em cada trecho, as
+    mensagens em LOG depois do primeiro IGF formam um grupo.
     """
-    anomalias_log = []
-    
     df_sorted = df.sort_values('Data/Hora Inclusão').reset_index(drop=True)
-    limiar_log = timedelta(minutes=1)
+    return _log_pos_igf_ordenado(df_sorted)
+
+def _log_pos_igf_ordenado(df_sorted: pd.DataFrame) -> List[Dict]:
+    """Detecta os grupos em LOG após IGF em um DataFrame já ordenado por Data/Hora Inclusão"""
+    anomalias_log = []
     
-    i = 0
-    while i < len(df_sorted):
-        row = df_sorted.iloc[i]
+    if df_sorted.empty:
+        return anomalias_log
+    
+    inclusao = df_sorted['Data/Hora Inclusão']
+    evento = df_sorted['Data/Hora Evento']
+    diferencas = inclusao - evento
+    diff_ns = diferencas.to_numpy(dtype='timedelta64[ns]').astype(np.int64)
+    
+    validos = (inclusao.notna() & evento.notna()).to_numpy()
+    igf = (df_sorted['Tipo Mensagem'] == 'IGF').to_numpy()
+    membros, trecho, primeiro_igf = _grupos_log_pos_igf(diff_ns, validos, igf)
+    if not membros.any():
+        return anomalias_log
+    
+    grupo = trecho[membros]
+    diffs_segundos = pd.Series(diff_ns[membros] / 1e9)
+    estatisticas = diffs_segundos.groupby(grupo).agg(['min', 'mean', 'max'])
+    _, inicios, totais = np.unique(grupo, return_index=True, return_counts=True)
+    
+    sequencias = df_sorted['Sequência'].to_numpy()[membros].tolist()
+    tipos = df_sorted['Tipo Mensagem'].to_numpy()[membros].tolist()
+    eventos = evento[membros].tolist()
+    inclusoes = inclusao[membros].tolist()
+    diffs_log = diferencas[membros]
+    diffs_formatadas = format_timedelta_series(diffs_log).tolist()
+    diffs_log = diffs_log.tolist()
+    
+    for (trecho_igf, diff_min, diff_media, diff_max), inicio, total in zip(
+            estatisticas.itertuples(), inicios.tolist(), totais.tolist()):
+        fim = inicio + total
+        posicao_igf = primeiro_igf[trecho_igf]
         
-        if row['Tipo Mensagem'] == 'IGF':
-            igf_data = row['Data/Hora Evento']
-            igf_seq = row['Sequência']
-            
-            mensagens_log = []
-            j = i + 1
-            
-            while j < len(df_sorted):
-                msg = df_sorted.iloc[j]
-                
-                inclusao_time = msg['Data/Hora Inclusão']
-                evento_time = msg['Data/Hora Evento']
-                
-                if pd.notna(inclusao_time) and pd.notna(evento_time):
-                    diff_log = inclusao_time - evento_time
-                    
-                    if diff_log > limiar_log:
-                        mensagens_log.append({
-                            'sequencia': msg['Sequência'],
-                            'tipo_mensagem': msg['Tipo Mensagem'],
-                            'data_hora_evento': evento_time,
-                            'data_hora_inclusao': inclusao_time,
-                            'diferenca_log': diff_log,
-                            'diferenca_log_formatada': format_timedelta(diff_log)
-                        })
-                        j += 1
-                    else:
-                        break
-                else:
-                    j += 1
-            
-            if mensagens_log:
-                total_mensagens = len(mensagens_log)
-                primeira_msg = mensagens_log[0]
-                ultima_msg = mensagens_log[-1]
-                
-                duracao_total = ultima_msg['data_hora_inclusao'] - primeira_msg['data_hora_evento']
-                
-                diffs_segundos = [msg['diferenca_log'].total_seconds() for msg in mensagens_log]
-                diff_media = sum(diffs_segundos) / len(diffs_segundos)
-                diff_max = max(diffs_segundos)
-                diff_min = min(diffs_segundos)
-                
-                anomalias_log.append({
-                    'IGF_Sequencia': igf_seq,
-                    'IGF_Data_Hora': igf_data,
-                    'Total_Mensagens_LOG': total_mensagens,
-                    'Primeira_Mensagem_LOG': primeira_msg['data_hora_evento'],
-                    'Ultima_Mensagem_LOG': ultima_msg['data_hora_evento'],
-                    'Duracao_Total_Periodo': format_timedelta(duracao_total),
-                    'Diff_LOG_Media_Segundos': f"{diff_media:.0f}",
-                    'Diff_LOG_Minima_Segundos': f"{diff_min:.0f}",
-                    'Diff_LOG_Maxima_Segundos': f"{diff_max:.0f}",
-                    'Tipos_Mensagens': ', '.join(set([msg['tipo_mensagem'] for msg in mensagens_log])),
-                    'Sequencias': f"{primeira_msg['sequencia']} a {ultima_msg['sequencia']}",
-                    'Detalhes_Mensagens': mensagens_log
-                })
-                
-                i = j
-            else:
-                i += 1
-        else:
-            i += 1
+        mensagens_log = [{
+            'sequencia': sequencias[k],
+            'tipo_mensagem': tipos[k],
+            'data_hora_evento': eventos[k],
+            'data_hora_inclusao': inclusoes[k],
+            'diferenca_log': diffs_log[k],
+            'diferenca_log_formatada': diffs_formatadas[k]
+        } for k in range(inicio, fim)]
+        
+        duracao_total = inclusoes[fim - 1] - eventos[inicio]
+        
+        anomalias_log.append({
+            'IGF_Sequencia': df_sorted['Sequência'].iat[posicao_igf],
+            'IGF_Data_Hora': evento.iat[posicao_igf],
+            'Total_Mensagens_LOG': total,
+            'Primeira_Mensagem_LOG': eventos[inicio],
+            'Ultima_Mensagem_LOG': eventos[fim - 1],
+            'Duracao_Total_Periodo': format_timedelta(duracao_total),
+            'Diff_LOG_Media_Segundos': f"{diff_media:.0f}",
+            'Diff_LOG_Minima_Segundos': f"{diff_min:.0f}",
+            'Diff_LOG_Maxima_Segundos': f"{diff_max:.0f}",
+            'Tipos_Mensagens': ', '.join(sorted({tipo for tipo in tipos[inicio:fim] if isinstance(tipo, str)})),
+            'Sequencias': f"{sequencias[inicio]} a {sequencias[fim - 1]}",
+            'Detalhes_Mensagens': mensagens_log
+        })
     
     return anomalias_log
 
+def analisar_dataframe(df: pd.DataFrame) -> Dict:
+    """
+    Executa todas as análises de um DataFrame decodificado com uma só ordenação
+
+    As datas são convertidas (se ainda em texto) e o DataFrame é ordenado por
+    inclusão e sequência uma só vez (adicionar_diffs); reboots, intervalos e
+    LOG usam essa cópia pelos helpers *_ordenado(s), e os pares IGN/IGF e de
+    velocidade são deduplicados e ordenados por evento juntos. Cada detector
+    é uma passada vetorizada sobre as colunas já ordenadas, não um laço único
+    por linha com acumuladores.
+    """
+    df_com_diffs = adicionar_diffs(df)
+    num_reboots, lista_reboots = _reboots_ordenados(df_com_diffs)
+    anomalias_pos, anomalias_eco = analisar_intervalos_tempo(df_com_diffs)
+    
+    # Tipo Mensagem faz parte da chave de duplicidade, então deduplicar a
+    # união dos pares equivale a deduplicar cada par separadamente
+    par_ignicao = list(PARES_EVENTOS_CONSECUTIVOS['ignicao'])
+    par_velocidade = list(PARES_EVENTOS_CONSECUTIVOS['velocidade'])
+    tipos = df_com_diffs['Tipo Mensagem']
+    df_pares = remover_mensagens_duplicadas(df_com_diffs[tipos.isin(par_ignicao + par_velocidade)])
+    df_pares = df_pares.sort_values('Data/Hora Evento', kind='stable')
+    
+    df_ignicao = df_pares[df_pares['Tipo Mensagem'].isin(par_ignicao)].reset_index(drop=True)
+    df_velocidade = df_pares[df_pares['Tipo Mensagem'].isin(par_velocidade)].reset_index(drop=True)
+    
+    return {
+        # O hodômetro ordena as leituras pela data do evento, não pela inclusão
+        'info_hodometro': calcular_distancia_hodometro(df),
+        'info_viagens': _parear_viagens(df_ignicao),
+        'df_com_diffs': df_com_diffs,
+        'num_reboots': num_reboots,
+        'lista_reboots': lista_reboots,
+        'anomalias_pos': anomalias_pos,
+        'anomalias_eco': anomalias_eco,
+        'anomalias_ignicao': _eventos_consecutivos_ordenados(df_ignicao),
+        'anomalias_velocidade': _eventos_consecutivos_ordenados(df_velocidade),
+        'anomalias_log_pos_igf': _log_pos_igf_ordenado(df_com_diffs),
+    }
+
+def montar_relatorio(imei: str, total_registros: int, analise: Dict) -> List[str]:
+    """Monta as linhas do relatório TXT a partir do resultado de analisar_dataframe"""
+    info_hodometro = analise['info_hodometro']
+    info_viagens = analise['info_viagens']
+    df_com_diffs = analise['df_com_diffs']
+    num_reboots, lista_reboots = analise['num_reboots'], analise['lista_reboots']
+    anomalias_pos, anomalias_eco = analise['anomalias_pos'], analise['anomalias_eco']
+    anomalias_ignicao = analise['anomalias_ignicao']
+    anomalias_velocidade = analise['anomalias_velocidade']
+    anomalias_log_pos_igf = analise['anomalias_log_pos_igf']
+    
+    relatorio_txt = []
+    relatorio_txt.append("="*100)
+    relatorio_txt.append("📋 RELATÓRIO COMPLETO DE ANÁLISE")
+    relatorio_txt.append("="*100)
+
+    relatorio_txt.append(f"📊 RESUMO GERAL:")
+    relatorio_txt.append(f"   IMEI: {imei}")
+    relatorio_txt.append(f"   📁 Total de Registros: {total_registros}")
+    relatorio_txt.append(f"   📅 Período: {df_com_diffs['Data/Hora Evento'].min()} até {df_com_diffs['Data/Hora Evento'].max()}")
+
+    relatorio_txt.append(f"\n🚗 INFORMAÇÕES DO HODÔMETRO:")
+    if info_hodometro['distancia_percorrida'] is not None:
+        relatorio_txt.append(f"   🏁 Primeiro KM válido: {info_hodometro['primeiro_km']:.2f} km ({info_hodometro['data_primeiro']})")
+        relatorio_txt.append(f"   🏆 Último KM válido: {info_hodometro['ultimo_km']:.2f} km ({info_hodometro['data_ultimo']})")
+        relatorio_txt.append(f"   📏 Distância percorrida no período: {info_hodometro['distancia_percorrida']:.2f} km")
+        relatorio_txt.append(f"   📊 Total de registros válidos de hodômetro: {info_hodometro['total_registros_validos']}")
+    else:
+        relatorio_txt.append(f"   ⚠️ Não foi possível calcular a distância (dados insuficientes)")
+
+    relatorio_txt.append(f"\n🛣️ INFORMAÇÕES DAS VIAGENS:")
+    relatorio_txt.append(f"   ✅ Viagens completas (IGN→IGF): {info_viagens['total_viagens_completas']}")
+    relatorio_txt.append(f"   🔴 IGN sem IGF correspondente: {info_viagens['ign_sem_igf']}")
+    relatorio_txt.append(f"   🟠 IGF sem IGN anterior: {info_viagens['igf_sem_ign']}")
+
+    if info_viagens['detalhes_viagens']:
+        relatorio_txt.append(f"   🚗 DETALHES DAS VIAGENS COMPLETAS:")
+        for viagem in info_viagens['detalhes_viagens']:
+            relatorio_txt.append(f"      {viagem['viagem_numero']:2d}. Início: {viagem['ignicao_ligada']}")
+            relatorio_txt.append(f"          Fim:    {viagem['ignicao_desligada']}")
+            relatorio_txt.append(f"          Duração: {viagem['duracao_formatada']} (Seq: {viagem['sequencia_ign']}→{viagem['sequencia_igf']})")
+
+    if info_viagens['ign_orfaos']:
+        relatorio_txt.append(f"   🔴 IGN ÓRFÃOS (sem IGF correspondente):")
+        for i, ign in enumerate(info_viagens['ign_orfaos'], 1):
+            relatorio_txt.append(f"      {i:2d}. {ign['data_hora']} - Seq: {ign['sequencia']}")
+
+    if info_viagens['igf_orfaos']:
+        relatorio_txt.append(f"   🟠 IGF ÓRFÃOS (sem IGN anterior):")
+        for i, igf in enumerate(info_viagens['igf_orfaos'], 1):
+            relatorio_txt.append(f"      {i:2d}. {igf['data_hora']} - Seq: {igf['sequencia']}")
+
+    relatorio_txt.append(f"\n🔄 REBOOTS DETECTADOS:")
+    relatorio_txt.append(f"   🔢 Total: {num_reboots}")
+    if lista_reboots:
+        for reboot in lista_reboots:
+            relatorio_txt.append(f"   📅 {reboot['Data_Hora']} - Seq: {reboot['Sequencia_Anterior']} → {reboot['Sequencia_Nova']}")
+
+    relatorio_txt.append(f"\n⏰ ANOMALIAS DE INTERVALOS:")
+    relatorio_txt.append(f"   🎯 Posicionamento (esperado 3min ±2s): {len(anomalias_pos)} anomalias")
+    relatorio_txt.append(f"   💤 Modo Econômico (esperado 1h ±2s): {len(anomalias_eco)} anomalias")
+
+    if anomalias_pos:
+        relatorio_txt.append(f"   📍 DETALHES COMPLETOS - Posicionamento:")
+        for i, anom in enumerate(anomalias_pos, 1):
+            relatorio_txt.append(f"      {i:3d}. Seq {anom['Sequencia']} ({anom['Data_Hora']}): {anom['Tempo_Real']} (diff: {anom['Diferenca_Segundos']:.0f}s)")
+
+    if anomalias_eco:
+        relatorio_txt.append(f"   💤 DETALHES COMPLETOS - Modo Econômico:")
+        for i, anom in enumerate(anomalias_eco, 1):
+            relatorio_txt.append(f"      {i:3d}. Seq {anom['Sequencia']} ({anom['Data_Hora']}): {anom['Tempo_Real']} (diff: {anom['Diferenca_Segundos']:.0f}s)")
+
+    relatorio_txt.append(f"\n🔥 ANOMALIAS DE IGNIÇÃO:")
+    relatorio_txt.append(f"   🚨 Total: {len(anomalias_ignicao)} anomalias")
+    if anomalias_ignicao:
+        relatorio_txt.append(f"   🔥 DETALHES COMPLETOS - Ignição:")
+        for i, anom in enumerate(anomalias_ignicao, 1):
+            relatorio_txt.append(f"      {i:3d}. {anom['Tipo_Anomalia']}: Seq {anom['Sequencia_1']} → {anom['Sequencia_2']}")
+            relatorio_txt.append(f"           Data: {anom['Data_Hora_1']} → {anom['Data_Hora_2']}")
+            relatorio_txt.append(f"           Intervalo: {anom['Diferenca_Tempo']}")
+
+    relatorio_txt.append(f"\n🏃 ANOMALIAS DE VELOCIDADE:")
+    relatorio_txt.append(f"   🚨 Total: {len(anomalias_velocidade)} anomalias")
+    if anomalias_velocidade:
+        relatorio_txt.append(f"   🏃 DETALHES COMPLETOS - Velocidade:")
+        for i, anom in enumerate(anomalias_velocidade, 1):
+            relatorio_txt.append(f"      {i:3d}. {anom['Tipo_Anomalia']}: Seq {anom['Sequencia_1']} → {anom['Sequencia_2']}")
+            relatorio_txt.append(f"           Data: {anom['Data_Hora_1']} → {anom['Data_Hora_2']}")
+            relatorio_txt.append(f"           Intervalo: {anom['Diferenca_Tempo']}")
+
+    relatorio_txt.append(f"\n📝 MENSAGENS EM LOG APÓS IGF:")
+    relatorio_txt.append(f"   🚨 Total de ocorrências: {len(anomalias_log_pos_igf)}")
+    if anomalias_log_pos_igf:
+        relatorio_txt.append(f"   📝 DETALHES COMPLETOS - Mensagens em LOG após IGF:")
+        for i, anom in enumerate(anomalias_log_pos_igf, 1):
+            relatorio_txt.append(f"      {i:3d}. IGF (Seq {anom['IGF_Sequencia']}) em {anom['IGF_Data_Hora']}")
+            relatorio_txt.append(f"           → {anom['Total_Mensagens_LOG']} mensagens em LOG detectadas")
+            relatorio_txt.append(f"           → Sequências: {anom['Sequencias']}")
+            relatorio_txt.append(f"           → Período: {anom['Primeira_Mensagem_LOG']} até {anom['Ultima_Mensagem_LOG']}")
+
+    relatorio_txt.append(f"\n🎉 ANÁLISE CONCLUÍDA!")
+    relatorio_txt.append("="*100)
+    relatorio_txt.append("✅ RELATÓRIO FINALIZADO COM SUCESSO!")
+    relatorio_txt.append("="*100)
+
+    return relatorio_txt
+
+def salvar_analise(nome_base: str, relatorio_txt: List[str], df_com_diffs: pd.DataFrame, output_dir: str):
+    """Grava analise_{nome_base}.txt e analise_{nome_base}.csv na pasta de saída"""
+    # Criar diretório de saída
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Salvar relatório TXT
+    txt_output = os.path.join(output_dir, f"analise_{nome_base}.txt")
+    with open(txt_output, "w", encoding="utf-8") as f:
+        f.write("\n".join(relatorio_txt))
+    debug(f"💾 Relatório TXT salvo: {txt_output}")
+    
+    # Salvar CSV processado
+    csv_output = os.path.join(output_dir, f"analise_{nome_base}.csv")
+    df_com_diffs.to_csv(csv_output, sep=",", index=False)
+    debug(f"💾 CSV processado salvo: {csv_output}")
+
 def processar_arquivo(input_file: str, output_dir: str = "analises"):
     """Processa um único arquivo e gera relatório TXT e CSV processado"""
     
-    print(f"\n{'='*100}")
-    print(f"🔍 PROCESSANDO: {os.path.basename(input_file)}")
-    print(f"{'='*100}")
+    debug(f"\n{'='*100}")
+    debug(f"🔍 PROCESSANDO: {os.path.basename(input_file)}")
+    debug(f"{'='*100}")
     
     try:
         # Carregar dados
-        df = pd.read_csv(input_file, sep=",")
-        df.columns = df.columns.str.strip()
-        print(f"✅ Arquivo carregado: {len(df)} registros")
+        invalidas_antes = sum(datas_invalidas.values())
+        df = ler_csv_decodificado(input_file)
+        debug(f"✅ Arquivo carregado: {len(df)} registros")
+        invalidas = sum(datas_invalidas.values()) - invalidas_antes
+        if invalidas:
+            print(f"⚠️ {os.path.basename(input_file)}: {invalidas} datas/horas sem formato conhecido (tratadas como vazias)")
         
         # Calcular análises
-        info_hodometro = calcular_distancia_hodometro(df)
-        info_viagens = contar_viagens(df)
-        df_com_diffs = adicionar_diffs(df)
-        num_reboots, lista_reboots = contar_reboots(df_com_diffs)
-        anomalias_pos, anomalias_eco = analisar_intervalos_tempo(df_com_diffs)
-        anomalias_ignicao = detectar_anomalias_ignicao(df_com_diffs)
-        anomalias_velocidade = detectar_anomalias_velocidade(df_com_diffs)
-        anomalias_log_pos_igf = detectar_mensagens_log_pos_igf(df_com_diffs)
+        analise = analisar_dataframe(df)
+        df_com_diffs = analise['df_com_diffs']
 
         # Extrair IMEI do nome do arquivo ou da primeira linha
         nome_arquivo = os.path.basename(input_file)
@@ -454,118 +717,13 @@ def processar_arquivo(input_file: str, output_dir: str = "analises"):
                 imei = str(imei_coluna)
         
         # Gerar relatório TXT
-        relatorio_txt = []
-        relatorio_txt.append("="*100)
-        relatorio_txt.append("📋 RELATÓRIO COMPLETO DE ANÁLISE")
-        relatorio_txt.append("="*100)
-
-        relatorio_txt.append(f"📊 RESUMO GERAL:")
-        relatorio_txt.append(f"   IMEI: {imei}")
-        relatorio_txt.append(f"   📁 Total de Registros: {len(df)}")
-        relatorio_txt.append(f"   📅 Período: {df_com_diffs['Data/Hora Evento'].min()} até {df_com_diffs['Data/Hora Evento'].max()}")
-        
-        relatorio_txt.append(f"\n🚗 INFORMAÇÕES DO HODÔMETRO:")
-        if info_hodometro['distancia_percorrida'] is not None:
-            relatorio_txt.append(f"   🏁 Primeiro KM válido: {info_hodometro['primeiro_km']:.2f} km ({info_hodometro['data_primeiro']})")
-            relatorio_txt.append(f"   🏆 Último KM válido: {info_hodometro['ultimo_km']:.2f} km ({info_hodometro['data_ultimo']})")
-            relatorio_txt.append(f"   📏 Distância percorrida no período: {info_hodometro['distancia_percorrida']:.2f} km")
-            relatorio_txt.append(f"   📊 Total de registros válidos de hodômetro: {info_hodometro['total_registros_validos']}")
-        else:
-            relatorio_txt.append(f"   ⚠️ Não foi possível calcular a distância (dados insuficientes)")
-
-        relatorio_txt.append(f"\n🛣️ INFORMAÇÕES DAS VIAGENS:")
-        relatorio_txt.append(f"   ✅ Viagens completas (IGN→IGF): {info_viagens['total_viagens_completas']}")
-        relatorio_txt.append(f"   🔴 IGN sem IGF correspondente: {info_viagens['ign_sem_igf']}")
-        relatorio_txt.append(f"   🟠 IGF sem IGN anterior: {info_viagens['igf_sem_ign']}")
-        
-        if info_viagens['detalhes_viagens']:
-            relatorio_txt.append(f"   🚗 DETALHES DAS VIAGENS COMPLETAS:")
-            for viagem in info_viagens['detalhes_viagens']:
-                relatorio_txt.append(f"      {viagem['viagem_numero']:2d}. Início: {viagem['ignicao_ligada']}")
-                relatorio_txt.append(f"          Fim:    {viagem['ignicao_desligada']}")
-                relatorio_txt.append(f"          Duração: {viagem['duracao_formatada']} (Seq: {viagem['sequencia_ign']}→{viagem['sequencia_igf']})")
-        
-        if info_viagens['ign_orfaos']:
-            relatorio_txt.append(f"   🔴 IGN ÓRFÃOS (sem IGF correspondente):")
-            for i, ign in enumerate(info_viagens['ign_orfaos'], 1):
-                relatorio_txt.append(f"      {i:2d}. {ign['data_hora']} - Seq: {ign['sequencia']}")
-        
-        if info_viagens['igf_orfaos']:
-            relatorio_txt.append(f"   🟠 IGF ÓRFÃOS (sem IGN anterior):")
-            for i, igf in enumerate(info_viagens['igf_orfaos'], 1):
-                relatorio_txt.append(f"      {i:2d}. {igf['data_hora']} - Seq: {igf['sequencia']}")
-
-        relatorio_txt.append(f"\n🔄 REBOOTS DETECTADOS:")
-        relatorio_txt.append(f"   🔢 Total: {num_reboots}")
-        if lista_reboots:
-            for reboot in lista_reboots:
-                relatorio_txt.append(f"   📅 {reboot['Data_Hora']} - Seq: {reboot['Sequencia_Anterior']} → {reboot['Sequencia_Nova']}")
-        
-        relatorio_txt.append(f"\n⏰ ANOMALIAS DE INTERVALOS:")
-        relatorio_txt.append(f"   🎯 Posicionamento (esperado 3min ±2s): {len(anomalias_pos)} anomalias")
-        relatorio_txt.append(f"   💤 Modo Econômico (esperado 1h ±2s): {len(anomalias_eco)} anomalias")
-
-        if anomalias_pos:
-            relatorio_txt.append(f"   📍 DETALHES COMPLETOS - Posicionamento:")
-            for i, anom in enumerate(anomalias_pos, 1):
-                relatorio_txt.append(f"      {i:3d}. Seq {anom['Sequencia']} ({anom['Data_Hora']}): {anom['Tempo_Real']} (diff: {anom['Diferenca_Segundos']:.0f}s)")
-
-        if anomalias_eco:
-            relatorio_txt.append(f"   💤 DETALHES COMPLETOS - Modo Econômico:")
-            for i, anom in enumerate(anomalias_eco, 1):
-                relatorio_txt.append(f"      {i:3d}. Seq {anom['Sequencia']} ({anom['Data_Hora']}): {anom['Tempo_Real']} (diff: {anom['Diferenca_Segundos']:.0f}s)")
-
-        relatorio_txt.append(f"\n🔥 ANOMALIAS DE IGNIÇÃO:")
-        relatorio_txt.append(f"   🚨 Total: {len(anomalias_ignicao)} anomalias")
-        if anomalias_ignicao:
-            relatorio_txt.append(f"   🔥 DETALHES COMPLETOS - Ignição:")
-            for i, anom in enumerate(anomalias_ignicao, 1):
-                relatorio_txt.append(f"      {i:3d}. {anom['Tipo_Anomalia']}: Seq {anom['Sequencia_1']} → {anom['Sequencia_2']}")
-                relatorio_txt.append(f"           Data: {anom['Data_Hora_1']} → {anom['Data_Hora_2']}")
-                relatorio_txt.append(f"           Intervalo: {anom['Diferenca_Tempo']}")
-
-        relatorio_txt.append(f"\n🏃 ANOMALIAS DE VELOCIDADE:")
-        relatorio_txt.append(f"   🚨 Total: {len(anomalias_velocidade)} anomalias")
-        if anomalias_velocidade:
-            relatorio_txt.append(f"   🏃 DETALHES COMPLETOS - Velocidade:")
-            for i, anom in enumerate(anomalias_velocidade, 1):
-                relatorio_txt.append(f"      {i:3d}. {anom['Tipo_Anomalia']}: Seq {anom['Sequencia_1']} → {anom['Sequencia_2']}")
-                relatorio_txt.append(f"           Data: {anom['Data_Hora_1']} → {anom['Data_Hora_2']}")
-                relatorio_txt.append(f"           Intervalo: {anom['Diferenca_Tempo']}")
-
-        relatorio_txt.append(f"\n📝 MENSAGENS EM LOG APÓS IGF:")
-        relatorio_txt.append(f"   🚨 Total de ocorrências: {len(anomalias_log_pos_igf)}")
-        if anomalias_log_pos_igf:
-            relatorio_txt.append(f"   📝 DETALHES COMPLETOS - Mensagens em LOG após IGF:")
-            for i, anom in enumerate(anomalias_log_pos_igf, 1):
-                relatorio_txt.append(f"      {i:3d}. IGF (Seq {anom['IGF_Sequencia']}) em {anom['IGF_Data_Hora']}")
-                relatorio_txt.append(f"           → {anom['Total_Mensagens_LOG']} mensagens em LOG detectadas")
-                relatorio_txt.append(f"           → Sequências: {anom['Sequencias']}")
-                relatorio_txt.append(f"           → Período: {anom['Primeira_Mensagem_LOG']} até {anom['Ultima_Mensagem_LOG']}")
-
-        relatorio_txt.append(f"\n🎉 ANÁLISE CONCLUÍDA!")
-        relatorio_txt.append("="*100)
-        relatorio_txt.append("✅ RELATÓRIO FINALIZADO COM SUCESSO!")
-        relatorio_txt.append("="*100)
+        relatorio_txt = montar_relatorio(imei, len(df), analise)
 
         # Gerar nome base do arquivo
         nome_base = os.path.splitext(os.path.basename(input_file))[0]
+        salvar_analise(nome_base, relatorio_txt, df_com_diffs, output_dir)
         
-        # Criar diretório de saída
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Salvar relatório TXT
-        txt_output = os.path.join(output_dir, f"analise_{nome_base}.txt")
-        with open(txt_output, "w", encoding="utf-8") as f:
-            f.write("\n".join(relatorio_txt))
-        print(f"💾 Relatório TXT salvo: {txt_output}")
-        
-        # Salvar CSV processado
-        csv_output = os.path.join(output_dir, f"analise_{nome_base}.csv")
-        df_com_diffs.to_csv(csv_output, sep=",", index=False)
-        print(f"💾 CSV processado salvo: {csv_output}")
-        
-        print(f"✅ Processamento concluído com sucesso!\n")
+        debug(f"✅ Processamento concluído com sucesso!\n")
         return True
         
     except Exception as e:
@@ -575,13 +733,90 @@ def processar_arquivo(input_file: str, output_dir: str = "analises"):
         return False
 
 
-def processar_pasta(pasta_entrada: str, pasta_saida: str = "analises"):
+def ler_parquet_decodificado(pasta: str, imei: Optional[str] = None, colunas: Optional[List[str]] = COLUNAS_ANALISE,
+                             data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lê a saída Parquet particionada por IMEI e data (parquet_gt06.GravadorParquet)
+
+    Só as colunas pedidas e as partições dentro do filtro (IMEI, datas
+    AAAA-MM-DD inclusivas) são lidas do disco; colunas=None lê todas. Com
+    filtro de datas, a partição data=invalida fica de fora.
+    """
+    if ds is None:
+        raise ImportError("pyarrow é necessário para ler Parquet (pip install pyarrow)")
+    
+    particoes = ds.partitioning(pa.schema([('imei', pa.string()), ('data', pa.string())]), flavor='hive')
+    dataset = ds.dataset(pasta, format='parquet', partitioning=particoes)
+    
+    filtros = []
+    if imei is not None:
+        filtros.append(ds.field('imei') == str(imei))
+    if data_inicio is not None:
+        filtros.append(ds.field('data') >= data_inicio)
+    if data_fim is not None:
+        filtros.append(ds.field('data') <= data_fim)
+    if data_inicio is not None or data_fim is not None:
+        # Linhas sem data de inclusão válida não pertencem a nenhum período
+        filtros.append(ds.field('data') != PARTICAO_INVALIDA)
+    
+    filtro = None
+    for condicao in filtros:
+        filtro = condicao if filtro is None else filtro & condicao
+    
+    return dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+
+def processar_parquet(pasta_parquet: str, pasta_saida: str = "analises", imeis: Optional[List[str]] = None):
+    """
+    Gera os relatórios de cada IMEI a partir da saída Parquet
+
+    Lê apenas COLUNAS_ANALISE de cada partição de IMEI, sem passar por CSV.
+    """
+    if imeis is None:
+        imeis = sorted(nome.split('=', 1)[1] for nome in os.listdir(pasta_parquet) if nome.startswith('imei='))
+    
+    sucessos = 0
+    for imei in imeis:
+        debug(f"\n{'='*100}")
+        debug(f"🔍 PROCESSANDO: IMEI {imei} (Parquet)")
+        debug(f"{'='*100}")
+        
+        try:
+            df = ler_parquet_decodificado(pasta_parquet, imei)
+            debug(f"✅ Partição carregada: {len(df)} registros")
+            
+            analise = analisar_dataframe(df)
+            relatorio_txt = montar_relatorio(imei, len(df), analise)
+            salvar_analise(f"{imei}_decoded", relatorio_txt, analise['df_com_diffs'], pasta_saida)
+            sucessos += 1
+            
+        except Exception as e:
+            print(f"❌ Erro ao processar IMEI {imei}: {str(e)}")
+    
+    print(f"\n✅ IMEIs processados com sucesso: {sucessos}/{len(imeis)}")
+    return sucessos
+
+def _processar_arquivo_capturado(input_file: str, output_dir: str) -> Tuple[bool, str]:
+    """
+    Tarefa dos workers no modo paralelo de processar_pasta: executa
+    processar_arquivo com a saída do console (stdout e stderr) guardada em
+    memória, para ser impressa de uma vez pelo processo principal
+    """
+    saida = io.StringIO()
+    with redirect_stdout(saida), redirect_stderr(saida):
+        sucesso = processar_arquivo(input_file, output_dir)
+    return sucesso, saida.getvalue()
+
+def processar_pasta(pasta_entrada: str, pasta_saida: str = "analises", workers: Optional[int] = 1):
     """
     Processa todos os arquivos CSV de uma pasta.
     
     Args:
         pasta_entrada: Caminho da pasta com os arquivos CSV
         pasta_saida: Caminho da pasta onde serão salvos os resultados
+        workers: Número de processos; com mais de 1, os arquivos são
+            analisados em um pool de processos (None usa todos os núcleos).
+            No máximo 2 * workers arquivos ficam em andamento ao mesmo tempo
+            e a saída de cada arquivo é impressa inteira, na ordem dos arquivos
     """
     
     print("\n" + "="*100)
@@ -594,7 +829,7 @@ def processar_pasta(pasta_entrada: str, pasta_saida: str = "analises"):
         return
     
     # Buscar todos os arquivos CSV na pasta
-    arquivos_csv = glob.glob(os.path.join(pasta_entrada, "*.csv"))
+    arquivos_csv = sorted(glob.glob(os.path.join(pasta_entrada, "*.csv")))
     
     if not arquivos_csv:
         print(f"❌ Nenhum arquivo CSV encontrado na pasta: {pasta_entrada}")
@@ -606,23 +841,45 @@ def processar_pasta(pasta_entrada: str, pasta_saida: str = "analises"):
     print("="*100)
     
     # Processar cada arquivo
-    sucessos = 0
-    falhas = 0
+    falhas = []
     
-    for i, arquivo in enumerate(arquivos_csv, 1):
-        print(f"\n[{i}/{len(arquivos_csv)}] Processando: {os.path.basename(arquivo)}")
+    if workers is None or workers > 1:
+        # Janela deslizante: o arquivo mais antigo é impresso assim que termina
+        # e só então um novo é enviado, limitando os arquivos em memória
+        janela = 2 * (workers or os.cpu_count() or 1)
+        pendentes = deque()
         
-        if processar_arquivo(arquivo, pasta_saida):
-            sucessos += 1
-        else:
-            falhas += 1
+        def descarregar():
+            i, arquivo, tarefa = pendentes.popleft()
+            sucesso, saida = tarefa.result()
+            print(f"\n[{i}/{len(arquivos_csv)}] Processando: {os.path.basename(arquivo)}")
+            print(saida, end="")
+            if not sucesso:
+                falhas.append(os.path.basename(arquivo))
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for i, arquivo in enumerate(arquivos_csv, 1):
+                if len(pendentes) == janela:
+                    descarregar()
+                pendentes.append((i, arquivo, executor.submit(_processar_arquivo_capturado, arquivo, pasta_saida)))
+            while pendentes:
+                descarregar()
+    else:
+        for i, arquivo in enumerate(arquivos_csv, 1):
+            print(f"\n[{i}/{len(arquivos_csv)}] Processando: {os.path.basename(arquivo)}")
+            if not processar_arquivo(arquivo, pasta_saida):
+                falhas.append(os.path.basename(arquivo))
+    
+    sucessos = len(arquivos_csv) - len(falhas)
     
     # Resumo final
     print("\n" + "="*100)
     print("📊 RESUMO DO PROCESSAMENTO")
     print("="*100)
     print(f"✅ Arquivos processados com sucesso: {sucessos}")
-    print(f"❌ Arquivos com erro: {falhas}")
+    print(f"❌ Arquivos com erro: {len(falhas)}")
+    for nome in falhas:
+        print(f"   - {nome}")
     print(f"📁 Resultados salvos em: {pasta_saida}/")
     print("="*100)
     print("🎉 PROCESSAMENTO EM LOTE CONCLUÍDO!")
@@ -633,6 +890,7 @@ if __name__ == "__main__":
     # Configuração: defina aqui a pasta com os arquivos CSV
     PASTA_ENTRADA = "Decoder_GT06/decoded"  # Altere para sua pasta
     PASTA_SAIDA = "Decoder_GT06/analises"  # Pasta onde serão salvos os relatórios
+    WORKERS = 1  # Processos em paralelo (None usa todos os núcleos)
     
     # Executar processamento em lote
-    processar_pasta(PASTA_ENTRADA, PASTA_SAIDA)
\ No newline at end of file
+    processar_pasta(PASTA_ENTRADA, PASTA_SAIDA, WORKERS)
\ No newline at end of file
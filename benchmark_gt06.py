@@ -0,0 +1,347 @@
+import os
+import io
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime, timedelta
+from decoder_gt06V4 import parser_gt06V4, decode_course_info, crc_itu, registro_nao_decodificado
+from conversao_tempo import hex_to_timestamp, bytes_para_datetime_brasil, _texto_para_datetime
+from recordMessages import formatar_registro_csv, record_registro_decoded, gerenciador_escrita, process_gt06_folder
+from parquet_gt06 import GravadorParquet, pa
+from datas_gt06 import InterpretadorDataHora
+
+# Log real usado como fonte dos frames do corpus sintético
+AMOSTRA_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "869412074480093.csv")
+IMEI_AMOSTRA = "869412074480093"
+
+# Proporção de cada tipo de frame no corpus: protocolos (int), 'desconhecido' e 'corrompido'
+MIX_PADRAO = {
+    0x01: 0.02, 0x13: 0.55, 0x32: 0.25, 0x16: 0.08, 0x15: 0.02,
+    'desconhecido': 0.04, 'corrompido': 0.04,
+}
+
+# Protocolos com o bloco GPS (data/hora em [4:10], course em [20:22])
+PROTOCOLOS_GPS = frozenset([0x12, 0x16, 0x22, 0x26, 0x32])
+
+# Protocolo sem layout registrado, usado nos frames 'desconhecido'
+PROTOCOLO_DESCONHECIDO = 0x99
+
+def montar_frame(protocolo, conteudo, serial):
+    """Frame 0x7878 completo, com tamanho e CRC-ITU corretos"""
+    corpo = bytes((len(conteudo) + 5, protocolo)) + conteudo + serial.to_bytes(2, 'big')
+    return b'\x78\x78' + corpo + crc_itu(corpo).to_bytes(2, 'big') + b'\x0d\x0a'
+
+def carregar_amostra(caminho=AMOSTRA_PADRAO):
+    """Frames reais do log de amostra, agrupados por protocolo: {protocolo: [bytes]}"""
+    frames = {}
+    with open(caminho, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            frame = bytes.fromhex(linha['lmsmensagem'])
+            frames.setdefault(frame[3], []).append(frame)
+    return frames
+
+def _resposta_comando(rng, serial):
+    """Resposta de comando (0x15) no formato do GT06: tamanho, flag do servidor e texto"""
+    texto = rng.choice([b"Relay:ON", b"Relay:OFF", b"GPRS:OK", b"TIMER,30,3600#OK"])
+    conteudo = bytes((len(texto) + 4,)) + rng.randbytes(4) + texto + b'\x00\x02'
+    return montar_frame(0x15, conteudo, serial)
+
+def _corromper(frame, rng):
+    """Corrompe um frame real: bit trocado no conteúdo (CRC), truncado ou sem stop bit"""
+    frame = bytearray(frame)
+    modo = rng.random()
+    if modo < 0.6:
+        frame[rng.randrange(4, len(frame) - 4)] ^= 1 << rng.randrange(8)
+    elif modo < 0.8:
+        del frame[rng.randrange(5, len(frame) - 1):]
+    else:
+        frame[-1] = 0x00
+    return bytes(frame)
+
+def gerar_corpus(tamanho=100000, mix=None, semente=0, amostra=AMOSTRA_PADRAO):
+    """
+    Gera um corpus sintético de frames a partir dos frames reais da amostra
+
+    Frames de protocolos presentes na amostra são copiados dela; respostas
+    de comando (0x15), que não aparecem no log, e frames de protocolo
+    desconhecido são montados com tamanho e CRC válidos; frames corrompidos
+    são frames reais com um bit trocado, truncados ou sem stop bit.
+
+    Args:
+        tamanho: número de frames
+        mix: proporção de cada tipo (ver MIX_PADRAO); é normalizada
+        semente: semente do gerador, para corpora reprodutíveis
+
+    Returns:
+        list: (data/hora de inclusão, frame em hex) na ordem de chegada
+    """
+    mix = MIX_PADRAO if mix is None else mix
+    rng = random.Random(semente)
+    reais = carregar_amostra(amostra)
+    todos = [frame for frames in reais.values() for frame in frames]
+
+    tipos = list(mix)
+    tipos_sorteados = rng.choices(tipos, weights=[mix[tipo] for tipo in tipos], k=tamanho)
+
+    corpus = []
+    inclusao = datetime(2025, 10, 17)
+    for serial, tipo in enumerate(tipos_sorteados):
+        serial &= 0xFFFF
+        if tipo == 'corrompido':
+            frame = _corromper(rng.choice(todos), rng)
+        elif tipo == 'desconhecido':
+            frame = montar_frame(PROTOCOLO_DESCONHECIDO, rng.randbytes(rng.randint(4, 40)), serial)
+        elif tipo == 0x15:
+            frame = _resposta_comando(rng, serial)
+        elif tipo in reais:
+            frame = rng.choice(reais[tipo])
+        else:
+            raise ValueError(f"Protocolo 0x{tipo:02X} não existe na amostra {os.path.basename(amostra)}")
+
+        inclusao += timedelta(milliseconds=rng.randint(1000, 60000))
+        corpus.append((inclusao.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3], frame.hex().upper()))
+
+    return corpus
+
+def salvar_corpus(corpus, pasta, imei=IMEI_AMOSTRA):
+    """Grava o corpus como um log {imei}.csv com as colunas de entrada do decoder"""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{imei}.csv")
+    with open(caminho, "w", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["lmsserie", "lmsdatahorainc", "lmsmensagem"])
+        for inclusao, mensagem in corpus:
+            writer.writerow([imei, inclusao, mensagem])
+    return caminho
+
+def _limpar_caches():
+    # Cada repetição começa com os caches de data/hora vazios
+    for funcao in (bytes_para_datetime_brasil, _texto_para_datetime):
+        funcao.cache_clear()
+
+def medir(funcao, itens, repeticoes=3, preparar=None):
+    """
+    Mede funcao(item) sobre todos os itens
+
+    O tempo é o da melhor de `repeticoes` execuções. As alocações são medidas
+    em uma execução separada com tracemalloc, mantendo os resultados vivos:
+    blocos de memória alocados e retidos por item e pico de bytes por item.
+
+    Returns:
+        dict: itens, segundos, itens_por_segundo, blocos_por_item e
+            pico_bytes_por_item
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        _limpar_caches()
+        inicio = time.perf_counter()
+        for item in itens:
+            funcao(item)
+        tempos.append(time.perf_counter() - inicio)
+
+    if preparar:
+        preparar()
+    _limpar_caches()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    resultados = [funcao(item) for item in itens]
+    depois = tracemalloc.take_snapshot()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocos = sum(estatistica.count_diff for estatistica in depois.compare_to(antes, 'filename'))
+    del resultados
+
+    segundos = min(tempos)
+    total = len(itens) or 1
+    return {
+        'itens': len(itens),
+        'segundos': segundos,
+        'itens_por_segundo': len(itens) / segundos if segundos else None,
+        'blocos_por_item': blocos / total,
+        'pico_bytes_por_item': pico / total,
+    }
+
+def executar_benchmarks(tamanho=100000, mix=None, semente=0, repeticoes=3, amostra=AMOSTRA_PADRAO,
+                        tamanho_ponta_a_ponta=None):
+    """
+    Executa o conjunto de benchmarks do decoder sobre um corpus sintético
+
+    Mede parser_gt06V4, decode_course_info, hex_to_timestamp, os gravadores
+    (formatação CSV, record_registro_decoded e, com pyarrow, Parquet) e o
+    process_gt06_folder de ponta a ponta, com o mesmo corpus.
+
+    Returns:
+        dict: ambiente, parâmetros do corpus e resultados por benchmark
+    """
+    corpus = gerar_corpus(tamanho, mix, semente, amostra)
+    mensagens = [mensagem for _, mensagem in corpus]
+    linhas = [(mensagem, inclusao) for inclusao, mensagem in corpus]
+
+    frames_gps = [mensagem for mensagem in mensagens if int(mensagem[6:8], 16) in PROTOCOLOS_GPS
+                  and len(mensagem) >= 44]
+    courses = [mensagem[40:44] for mensagem in frames_gps]
+    datas_hora = [mensagem[8:20] for mensagem in frames_gps]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        registros = [parser_gt06V4(mensagem, IMEI_AMOSTRA, inclusao) or registro_nao_decodificado(IMEI_AMOSTRA, inclusao)
+                     for mensagem, inclusao in linhas]
+
+    resultados = {}
+    pasta = tempfile.mkdtemp(prefix="benchmark_gt06_")
+    try:
+        resultados['parser_gt06V4'] = medir(lambda linha: parser_gt06V4(linha[0], IMEI_AMOSTRA, linha[1]), linhas,
+                                            repeticoes)
+        resultados['decode_course_info'] = medir(decode_course_info, courses, repeticoes)
+        resultados['hex_to_timestamp'] = medir(hex_to_timestamp, datas_hora, repeticoes)
+        resultados['normalizar_data_hora'] = medir(InterpretadorDataHora().normalizar,
+                                                   [inclusao for inclusao, _ in corpus], repeticoes)
+        resultados['formatar_registro_csv'] = medir(formatar_registro_csv, registros, repeticoes)
+
+        pasta_decoded = os.path.join(pasta, "decoded")
+        os.makedirs(pasta_decoded)
+
+        def limpar_decoded():
+            gerenciador_escrita.fechar()
+            shutil.rmtree(pasta_decoded)
+            os.makedirs(pasta_decoded)
+
+        # Os gravadores acumulam em buffer: cada execução grava o corpus inteiro
+        # e inclui o flush final no tempo medido
+        def gravar_csv(registros_corpus):
+            for registro in registros_corpus:
+                record_registro_decoded(IMEI_AMOSTRA, registro, pasta_decoded)
+            gerenciador_escrita.flush()
+
+        resultados['record_registro_decoded'] = _por_frame(
+            medir(gravar_csv, [registros], repeticoes, limpar_decoded), len(registros))
+        gerenciador_escrita.fechar()
+
+        if pa is not None:
+            gravador = GravadorParquet(os.path.join(pasta, "parquet"))
+
+            def gravar_parquet(registros_corpus):
+                for registro in registros_corpus:
+                    gravador.escrever(IMEI_AMOSTRA, registro)
+                gravador.flush()
+
+            resultados['GravadorParquet'] = _por_frame(
+                medir(gravar_parquet, [registros], repeticoes, lambda: gravador.remover_imei(IMEI_AMOSTRA)),
+                len(registros))
+            gravador.fechar()
+
+        # Ponta a ponta: leitura do log, validação, decodificação e gravação do CSV
+        corpus_ponta = corpus[:tamanho_ponta_a_ponta] if tamanho_ponta_a_ponta else corpus
+        pasta_logs = os.path.join(pasta, "logs")
+        salvar_corpus(corpus_ponta, pasta_logs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultados['process_gt06_folder'] = medir(
+                lambda pasta_saida: process_gt06_folder(pasta_logs, pasta_saida), [os.path.join(pasta, "saida")],
+                repeticoes)
+        resultados['process_gt06_folder'] = _por_frame(resultados['process_gt06_folder'], len(corpus_ponta))
+    finally:
+        gerenciador_escrita.fechar()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    return {
+        'commit': _commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'corpus': {
+            'tamanho': tamanho,
+            'semente': semente,
+            'mix': {_nome_tipo(tipo): peso for tipo, peso in (mix or MIX_PADRAO).items()},
+            'amostra': os.path.basename(amostra),
+        },
+        'resultados': resultados,
+    }
+
+def _por_frame(resultado, frames):
+    # Uma chamada processa o corpus inteiro: converte as taxas para frames
+    return {
+        'itens': frames,
+        'segundos': resultado['segundos'],
+        'itens_por_segundo': frames / resultado['segundos'] if resultado['segundos'] else None,
+        'blocos_por_item': resultado['blocos_por_item'] / frames,
+        'pico_bytes_por_item': resultado['pico_bytes_por_item'] / frames,
+    }
+
+def _nome_tipo(tipo):
+    return f"0x{tipo:02X}" if isinstance(tipo, int) else tipo
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def salvar_resultados(resultados, caminho):
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+def comparar_resultados(anterior, atual):
+    """
+    Compara dois resultados de executar_benchmarks (ou JSONs salvos)
+
+    Returns:
+        dict: {benchmark: variação relativa de itens_por_segundo}; negativo
+            indica regressão
+    """
+    variacoes = {}
+    for nome, resultado in atual['resultados'].items():
+        base = anterior['resultados'].get(nome)
+        if base and base['itens_por_segundo'] and resultado['itens_por_segundo']:
+            variacoes[nome] = resultado['itens_por_segundo'] / base['itens_por_segundo'] - 1
+    return variacoes
+
+def imprimir_resultados(resultados, variacoes=None):
+    print(f"{'Benchmark':<26}{'itens/s':>14}{'blocos/item':>14}{'pico B/item':>14}{'variação':>11}")
+    for nome, resultado in resultados['resultados'].items():
+        variacao = f"{variacoes[nome]:+.1%}" if variacoes and nome in variacoes else ""
+        print(f"{nome:<26}{resultado['itens_por_segundo']:>14,.0f}{resultado['blocos_por_item']:>14.2f}"
+              f"{resultado['pico_bytes_por_item']:>14.1f}{variacao:>11}")
+
+
+# Exemplo de uso: python benchmark_gt06.py --tamanho 100000 --comparar benchmarks/anterior.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do decoder GT06 sobre um corpus sintético")
+    parser.add_argument("--tamanho", type=int, default=100000, help="frames no corpus")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--amostra", default=AMOSTRA_PADRAO, help="log CSV com os frames reais")
+    parser.add_argument("--mix", help='JSON com a proporção por tipo, ex.: {"0x13": 0.5, "corrompido": 0.1}')
+    parser.add_argument("--saida", help="arquivo JSON dos resultados (padrão: benchmarks/benchmark_{commit}.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    mix = None
+    if args.mix:
+        mix = {(int(tipo, 16) if tipo.startswith("0x") else tipo): peso for tipo, peso in json.loads(args.mix).items()}
+
+    resultados = executar_benchmarks(args.tamanho, mix, args.semente, args.repeticoes, args.amostra)
+    saida = args.saida or os.path.join("benchmarks", f"benchmark_{resultados['commit'] or 'local'}.json")
+    salvar_resultados(resultados, saida)
+
+    variacoes = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        if anterior['corpus'] != resultados['corpus']:
+            print(f"Aviso: corpus diferente do de {args.comparar}; as variações não são comparáveis")
+        variacoes = comparar_resultados(anterior, resultados)
+    imprimir_resultados(resultados, variacoes)
+    print(f"Resultados salvos em: {saida}")
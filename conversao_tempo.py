@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+def hex_to_timestamp(hex_value):
+    hex_value = str(hex_value)
+
+    try:
+        if len(hex_value) == 12:
+            # Formato padrão: 6 bytes (YYMMDDHHMMSS)
+            year = 2000 + int(hex_value[0:2], 16)
+            month = int(hex_value[2:4], 16)
+            day = int(hex_value[4:6], 16)
+            hour = int(hex_value[6:8], 16)
+            minute = int(hex_value[8:10], 16)
+            second = int(hex_value[10:12], 16)
+
+        elif len(hex_value) == 14:
+            # Formato alternativo: 7 bytes (YYYYMMDDHHMMSS)
+            year = int(hex_value[0:4], 16)
+            month = int(hex_value[4:6], 16)
+            day = int(hex_value[6:8], 16)
+            hour = int(hex_value[8:10], 16)
+            minute = int(hex_value[10:12], 16)
+            second = int(hex_value[12:14], 16)
+
+        else:
+            # Formato inválido
+            raise ValueError("Tamanho inválido de string hexadecimal para data/hora.")
+
+        # Validação segura de data
+        dt = datetime(year, month, day, hour, minute, second)
+
+    except Exception:
+        # Fallback seguro
+        dt = datetime(2020, 1, 1, 0, 0, 0)
+
+    return dt
+
+# Resultado de bytes_para_datetime_brasil para datas inválidas
+FALLBACK_DATETIME_BRASIL = datetime(2019, 12, 31, 21, 0, 0)
+
+@lru_cache(maxsize=65536)
+def bytes_para_datetime_brasil(raw):
+    """
+    Converte os 6 bytes UTC (YYMMDDHHMMSS) para o datetime no horário do
+    Brasil (UTC-3). O resultado é memoizado: devices reportando no mesmo
+    segundo reaproveitam o mesmo datetime.
+    """
+    try:
+        year, month, day, hour, minute, second = raw
+        dt = datetime(2000 + year, month, day, hour, minute, second)
+    except Exception:
+        return FALLBACK_DATETIME_BRASIL
+
+    return dt - timedelta(hours=3)
+
+@lru_cache(maxsize=65536)
+def _texto_para_datetime(texto):
+    """Interpreta o texto de data/hora UTC aceito por converter_para_brasil"""
+    # Caminho rápido para o formato mais comum, 'YYYY-MM-DD HH:MM:SS[.mmm|.ffffff]'
+    if len(texto) in (19, 23, 26) and texto[4] == '-' and texto[10] == ' ' \
+            and texto[13] == ':' and (len(texto) == 19 or texto[19] == '.'):
+        try:
+            return datetime.fromisoformat(texto)
+        except ValueError:
+            pass
+
+    formatos = [
+        "%Y%m%d%H%M%S",        # 20250408223920
+        "%Y-%m-%d %H:%M:%S",   # 2025-04-08 22:39:20
+        "%y-%m-%d %H:%M:%S",   # 25-04-08 22:39:20
+        "%Y-%m-%d %H:%M:%S.%f" # 2025-04-08 22:39:20.123456
+    ]
+    for formato in formatos:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+def converter_para_brasil(dt_utc):
+    """
+    Converte uma data/hora UTC (string ou datetime) para o timezone do Brasil (UTC-3)
+    e retorna no formato 'YYYY-MM-DD HH:MM:SS.mmm' (com milissegundos).
+    """
+
+    # Se for string, tenta converter
+    if isinstance(dt_utc, str):
+        dt = _texto_para_datetime(dt_utc)
+        if dt is None:
+            return f"Erro: Não foi possível converter '{dt_utc}' para datetime"
+        dt_utc = dt
+
+    # Se ainda não for datetime, erro
+    if not isinstance(dt_utc, datetime):
+        return f"Erro: Tipo inválido para conversão ({type(dt_utc)})"
+
+    # Ajuste fuso horário UTC -> Brasil (UTC-3)
+    dt_brasil = dt_utc - timedelta(hours=3)
+
+    # Retorna com milissegundos
+    return dt_brasil.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+def estatisticas_cache_timestamp():
+    """Retorna hits/misses dos caches de conversão de data/hora"""
+    estatisticas = {}
+    for nome, funcao in (('bytes_para_datetime_brasil', bytes_para_datetime_brasil),
+                         ('texto_para_datetime', _texto_para_datetime)):
+        info = funcao.cache_info()
+        estatisticas[nome] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'maxsize': info.maxsize,
+            'currsize': info.currsize,
+        }
+    return estatisticas
@@ -0,0 +1,136 @@
+from datetime import datetime
+import pandas as pd
+from metricas_gt06 import metricas, debug
+
+# Formato de data/hora gravado pelo decoder (milissegundos: [:-3] do %f)
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M:%S.%f"
+
+# Formatos aceitos nos logs (lmsdatahorainc) e nos CSVs decodificados, na
+# ordem em que são testados pela detecção
+FORMATOS_DATA_HORA = (
+    FORMATO_DATA_HORA,
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+)
+
+# Valores não vazios consultados para detectar o formato de uma coluna
+AMOSTRA_DETECCAO = 20
+
+datas_invalidas = metricas.contador("gt06_datas_invalidas_total",
+                                    "Datas/horas que não seguem nenhum formato conhecido, por coluna", "coluna")
+
+def _interpretar(texto, formato):
+    """datetime do texto no formato dado, ou None"""
+    # Os dois formatos ISO usam fromisoformat (em C), bem mais rápido que
+    # strptime; a conferência das posições garante que ele só aceite o que
+    # o strptime do mesmo formato aceitaria
+    if formato == FORMATO_DATA_HORA:
+        iso = 21 <= len(texto) <= 26 and texto[19] == '.' and texto[20:].isdigit()
+    elif formato == "%Y-%m-%d %H:%M:%S":
+        iso = len(texto) == 19
+    else:
+        iso = False
+
+    if iso and texto[4] == '-' and texto[7] == '-' and texto[10] == ' ' and texto[13] == ':' and texto[16] == ':':
+        try:
+            return datetime.fromisoformat(texto)
+        except ValueError:
+            return None
+
+    try:
+        return datetime.strptime(texto, formato)
+    except ValueError:
+        return None
+
+def interpretar_data_hora(texto, formato=FORMATO_DATA_HORA):
+    """datetime de um texto em um formato conhecido, ou None se não seguir o formato"""
+    return _interpretar(texto, formato)
+
+def texto_data_hora(dt):
+    """datetime no formato do decoder, 'YYYY-MM-DD HH:MM:SS.mmm'"""
+    return (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+            f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}")
+
+def detectar_formato(textos):
+    """
+    Formato de FORMATOS_DATA_HORA que interpreta mais valores da amostra
+
+    Returns:
+        str: o formato, ou None se nenhum valor da amostra for reconhecido
+    """
+    textos = [str(texto).strip() for texto in textos]
+    melhor, acertos_melhor = None, 0
+    for formato in FORMATOS_DATA_HORA:
+        acertos = sum(_interpretar(texto, formato) is not None for texto in textos)
+        if acertos == len(textos):
+            return formato
+        if acertos > acertos_melhor:
+            melhor, acertos_melhor = formato, acertos
+    return melhor
+
+class InterpretadorDataHora:
+    """
+    Normaliza as datas/horas de um arquivo, linha a linha, para FORMATO_DATA_HORA
+
+    O formato é detectado na primeira linha e reaproveitado nas seguintes;
+    só uma linha fora dele testa os demais formatos (e passa a valer o que
+    reconhecê-la). Texto em FORMATO_DATA_HORA com milissegundos é devolvido
+    sem reformatar. Linhas sem formato conhecido são contadas em
+    datas_invalidas e devolvidas como vieram.
+    """
+
+    def __init__(self, coluna="lmsdatahorainc"):
+        self.coluna = coluna
+        self.formato = None
+
+    def normalizar(self, texto):
+        texto = str(texto).strip()
+
+        if self.formato is not None:
+            dt = _interpretar(texto, self.formato)
+            if dt is not None:
+                if self.formato == FORMATO_DATA_HORA and len(texto) == 23:
+                    return texto
+                return texto_data_hora(dt)
+
+        for formato in FORMATOS_DATA_HORA:
+            if formato == self.formato:
+                continue
+            dt = _interpretar(texto, formato)
+            if dt is not None:
+                self.formato = formato
+                return texto_data_hora(dt)
+
+        datas_invalidas[self.coluna] += 1
+        debug(f"⚠️ Data/hora inválida em {self.coluna}: {texto!r}")
+        return texto
+
+def converter_coluna(textos, coluna, formato=None):
+    """
+    Converte uma coluna de texto para datetime com formato fixo (vetorizado)
+
+    Sem formato, ele é detectado em uma amostra dos primeiros valores não
+    vazios. Valores fora desse formato são tentados com os demais formatos;
+    os que continuam sem interpretação viram NaT e são contados em
+    datas_invalidas[coluna].
+    """
+    preenchidos = textos.notna()
+    if formato is None:
+        formato = detectar_formato(textos[preenchidos].iloc[:AMOSTRA_DETECCAO]) or FORMATO_DATA_HORA
+
+    convertidas = pd.to_datetime(textos, format=formato, errors="coerce")
+    falhas = convertidas.isna() & preenchidos
+
+    for outro in FORMATOS_DATA_HORA:
+        if not falhas.any():
+            break
+        if outro != formato:
+            convertidas = convertidas.fillna(pd.to_datetime(textos[falhas], format=outro, errors="coerce"))
+            falhas = convertidas.isna() & preenchidos
+
+    invalidas = int(falhas.sum())
+    if invalidas:
+        datas_invalidas[coluna] += invalidas
+        debug(f"⚠️ {invalidas} datas/horas inválidas em {coluna}")
+    return convertidas
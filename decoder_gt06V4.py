@@ -1,31 +1,52 @@
-from recordMessages import hex_to_timestamp, converter_para_brasil
+from conversao_tempo import bytes_para_datetime_brasil
 from datetime import timedelta
+import struct
+from collections import namedtuple
+from operator import itemgetter
+from time import perf_counter
+from metricas_gt06 import metricas, registrar_erro
 
-def decode_course_info(course_hex):
-    course_MSB = int(course_hex[0:2], 16)
-    course_LSB = int(course_hex[2:4], 16)
+# Colunas do CSV decodificado, na ordem em que são gravadas
+COLUNAS_DECODED = (
+    "Data/Hora Inclusão", "Data/Hora Evento", "IMEI", "Sequência",
+    "Tipo Mensagem", "Tipo Dispositivo", "Versão Protocolo", "Versão Firmware",
+    "Alimentação Externa", "Bateria interna interna", "Analog Input Status",
+    "Satélites", "Duração da Ignição",
+    "Velocidade", "Azimuth", "Latitude", "Longitude", "MCC", "MNC", "LAC", "Cell ID", "Realtime positioning", "GPS valido",
+    "Hodômetro Total", "Horímetro Total",
+    "Tipo de Rede", "Qualidade do sinal de GSM", "Terminal information", "Carregamento", "Funcionamento", "Alarmes internos", "Rastramento", "Gás/Oléo",
+)
 
-    msb_bin = bin(course_MSB)[2:].zfill(8)
-    lsb_bin = bin(course_LSB)[2:].zfill(8)
+# Registro tipado de uma mensagem, um campo por coluna de COLUNAS_DECODED.
+# Data/hora do evento é datetime (horário do Brasil), coordenadas e hodômetro
+# (km) são float, horímetro é inteiro em segundos e MCC/MNC/LAC, Tipo de Rede
+# e sinal GSM ficam como inteiros; campos ausentes no protocolo são None.
+RegistroGT06 = namedtuple('RegistroGT06', [
+    'data_hora_inclusao', 'data_hora_evento', 'imei', 'sequencia',
+    'tipo_mensagem', 'tipo_dispositivo', 'versao_protocolo', 'versao_firmware',
+    'alimentacao_externa', 'bateria_interna', 'analog_input_status',
+    'satelites', 'duracao_ignicao',
+    'velocidade', 'azimuth', 'latitude', 'longitude', 'mcc', 'mnc', 'lac', 'cell_id', 'realtime_positioning', 'gps_valido',
+    'hodometro_total', 'horimetro_total',
+    'tipo_rede', 'qualidade_gsm', 'terminal_information', 'carregamento', 'funcionamento', 'alarmes_internos', 'rastreamento', 'gas_oleo',
+], defaults=(None,) * len(COLUNAS_DECODED))
 
-    course_bin = msb_bin + lsb_bin
-    
-    realtime_gps = int(course_bin[2])
-    gps_posicionado = int(course_bin[3])
-    longitude_leste = int(course_bin[4])
-    latitude_norte = int(course_bin[5])
+def registro_nao_decodificado(imei, timestamp_inclusao=None):
+    """Registro gravado para frames cujo protocolo o parser não decodifica"""
+    return RegistroGT06(timestamp_inclusao, imei=imei, tipo_mensagem="Protocolo não decodificado")
+
+def decode_course_info(course_hex):
+    course = int(course_hex[0:2], 16) << 8 | int(course_hex[2:4], 16)
+    course_bin = f"{course:016b}"
 
-    course_bits = course_bin[6:16]
-    azimute = int(course_bits, 2)
-    
     return {
-        'azimute': azimute,
-        'realtime_gps': realtime_gps,
-        'gps_posicionado': gps_posicionado,
-        'longitude_leste': longitude_leste,
-        'latitude_norte': latitude_norte,
+        'azimute': course & 0x03FF,
+        'realtime_gps': course >> 13 & 1,
+        'gps_posicionado': course >> 12 & 1,
+        'longitude_leste': course >> 11 & 1,
+        'latitude_norte': course >> 10 & 1,
         'course_bin': course_bin,
-        'course_bits': course_bits
+        'course_bits': course_bin[6:16]
     }
 
 def apply_coordinate_signs(latitude, longitude, course_info):
@@ -38,344 +59,371 @@ def apply_coordinate_signs(latitude, longitude, course_info):
         
     return latitude, longitude
 
-def parser_gt06V4(hex_data, imei=None, timestamp_inclusao=None):
+NIVEIS_BATERIA = {
+    0: "Sem bateria",
+    1: "Bateria extremamente baixa",
+    2: "Bem baixa bateria",
+    3: "Bateria baixa",
+    4: "Bateria média",
+    5: "Bateria alta",
+    6: "Bateria extremamente alta",
+}
+
+TIPOS_ALARME = {
+    0x01: "Alerta de Pânico",
+    0x02: "Desconexão de bateria",
+    0x06: "Excesso de velocidade",
+    0x16: "Retorno de velocidade",
+    0xF2: "Suspeita de acidente",
+    0xF3: "Bloqueio",
+    0xF4: "Desbloqueio",
+    0xFE: "IGN",
+    0xFF: "IGF",
+}
+
+ALARMES_INTERNOS = {
+    0b000: "Normal",
+    0b001: "Shock alarm",
+    0b010: "Power cut alarm",
+    0b011: "Low battery alarm",
+    0b100: "SOS alarm",
+}
+
+def _tabela_256(mapa, padrao):
+    """Expande um mapa de rótulos em uma tupla indexada pelo valor do byte"""
+    return tuple(mapa.get(valor, padrao) for valor in range(256))
+
+def _status_terminal(byte):
+    """Decodifica o byte Terminal Information do protocolo 0x16/0x26"""
+    alarm_bits = byte >> 3 & 0x07
+    return (
+        f"{byte:08b}",
+        byte >> 1 & 1,
+        "Carregamento on" if byte & 0x04 else "Carregamento off",
+        "Normal" if byte & 0x01 else "Desativado",
+        ALARMES_INTERNOS.get(alarm_bits, f"{alarm_bits:03b}"),
+        "Rastreamento de GPS ativo" if byte & 0x40 else "Rastreamento de GPS inativo",
+        "Gás/oléo e eletricidade ativo" if byte & 0x80 else "Oléo e eletricidade inativo",
+    )
+
+# Tabelas de 256 posições, indexadas direto pelo byte lido do frame
+TABELA_BATERIA = _tabela_256(NIVEIS_BATERIA, "Desconhecido")
+TABELA_ALARMES = _tabela_256(TIPOS_ALARME, None)
+TABELA_STATUS_TERMINAL = tuple(_status_terminal(byte) for byte in range(256))
+
+def _tabela_crc_itu():
+    """Tabela do CRC-ITU (CRC-16/X.25, polinômio 0x1021 refletido = 0x8408)"""
+    tabela = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        tabela.append(crc)
+    return tuple(tabela)
+
+TABELA_CRC_ITU = _tabela_crc_itu()
+
+def crc_itu(dados):
     """
-    Parser GT06V4 que retorna dicionário com dados decodificados
-    
+    Calcula o CRC-ITU usado no campo Error Check do GT06
+
+    Para um frame completo, o CRC cobre do byte de tamanho até o serial,
+    ou seja, crc_itu(frame[2:-4]).
+    """
+    crc = 0xFFFF
+    for byte in dados:
+        crc = (crc >> 8) ^ TABELA_CRC_ITU[(crc ^ byte) & 0xFF]
+    return ~crc & 0xFFFF
+
+_protocolo_hex = "0x{:02X}".format
+
+# Métricas do parser (ver metricas_gt06); cada uma é um Counter por rótulo
+frames_por_protocolo = metricas.contador("gt06_frames_total", "Frames válidos recebidos pelo parser, por protocolo",
+                                         "protocolo", _protocolo_hex)
+protocolos_desconhecidos = metricas.contador("gt06_protocolos_desconhecidos_total",
+                                             "Frames com protocolo sem layout registrado", "protocolo", _protocolo_hex)
+frames_invalidos = metricas.contador("gt06_frames_invalidos_total", "Frames rejeitados por validar_frame, por motivo",
+                                     "motivo")
+mensagens_por_imei = metricas.contador("gt06_mensagens_imei_total", "Frames decodificados por IMEI", "imei")
+bytes_entrada = metricas.contador("gt06_bytes_entrada_total", "Bytes de frames recebidos pelo parser")
+latencia_decodificacao = metricas.histograma("gt06_latencia_decodificacao_segundos",
+                                             "Tempo de decodificação de um frame, por protocolo", "protocolo",
+                                             _protocolo_hex)
+
+# Menor frame possível: start bit (2), tamanho (1), protocolo (1), serial (2), CRC (2), stop bit (2)
+TAMANHO_MINIMO_FRAME = 10
+
+def validar_frame(frame):
+    """
+    Valida a moldura de um frame GT06 antes de decodificar qualquer campo
+
+    Confere start bit (0x7878, ou 0x7979 com tamanho de 2 bytes), stop bit
+    0x0D0A, o byte de tamanho contra o tamanho real e o CRC-ITU do campo
+    Error Check.
+
+    Returns:
+        str: motivo da rejeição ('curto', 'inicio', 'fim', 'tamanho', 'crc')
+            ou None se o frame é válido
+    """
+    tamanho = len(frame)
+    if tamanho < TAMANHO_MINIMO_FRAME:
+        return 'curto'
+
+    if frame[0] == 0x78 and frame[1] == 0x78:
+        esperado = frame[2] + 5
+    elif frame[0] == 0x79 and frame[1] == 0x79:
+        esperado = (frame[2] << 8 | frame[3]) + 6
+    else:
+        return 'inicio'
+
+    if frame[-2] != 0x0D or frame[-1] != 0x0A:
+        return 'fim'
+    if esperado != tamanho:
+        return 'tamanho'
+    if crc_itu(frame[2:-4]) != (frame[-4] << 8 | frame[-3]):
+        return 'crc'
+    return None
+
+class LayoutProtocolo:
+    """
+    Layout pré-compilado de um protocolo GT06
+
+    O struct cobre o frame a partir do start bit (big-endian); o offset 4
+    pula start bit (2), tamanho (1) e número do protocolo (1). O itemgetter
+    reordena os valores desempacotados para a ordem de campos esperada pelo
+    decodificador, entregando None para campos que o protocolo não possui.
+    """
+    __slots__ = ('numero', 'descricao', 'campos', 'formatos', 'struct', 'decodificar', 'extrair')
+
+    def __init__(self, numero, descricao, decodificar=None, campos=()):
+        self.numero = numero
+        self.descricao = descricao
+        self.campos = tuple(nome for nome, _ in campos)
+        self.formatos = tuple(fmt for _, fmt in campos)
+        self.decodificar = decodificar
+        self.struct = None
+        self.extrair = None
+
+        if decodificar is not None:
+            self.struct = struct.Struct(">4x" + "".join(fmt for _, fmt in campos))
+            ausente = len(self.campos)
+            indices = [self.campos.index(nome) if nome in self.campos else ausente
+                       for nome in decodificar.campos]
+            self.extrair = itemgetter(*indices)
+
+PROTOCOLOS = {}
+
+def registrar_protocolo(numero, descricao, decodificar=None, campos=()):
+    """Registra o layout de um protocolo na tabela de despacho do parser"""
+    PROTOCOLOS[numero] = LayoutProtocolo(numero, descricao, decodificar, campos)
+    return PROTOCOLOS[numero]
+
+def decodificador(*campos):
+    """Declara a ordem de campos que o decodificador recebe do layout"""
+    def registrar(func):
+        func.campos = campos
+        return func
+    return registrar
+
+@decodificador('imei', 'serial')
+def _decodificar_login(valores, imei, timestamp_inclusao=None):
+    imei_raw, serial_number = valores
+    imei_raw = imei_raw.hex().upper()
+
+    if imei_raw.startswith('0'):
+        imei = imei_raw[1:]
+    else:
+        imei = imei_raw
+
+    return RegistroGT06(timestamp_inclusao, None, imei, serial_number, "Login", 77, 'GT06V4')
+
+@decodificador('external_power', 'gsm_signal', 'serial')
+def _decodificar_heartbeat(valores, imei, timestamp_inclusao=None):
+    external_power, gsm_signal, serial_number = valores
+
+    return RegistroGT06(timestamp_inclusao, None, imei, serial_number, "Heartbeat", 77, 'GT06V4',
+                        bateria_interna=TABELA_BATERIA[external_power], qualidade_gsm=gsm_signal)
+
+@decodificador('send_time', 'gps', 'latitude', 'longitude', 'speed', 'course',
+               'mcc', 'mnc', 'lac', 'cell_id', 'acc', 'milage', 'external_power',
+               'acc_on_time', 'rat', 'serial')
+def _decodificar_posicao(valores, imei, timestamp_inclusao=None):
+    (send_time, gps, latitude, longitude, speed, course, mcc, mnc, lac, cell_id,
+     acc, milage, external_power, acc_on_time, rat, serial_number) = valores
+
+    satelites_in_use = gps & 0x0F
+    latitude = latitude / 1800000
+    longitude = longitude / 1800000
+
+    azimute = course & 0x3FF
+    if not course & 0x0400:  # latitude sul
+        latitude = -latitude
+    if course & 0x0800:  # longitude oeste
+        longitude = -longitude
+
+    if acc is None:
+        Tipo_mensagem = "Posicionamento GPS"
+    elif acc == 0:
+        Tipo_mensagem = "Modo econômico"
+    elif acc == 1:
+        Tipo_mensagem = "Posicionamento por tempo em movimento"
+    else:
+        raise ValueError(f"ACC inválido: {acc}")
+
+    return RegistroGT06(
+        timestamp_inclusao, bytes_para_datetime_brasil(send_time), imei, serial_number, Tipo_mensagem, 77, 'GT06V4',
+        None if rat is None else rat & 0x0FFF,
+        None if external_power is None else external_power * 0.01,
+        None, acc, satelites_in_use, None,
+        speed, azimute, latitude, longitude, mcc, mnc, lac, cell_id.hex().upper(), course >> 13 & 1, course >> 12 & 1,
+        None if milage is None else milage / 1000, acc_on_time,
+        None if rat is None else rat >> 12)
+
+@decodificador('send_time', 'gps', 'latitude', 'longitude', 'speed', 'course',
+               'mcc', 'mnc', 'lac', 'cell_id', 'terminal_status', 'external_power',
+               'alarm', 'milage', 'serial')
+def _decodificar_alarme(valores, imei, timestamp_inclusao=None):
+    (send_time, gps, latitude, longitude, speed, course, mcc, mnc, lac, cell_id,
+     terminal_status, external_power, alarm, milage, serial_number) = valores
+
+    satelites_in_use = gps >> 4
+    latitude = latitude / 1800000
+    longitude = longitude / 1800000
+
+    azimute = course & 0x3FF
+    if not course & 0x0400:  # latitude sul
+        latitude = -latitude
+    if course & 0x0800:  # longitude oeste
+        longitude = -longitude
+
+    (terminal_status, acc, charging_status, normal_working, alarm_status,
+     gps_status, gas_oil_status) = TABELA_STATUS_TERMINAL[terminal_status]
+
+    Tipo_mensagem = TABELA_ALARMES[alarm >> 8]
+    if Tipo_mensagem is None:
+        raise ValueError(f"Alarme desconhecido: {alarm >> 8:02X}")
+
+    return RegistroGT06(
+        timestamp_inclusao, bytes_para_datetime_brasil(send_time), imei, serial_number, Tipo_mensagem, 77, 'GT06V4',
+        None, None, TABELA_BATERIA[external_power], acc, satelites_in_use, None,
+        speed, azimute, latitude, longitude, mcc, mnc, lac, cell_id.hex().upper(), course >> 13 & 1, course >> 12 & 1,
+        None if milage is None else milage / 1000, None, None, None,
+        terminal_status, charging_status, normal_working, alarm_status, gps_status, gas_oil_status)
+
+# Campos comuns ao bloco GPS + LBS dos protocolos de posição e alarme
+_CAMPOS_GPS = [
+    ('send_time', '6s'), ('gps', 'B'), ('latitude', 'I'), ('longitude', 'I'),
+    ('speed', 'B'), ('course', 'H'),
+]
+
+registrar_protocolo(0x01, "Login", _decodificar_login, [
+    ('imei', '8s'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x13, "Heartbeat", _decodificar_heartbeat, [
+    ('terminal_info', 'B'), ('external_power', 'B'), ('gsm_signal', 'B'),
+    ('alarm', 'H'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x12, "GPS + LBS", _decodificar_posicao, _CAMPOS_GPS + [
+    ('mcc', 'H'), ('mnc', 'B'), ('lac', 'H'), ('cell_id', '3s'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x15, "Resposta de comando")  # Não salva, apenas retorna None
+
+registrar_protocolo(0x16, "GPS com alarme", _decodificar_alarme, _CAMPOS_GPS + [
+    ('lbs_len', 'B'), ('mcc', 'H'), ('mnc', 'B'), ('lac', 'H'), ('cell_id', '3s'),
+    ('terminal_status', 'B'), ('external_power', 'B'), ('gsm_signal', 'B'),
+    ('alarm', 'H'), ('milage', 'I'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x22, "GPS", _decodificar_posicao, _CAMPOS_GPS + [
+    ('mcc', 'H'), ('mnc', 'B'), ('lac', 'H'), ('cell_id', '3s'), ('acc', 'B'),
+    ('data_up', 'B'), ('gps_real', 'B'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x26, "Alarme", _decodificar_alarme, _CAMPOS_GPS + [
+    ('lbs_len', 'B'), ('mcc', 'H'), ('mnc', 'B'), ('lac', 'H'), ('cell_id', '3s'),
+    ('terminal_status', 'B'), ('external_power', 'B'), ('gsm_signal', 'B'),
+    ('alarm', 'H'), ('serial', 'H'),
+])
+
+registrar_protocolo(0x32, "GPS temporizado", _decodificar_posicao, _CAMPOS_GPS + [
+    ('mcc', 'H'), ('mnc', 'B'), ('lac', 'H'), ('cell_id', '4s'), ('acc', 'B'),
+    ('data_up', 'B'), ('gps_real', 'B'), ('milage', 'I'), ('external_power', 'H'),
+    ('acc_on_time', 'I'), ('rat', 'H'), ('serial', 'H'),
+])
+
+def parser_gt06V4_bytes(frame, imei=None, timestamp_inclusao=None, validar=True):
+    """
+    Parser GT06V4 para frames binários (bytes, bytearray ou memoryview)
+
+    O protocolo é resolvido com uma consulta na tabela PROTOCOLOS e os campos
+    são lidos direto dos offsets fixos do layout, sem converter o frame para
+    string hexadecimal. Frames longos (0x7979) têm os campos deslocados em
+    um byte pelo tamanho de 2 bytes.
+
     Args:
-        hex_data: dados hexadecimais da mensagem
+        frame: frame completo (7878/7979 ... 0D0A) em binário
         imei: IMEI do dispositivo
         timestamp_inclusao: timestamp personalizado do CSV (opcional)
-        
+        validar: confere a moldura e o CRC com validar_frame antes de
+            decodificar; frames inválidos são contados em frames_invalidos
+
     Returns:
-        dict: dicionário com dados decodificados ou None em caso de erro
+        RegistroGT06: mensagem decodificada (tipada, sem formatação CSV) ou
+            None em caso de erro
     """
-    protocol_number = hex_data[6:8]
+    if validar:
+        motivo = validar_frame(frame)
+        if motivo is not None:
+            frames_invalidos[motivo] += 1
+            return None
 
     try:
-        if protocol_number == "01":  # Login
-            # print("Login")
-            Tipo_mensagem = "Login"
-            p = 4
-            length = hex_data[p:p+2]
-            p += 2
-            protocol_number = hex_data[p:p+2]
-            p += 2
-            imei_raw = hex_data[p:p+16]
-            
-            if imei_raw.startswith('0') and len(imei_raw) == 16:
-                imei = imei_raw[1:]
-            else:
-                imei = imei_raw
-            p += 16
-            serial_number = hex_data[p:p+4]
-            serial_number = int(serial_number, 16)
-            p += 4
-            
-            return {
-                'tipo': Tipo_mensagem,
-                'imei': imei,
-                'serial': serial_number,
-                'message_type': Tipo_mensagem,
-                'protocol': 'GT06',
-                'dados': f",{imei},{serial_number},{Tipo_mensagem},77,GT06V4,,,," + ",,,,,,,"
-            }
-
-        elif protocol_number == "13":  # Heartbeat
-            # print("Heartbeat")
-            Tipo_mensagem = "Heartbeat"
-            p = 4
-            length = hex_data[p:p+2]
-            p += 2
-            protocol_number = hex_data[p:p+2]
-            p += 2
-            terminal_info = hex_data[p:p+2]
-            p += 2
-            external_power = hex_data[p:p+2]
-            p += 2
-            gsm_signal = hex_data[p:p+2]
-            p += 2
-            alarm = hex_data[p:p+4]
-            p += 4
-            serial_number = hex_data[p:p+4]
-            serial_number = int(serial_number, 16)
-            p += 4
-            
-            external_power = str(external_power)
-            
-            if external_power == '00':
-                external_power = "Sem bateria"
-            elif external_power == '01':
-                external_power = "Bateria extremamente baixa"
-            elif external_power == '02':
-                external_power = "Bem baixa bateria"
-            elif external_power == '03':
-                external_power = "Bateria baixa"
-            elif external_power == '04':
-                external_power = "Bateria média"
-            elif external_power == '05':
-                external_power = "Bateria alta"
-            elif external_power == '06':
-                external_power = "Bateria extremamente alta"
-            else: 
-                external_power = "Desconhecido"
-
-            return {
-                'tipo': Tipo_mensagem,
-                'imei': imei,
-                'serial': serial_number,
-                'message_type': Tipo_mensagem,
-                'protocol': 'GT06',
-                'power': external_power,
-                'gsm': gsm_signal,
-                'dados': f",{imei},{serial_number},{Tipo_mensagem},77,GT06V4,,,{external_power}," + f",,,,,,,,,,,,,,,,{gsm_signal}"
-            }
-       
-        elif protocol_number == "32":  # GPS Data
-            # print("Temporizadas")
-            p = 4
-            length = hex_data[p:p+2]
-            p += 2 
-            protocol_number = hex_data[p:p+2]
-            p += 2  
-            send_time = hex_data[p:p+12]
-            send_time_utc = hex_to_timestamp(send_time)
-            p += 12 
-            gps = hex_data[p:p+2]
-            satelites_in_use = int(str(gps[1]), 16)
-            p += 2
-            latitude = hex_data[p:p+8]
-            latitude = int(latitude, 16) / 1800000
-            p += 8
-            longitude = hex_data[p:p+8]
-            longitude = int(longitude, 16) / 1800000
-            p += 8
-            speed = hex_data[p:p+2]
-            speed = int(speed, 16) 
-            p += 2
-            
-            course = hex_data[p:p+4]
-            course_info = decode_course_info(course)
-            
-            latitude, longitude = apply_coordinate_signs(latitude, longitude, course_info)
-            
-            p += 4
-            mcc = hex_data[p:p+4]
-            p += 4
-            mnc = hex_data[p:p+2]
-            p += 2
-            lac = hex_data[p:p+4]   
-            p += 4
-            cell_id = hex_data[p:p+8]
-            p += 8
-            acc = hex_data[p:p+2]
-            acc = int(acc, 16) 
-            p += 2
-            data_up = hex_data[p:p+2]
-            p += 2
-            gps_real = hex_data[p:p+2]
-            p += 2
-            milage = hex_data[p:p+8]
-            milage = int(milage, 16) / 1000
-            p += 8
-            external_power = hex_data[p:p+4]
-            external_power = int(external_power, 16)* 0.01
-            external_power = float(external_power)
-            external_power_str = f"{external_power:.2f}" 
-            p += 4
-            acc_on_time = hex_data[p:p+8]
-            acc_on_time = int(acc_on_time, 16) 
-            tempo = timedelta(seconds=acc_on_time)
-            dias = tempo.days
-            horas, resto = divmod(tempo.seconds, 3600)
-            minutos, segundos = divmod(resto, 60)
-            tempo_formatado = f"{dias:02d}-{horas:02d}:{minutos:02d}:{segundos:02d}"
-
-            p += 8
-            rat = hex_data[p:p+4]
-            p += 4
-            rat_prefix = rat[:1]
-            rat_suffix = int(rat[1:], 16)
-            serial_number = hex_data[p:p+4]
-            serial_number = int(serial_number, 16) 
-            p += 4
-            
-            if acc == 0:
-                Tipo_mensagem = "Modo econômico"
-            elif acc == 1:
-                Tipo_mensagem = "Posicionamento por tempo em movimento"
-            
-            dados = f"{converter_para_brasil(send_time_utc)},{imei},{serial_number},{Tipo_mensagem},77,GT06V4,{rat_suffix},{external_power_str},," \
-                    f"{acc},{satelites_in_use},,{speed},{course_info['azimute']},{latitude:.6f},{longitude:.6f},{mcc},{mnc},{lac},{cell_id},{course_info['realtime_gps']},{course_info['gps_posicionado']},{milage},{tempo_formatado},{rat_prefix},"
-
-            return {
-                'tipo': Tipo_mensagem,
-                'imei': imei,
-                'serial': serial_number,
-                'message_type': Tipo_mensagem,
-                'protocol': 'GT06',
-                'latitude': latitude,
-                'longitude': longitude,
-                'speed': speed,
-                'dados': dados
-            }
-
-        elif protocol_number == "16":  # GPS Data with Alarm
-            # print("Alarm")
-            p = 4  
-            length = hex_data[p:p+2]
-            p += 2  
-            protocol_number = hex_data[p:p+2]
-            p += 2
-            send_time = hex_data[p:p+12]
-            send_time_utc = hex_to_timestamp(send_time)
-            p += 12
-            gps = hex_data[p:p+2]
-            satelites_in_use = int(str(gps[0]), 16)
-            p += 2
-            latitude = hex_data[p:p+8]
-            latitude = int(latitude, 16) / 1800000
-            p += 8
-            longitude = hex_data[p:p+8]
-            longitude = int(longitude, 16) / 1800000
-            p += 8
-            speed = hex_data[p:p+2]
-            speed = int(speed, 16)
-            p += 2
-            
-            course = hex_data[p:p+4]
-            course_info = decode_course_info(course)
-            
-            latitude, longitude = apply_coordinate_signs(latitude, longitude, course_info)
-            
-            p += 4
-            LBS_Len = hex_data[p:p+2]
-            p += 2
-            mcc = hex_data[p:p+4]
-            p += 4
-            mnc = hex_data[p:p+2]
-            p += 2
-            lac = hex_data[p:p+4]
-            p += 4
-            cell_id = hex_data[p:p+6]
-            p += 6
-            terminal_status = hex_data[p:p+2]
-            terminal_status = bin(int(terminal_status, 16))[2:].zfill(8)
-            normal_working = terminal_status[7]
-            acc_status = terminal_status[6]
-            charging_status = terminal_status[5]
-            alarm_status = terminal_status[2:5]
-            gps_status = terminal_status[1]
-            gas_oil_status = terminal_status[0]
-            
-            if normal_working == '1':
-                normal_working = "Normal"
-            elif normal_working == '0':
-                normal_working = "Desativado"
-            if acc_status == '1':
-                acc = '1'
-            elif acc_status == '0':
-                acc = '0'
-            if charging_status == '1':
-                charging_status = "Carregamento on"
-            elif charging_status == '0':
-                charging_status = "Carregamento off"
-            if alarm_status == '000':  
-                alarm_status = "Normal"
-            elif alarm_status == '001':
-                alarm_status = "Shock alarm"
-            elif alarm_status == '010':
-                alarm_status = "Power cut alarm"
-            elif alarm_status == '011':
-                alarm_status = "Low battery alarm"
-            elif alarm_status == '100':
-                alarm_status = "SOS alarm"
-            if gps_status == '1':
-                gps_status = "Rastreamento de GPS ativo"
-            elif gps_status == '0':
-                gps_status = "Rastreamento de GPS inativo"
-            if gas_oil_status == '1':
-                gas_oil_status = "Gás/oléo e eletricidade ativo"
-            elif gas_oil_status == '0':
-                gas_oil_status = "Oléo e eletricidade inativo"
-
-            p += 2
-            external_power = hex_data[p:p+2]
-            p += 2
-            gsm_signal = hex_data[p:p+2]
-            p += 2
-            alarm = hex_data[p:p+4] 
-            p += 4
-            milage = hex_data[p:p+8]
-            milage = int(milage, 16) / 1000
-            p += 8
-            serial_number = hex_data[p:p+4]
-            serial_number = int(serial_number, 16) 
-            p += 4
-            
-            alarm_str = str(alarm)
-            alarm_prefix = alarm_str[:2]
-            if alarm_prefix == "01":
-                Tipo_mensagem = "Alerta de Pânico"
-            elif alarm_prefix == "02":
-                Tipo_mensagem = "Desconexão de bateria"
-            elif alarm_prefix == "06":
-                Tipo_mensagem = "Excesso de velocidade"
-            elif alarm_prefix == "16":
-                Tipo_mensagem = "Retorno de velocidade"
-            elif alarm_prefix == "F2":
-                Tipo_mensagem = "Suspeita de acidente"
-            elif alarm_prefix == "F3":
-                Tipo_mensagem = "Bloqueio"
-            elif alarm_prefix == "F4":  
-                Tipo_mensagem = "Desbloqueio"
-            elif alarm_prefix == "FE":
-                Tipo_mensagem = "IGN"
-            elif alarm_prefix == "FF":
-                Tipo_mensagem = "IGF"
-
-            external_power = str(external_power)
-            if external_power == '00':
-                external_power = "Sem bateria"
-            elif external_power == '01':
-                external_power = "Bateria extremamente baixa"
-            elif external_power == '02':
-                external_power = "Bem baixa bateria"
-            elif external_power == '03':
-                external_power = "Bateria baixa"
-            elif external_power == '04':
-                external_power = "Bateria média"
-            elif external_power == '05':
-                external_power = "Bateria alta"
-            elif external_power == '06':
-                external_power = "Bateria extremamente alta"
-            else: 
-                external_power = "Desconhecido"
-
-            dados = f"{converter_para_brasil(send_time_utc)},{imei},{serial_number},{Tipo_mensagem},77,GT06V4,,,{external_power},{acc}," \
-                    f"{satelites_in_use},,{speed},{course_info['azimute']},{latitude:.6f},{longitude:.6f},{mcc},{mnc},{lac},{cell_id},{course_info['realtime_gps']},{course_info['gps_posicionado']},{milage},,,,{terminal_status},{charging_status},{normal_working},{alarm_status},{gps_status},{gas_oil_status}"
-
-            return {
-                'tipo': Tipo_mensagem,
-                'imei': imei,
-                'serial': serial_number,
-                'message_type': Tipo_mensagem,
-                'protocol': 'GT06',
-                'latitude': latitude,
-                'longitude': longitude,
-                'speed': speed,
-                'dados': dados
-            }
-
-        elif protocol_number == "15":  
-            # print("Ack comando")
-            # Protocolo 15 não salva, apenas retorna None
+        inicio = perf_counter()
+        bytes_entrada[None] += len(frame)
+        deslocamento = 1 if frame[0] == 0x79 else 0
+        protocolo = frame[3 + deslocamento]
+        layout = PROTOCOLOS.get(protocolo)
+
+        if layout is None:
+            protocolos_desconhecidos[protocolo] += 1
             return None
 
-        else:   
-            print(f"Protocolo {protocol_number} ainda não implementado.")
+        frames_por_protocolo[protocolo] += 1
+        if layout.decodificar is None:
             return None
+
+        valores = layout.struct.unpack_from(frame, deslocamento) + (None,)
+        registro = layout.decodificar(layout.extrair(valores), imei, timestamp_inclusao)
+
+        if registro is not None:
+            mensagens_por_imei[registro.imei] += 1
+        latencia_decodificacao[protocolo].observar(perf_counter() - inicio)
+        return registro
+
+    except Exception as e:
+        registrar_erro(e, f"Erro ao processar dados: {str(e)}")
+        return None
+
+def parser_gt06V4(hex_data, imei=None, timestamp_inclusao=None, validar=True):
+    """
+    Parser GT06V4 que retorna a mensagem decodificada como RegistroGT06
+    
+    Args:
+        hex_data: dados hexadecimais da mensagem
+        imei: IMEI do dispositivo
+        timestamp_inclusao: timestamp personalizado do CSV (opcional)
+        validar: confere moldura e CRC antes de decodificar
         
+    Returns:
+        RegistroGT06: mensagem decodificada ou None em caso de erro
+    """
+    try:
+        frame = bytes.fromhex(hex_data)
     except Exception as e:
-        print(f"Erro ao processar dados: {str(e)}")
-        return None
\ No newline at end of file
+        registrar_erro(e, f"Erro ao processar dados: {str(e)}")
+        return None
+
+    return parser_gt06V4_bytes(frame, imei, timestamp_inclusao, validar)
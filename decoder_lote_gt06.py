@@ -0,0 +1,323 @@
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from decoder_gt06V4 import (PROTOCOLOS, COLUNAS_DECODED, RegistroGT06, TABELA_BATERIA, TABELA_ALARMES,
+                            TABELA_STATUS_TERMINAL, TABELA_CRC_ITU, TAMANHO_MINIMO_FRAME,
+                            protocolos_desconhecidos, frames_invalidos, frames_por_protocolo,
+                            mensagens_por_imei, bytes_entrada,
+                            _decodificar_login, _decodificar_heartbeat, _decodificar_posicao, _decodificar_alarme)
+
+# Tipos big-endian equivalentes aos formatos do struct dos layouts
+TIPOS_NUMPY = {'B': 'u1', 'H': '>u2', 'I': '>u4'}
+
+# Mesmo fallback de bytes_para_datetime_brasil
+FALLBACK_DATETIME_BRASIL = np.datetime64('2019-12-31T21:00:00', 's')
+
+# Tabelas de rótulos como arrays, para indexar direto com os bytes do lote
+ROTULOS_BATERIA = np.array(TABELA_BATERIA, dtype=object)
+ROTULOS_ALARME = np.array(TABELA_ALARMES, dtype=object)
+ROTULOS_ACC = np.array(["Modo econômico", "Posicionamento por tempo em movimento", None], dtype=object)
+HEX_BYTE = np.array([f"{byte:02X}" for byte in range(256)], dtype=object)
+CRC_ITU = np.array(TABELA_CRC_ITU, dtype=np.uint16)
+
+# Motivos de validar_frame, na mesma ordem de precedência
+MOTIVOS_INVALIDO = ('curto', 'inicio', 'fim', 'tamanho', 'crc')
+
+def _coluna_status(posicao):
+    coluna = [status[posicao] for status in TABELA_STATUS_TERMINAL]
+    return np.array(coluna, dtype=np.uint8 if isinstance(coluna[0], int) else object)
+
+# Uma coluna por componente do Terminal Information (ver _status_terminal)
+COLUNAS_STATUS_TERMINAL = tuple(_coluna_status(posicao) for posicao in range(7))
+
+def dtype_layout(layout):
+    """dtype estruturado (big-endian) com um campo por campo do layout do protocolo"""
+    campos = [('cabecalho', 'u1', (4,))]  # start bit, tamanho e protocolo
+    for nome, fmt in zip(layout.campos, layout.formatos):
+        if fmt.endswith('s'):
+            campos.append((nome, 'u1', (int(fmt[:-1]),)))
+        else:
+            campos.append((nome, TIPOS_NUMPY[fmt]))
+    return np.dtype(campos)
+
+def _inteiro_bytes(matriz):
+    """Converte uma matriz (n, k) de bytes big-endian em inteiros"""
+    valores = np.zeros(len(matriz), dtype=np.uint32)
+    for coluna in range(matriz.shape[1]):
+        valores = valores << 8 | matriz[:, coluna]
+    return valores
+
+def data_hora_brasil_lote(send_time):
+    """
+    Versão vetorizada de bytes_para_datetime_brasil para uma matriz (n, 6)
+    de bytes YYMMDDHHMMSS em UTC; devolve datetime64[s] no horário do Brasil
+    """
+    ano = send_time[:, 0].astype(np.int64) + 2000
+    mes, dia, hora, minuto, segundo = (send_time[:, i].astype(np.int64) for i in range(1, 6))
+
+    mes_valido = (mes >= 1) & (mes <= 12)
+    inicio_mes = ((ano - 1970) * 12 + np.where(mes_valido, mes, 1) - 1).astype('M8[M]')
+    primeiro_dia = inicio_mes.astype('M8[D]')
+    dias_no_mes = ((inicio_mes + 1).astype('M8[D]') - primeiro_dia).astype(np.int64)
+
+    valido = mes_valido & (dia >= 1) & (dia <= dias_no_mes) & (hora < 24) & (minuto < 60) & (segundo < 60)
+
+    # Ajuste fuso horário UTC -> Brasil (UTC-3)
+    segundos = hora * 3600 + minuto * 60 + segundo - 3 * 3600
+    data_hora = (primeiro_dia + (dia - 1)).astype('M8[s]') + segundos.astype('m8[s]')
+    return np.where(valido, data_hora, FALLBACK_DATETIME_BRASIL)
+
+def _coordenadas(dados):
+    course = dados['course']
+    latitude = dados['latitude'] / 1800000
+    longitude = dados['longitude'] / 1800000
+
+    # Mesmos bits de decode_course_info: 0x0400 latitude norte, 0x0800 longitude oeste
+    latitude = np.where(course & 0x0400, latitude, -latitude)
+    longitude = np.where(course & 0x0800, -longitude, longitude)
+
+    return {
+        'data_hora_evento': data_hora_brasil_lote(dados['send_time']),
+        'velocidade': dados['speed'],
+        'azimuth': course & 0x3FF,
+        'latitude': latitude,
+        'longitude': longitude,
+        'mcc': dados['mcc'],
+        'mnc': dados['mnc'],
+        'lac': dados['lac'],
+        'cell_id': _inteiro_bytes(dados['cell_id']),
+        'realtime_positioning': (course >> 13 & 1).astype(np.uint8),
+        'gps_valido': (course >> 12 & 1).astype(np.uint8),
+    }
+
+def _login_lote(dados, imei):
+    imeis = np.array([''.join(linha) for linha in HEX_BYTE[dados['imei']]], dtype=object)
+    imeis = np.where([texto.startswith('0') for texto in imeis], [texto[1:] for texto in imeis], imeis)
+    valido = np.ones(len(dados), dtype=bool)
+    return valido, {'imei': imeis, 'tipo_mensagem': np.full(len(dados), "Login", dtype=object)}
+
+def _heartbeat_lote(dados, imei):
+    valido = np.ones(len(dados), dtype=bool)
+    return valido, {
+        'tipo_mensagem': np.full(len(dados), "Heartbeat", dtype=object),
+        'bateria_interna': ROTULOS_BATERIA[dados['external_power']],
+        'qualidade_gsm': dados['gsm_signal'],
+    }
+
+def _posicao_lote(dados, imei):
+    nomes = dados.dtype.names
+    colunas = _coordenadas(dados)
+    colunas['satelites'] = dados['gps'] & 0x0F
+
+    if 'acc' in nomes:
+        acc = dados['acc']
+        colunas['tipo_mensagem'] = ROTULOS_ACC[np.minimum(acc, 2)]
+        colunas['analog_input_status'] = acc
+        valido = acc <= 1
+    else:
+        colunas['tipo_mensagem'] = np.full(len(dados), "Posicionamento GPS", dtype=object)
+        valido = np.ones(len(dados), dtype=bool)
+
+    if 'milage' in nomes:
+        colunas['hodometro_total'] = dados['milage'] / 1000
+    if 'external_power' in nomes:
+        colunas['alimentacao_externa'] = dados['external_power'] * 0.01
+    if 'acc_on_time' in nomes:
+        colunas['horimetro_total'] = dados['acc_on_time']
+    if 'rat' in nomes:
+        colunas['versao_firmware'] = dados['rat'] & 0x0FFF
+        colunas['tipo_rede'] = (dados['rat'] >> 12).astype(np.uint8)
+
+    return valido, colunas
+
+def _alarme_lote(dados, imei):
+    colunas = _coordenadas(dados)
+    colunas['satelites'] = dados['gps'] >> 4
+
+    tipos = ROTULOS_ALARME[dados['alarm'] >> 8]
+    colunas['tipo_mensagem'] = tipos
+    colunas['bateria_interna'] = ROTULOS_BATERIA[dados['external_power']]
+
+    status = dados['terminal_status']
+    for nome, tabela in zip(('terminal_information', 'analog_input_status', 'carregamento', 'funcionamento',
+                             'alarmes_internos', 'rastreamento', 'gas_oleo'), COLUNAS_STATUS_TERMINAL):
+        colunas[nome] = tabela[status]
+
+    if 'milage' in dados.dtype.names:
+        colunas['hodometro_total'] = dados['milage'] / 1000
+
+    return tipos != None, colunas
+
+# Versão vetorizada de cada decodificador escalar do registro de protocolos
+DECODIFICADORES_LOTE = {
+    _decodificar_login: _login_lote,
+    _decodificar_heartbeat: _heartbeat_lote,
+    _decodificar_posicao: _posicao_lote,
+    _decodificar_alarme: _alarme_lote,
+}
+
+def validar_matriz(matriz):
+    """
+    Versão vetorizada de validar_frame para uma matriz (n, tamanho) de
+    frames completos de mesmo tamanho
+
+    Returns:
+        np.ndarray: código do motivo por frame (índice em MOTIVOS_INVALIDO)
+            ou -1 para frames válidos
+    """
+    n, tamanho = matriz.shape
+    if tamanho < TAMANHO_MINIMO_FRAME:
+        return np.zeros(n, dtype=np.int8)
+
+    curto = (matriz[:, 0] == 0x78) & (matriz[:, 1] == 0x78)
+    longo = (matriz[:, 0] == 0x79) & (matriz[:, 1] == 0x79)
+    fim = (matriz[:, -2] == 0x0D) & (matriz[:, -1] == 0x0A)
+
+    # 0x7878: tamanho em 1 byte (total - 5); 0x7979: em 2 bytes (total - 6)
+    esperado = np.where(longo, (matriz[:, 2].astype(np.int64) << 8 | matriz[:, 3]) + 6, matriz[:, 2].astype(np.int64) + 5)
+
+    crc = np.full(n, 0xFFFF, dtype=np.uint16)
+    for coluna in range(2, tamanho - 4):
+        crc = (crc >> 8) ^ CRC_ITU[(crc ^ matriz[:, coluna]) & 0xFF]
+    crc_frame = matriz[:, -4].astype(np.uint16) << 8 | matriz[:, -3]
+
+    return np.select([~(curto | longo), ~fim, esperado != tamanho, ~crc & 0xFFFF != crc_frame],
+                     [1, 2, 3, 4], -1).astype(np.int8)
+
+def _agrupar_por_tamanho(frames):
+    """Frames como matrizes (n, tamanho) de bytes, uma por tamanho de frame"""
+    if isinstance(frames, np.ndarray):
+        return {frames.shape[1]: (np.arange(len(frames)), frames)}
+
+    grupos = defaultdict(list)
+    for indice, frame in enumerate(frames):
+        grupos[len(frame)].append(indice)
+
+    matrizes = {}
+    for tamanho, indices in grupos.items():
+        buffer = b''.join(bytes(frames[indice]) for indice in indices)
+        matrizes[tamanho] = (np.array(indices, dtype=np.intp),
+                             np.frombuffer(buffer, dtype=np.uint8).reshape(len(indices), tamanho))
+    return matrizes
+
+def _agrupar_por_protocolo(frames, validar=True):
+    """
+    Frames agrupados por byte de protocolo, como (índices, matriz)
+
+    Com validar, frames inválidos são contados em frames_invalidos e
+    descartados. Frames 0x7979 entram sem o primeiro byte, para que o
+    protocolo e os campos fiquem nas mesmas posições dos frames 0x7878.
+    """
+    grupos = defaultdict(list)
+    for tamanho, (indices, matriz) in _agrupar_por_tamanho(frames).items():
+        bytes_entrada[None] += matriz.size
+        if validar:
+            motivos = validar_matriz(matriz)
+            for codigo, total in zip(*np.unique(motivos[motivos >= 0], return_counts=True)):
+                frames_invalidos[MOTIVOS_INVALIDO[codigo]] += int(total)
+            validos = motivos < 0
+            indices, matriz = indices[validos], matriz[validos]
+        if matriz.shape[1] < 4:
+            continue
+
+        longo = matriz[:, 0] == 0x79
+        partes = [(indices[~longo], matriz[~longo])]
+        if longo.any():
+            partes.append((indices[longo], matriz[longo, 1:]))
+
+        for indices_parte, matriz_parte in partes:
+            protocolos = matriz_parte[:, 3]
+            for protocolo in np.unique(protocolos):
+                selecao = protocolos == protocolo
+                grupos[int(protocolo)].append((indices_parte[selecao], matriz_parte[selecao]))
+    return grupos
+
+def _matriz_grupo(partes, tamanho):
+    """Frames do grupo cortados no tamanho do layout, como matriz contígua de bytes"""
+    # Frames truncados não cabem no layout, como no unpack_from do parser
+    partes = [(indices, matriz[:, :tamanho]) for indices, matriz in partes if matriz.shape[1] >= tamanho]
+    if not partes:
+        return np.empty(0, dtype=np.intp), np.empty((0, tamanho), dtype=np.uint8)
+    indices = np.concatenate([indices for indices, _ in partes])
+    return indices, np.ascontiguousarray(np.concatenate([matriz for _, matriz in partes]))
+
+def decodificar_lote(frames, imei=None, validar=True):
+    """
+    Decodifica um lote de frames GT06 de forma vetorizada
+
+    Os frames são agrupados pelo byte de protocolo e cada grupo é lido como
+    um array estruturado NumPy (dtype_layout), com todos os campos
+    decodificados por operações em array, em vez de um frame por vez.
+
+    Args:
+        frames: lista de frames em binário (bytes/bytearray/memoryview) ou
+            matriz uint8 (n, largura) com um frame por linha
+        imei: IMEI do dispositivo (a coluna imei dos logins vem do frame)
+        validar: confere moldura, tamanho e CRC de todos os frames com
+            validar_matriz antes de decodificar; os inválidos são contados
+            em frames_invalidos. Sem validar, a matriz pode ter colunas de
+            preenchimento após o fim de cada frame.
+
+    Returns:
+        dict: {protocolo: {coluna: np.ndarray}} com as colunas nomeadas como
+            os campos de RegistroGT06 e 'indice', a posição de cada linha em
+            frames. Frames que parser_gt06V4_bytes descartaria (corrompidos,
+            protocolo desconhecido ou sem decodificador, truncados, ACC ou
+            alarme inválidos) não aparecem no resultado.
+    """
+    lotes = {}
+
+    for protocolo, partes in _agrupar_por_protocolo(frames, validar).items():
+        layout = PROTOCOLOS.get(protocolo)
+        if layout is None:
+            protocolos_desconhecidos[protocolo] += sum(len(indices) for indices, _ in partes)
+            continue
+        frames_por_protocolo[protocolo] += sum(len(indices) for indices, _ in partes)
+        if layout.decodificar is None:
+            continue
+
+        indices, matriz = _matriz_grupo(partes, layout.struct.size)
+        dados = matriz.view(dtype_layout(layout)).ravel()
+
+        valido, colunas = DECODIFICADORES_LOTE[layout.decodificar](dados, imei)
+        lote = {'indice': indices[valido], 'sequencia': dados['serial'][valido]}
+        for nome, valores in colunas.items():
+            lote[nome] = valores[valido]
+        if 'imei' in lote:
+            mensagens_por_imei.update(lote['imei'].tolist())
+        else:
+            lote['imei'] = np.full(len(lote['indice']), imei, dtype=object)
+            mensagens_por_imei[imei] += len(lote['indice'])
+        lotes[protocolo] = lote
+
+    return lotes
+
+def lote_para_dataframe(lotes, timestamp_inclusao=None):
+    """
+    Junta os grupos de decodificar_lote em um DataFrame na ordem dos frames
+
+    As colunas têm os nomes do CSV decodificado; Cell ID é formatado em hex
+    com a largura do protocolo, como nos registros de parser_gt06V4.
+    """
+    partes = []
+    for protocolo, lote in lotes.items():
+        if not len(lote['indice']):
+            continue
+        lote = dict(lote)
+        if 'cell_id' in lote:
+            largura = PROTOCOLOS[protocolo].formatos[PROTOCOLOS[protocolo].campos.index('cell_id')]
+            formato = f"{{:0{int(largura[:-1]) * 2}X}}"
+            lote['cell_id'] = np.array([formato.format(valor) for valor in lote['cell_id'].tolist()], dtype=object)
+        partes.append(pd.DataFrame(lote))
+
+    if not partes:
+        return pd.DataFrame(columns=list(COLUNAS_DECODED))
+
+    df = pd.concat(partes, ignore_index=True).sort_values('indice', kind='stable').set_index('indice')
+    df['data_hora_inclusao'] = timestamp_inclusao
+    df['tipo_dispositivo'] = 77
+    df['versao_protocolo'] = 'GT06V4'
+    df = df.reindex(columns=list(RegistroGT06._fields))
+    df.columns = list(COLUNAS_DECODED)
+    df.index.name = None
+    return df
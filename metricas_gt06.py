@@ -0,0 +1,193 @@
+import os
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+# Limites (em segundos) dos buckets do histograma de latência de decodificação
+LIMITES_LATENCIA = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+
+# Mensagens por linha/frame só vão para o console no nível de debug (GT06_DEBUG=1)
+DEBUG = os.environ.get("GT06_DEBUG", "") not in ("", "0")
+
+def ativar_debug(ativo=True):
+    """Liga ou desliga as mensagens de diagnóstico por linha/frame"""
+    global DEBUG
+    DEBUG = ativo
+
+def debug(mensagem):
+    """print() apenas no nível de debug"""
+    if DEBUG:
+        print(mensagem)
+
+class Histograma:
+    """Contagens por bucket (limites superiores), soma e total das observações"""
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+class RegistroMetricas:
+    """
+    Registro de métricas do decoder: contadores e histogramas com um rótulo
+
+    Cada contador é um Counter comum indexado pelo valor do rótulo (None
+    para métricas sem rótulo), então o caminho quente só faz
+    contador[chave] += 1. Os valores podem ser lidos com resumo(), como
+    texto no formato Prometheus com texto_prometheus() ou, entre processos,
+    com instantaneo()/diferenca()/mesclar().
+    """
+
+    def __init__(self):
+        self._contadores = {}
+        self._histogramas = {}
+
+    def contador(self, nome, descricao, rotulo=None, formatar=str):
+        """Registra (ou recupera) um contador e devolve o Counter dos valores"""
+        if nome not in self._contadores:
+            self._contadores[nome] = (descricao, rotulo, formatar, Counter())
+        return self._contadores[nome][3]
+
+    def histograma(self, nome, descricao, rotulo=None, formatar=str, limites=LIMITES_LATENCIA):
+        """Registra (ou recupera) um histograma; devolve o dict {rótulo: Histograma}"""
+        if nome not in self._histogramas:
+            self._histogramas[nome] = (descricao, rotulo, formatar, defaultdict(lambda: Histograma(limites)))
+        return self._histogramas[nome][3]
+
+    def zerar(self):
+        for *_, valores in self._contadores.values():
+            valores.clear()
+        for *_, valores in self._histogramas.values():
+            valores.clear()
+
+    def instantaneo(self):
+        """Cópia dos valores atuais, serializável entre processos"""
+        return {
+            'contadores': {nome: dict(valores) for nome, (*_, valores) in self._contadores.items()},
+            'histogramas': {nome: {chave: (list(h.contagens), h.soma, h.total) for chave, h in valores.items()}
+                            for nome, (*_, valores) in self._histogramas.items()},
+        }
+
+    def diferenca(self, anterior):
+        """Valores acumulados desde um instantaneo() anterior"""
+        atual = self.instantaneo()
+        for nome, valores in atual['contadores'].items():
+            antes = anterior['contadores'].get(nome, {})
+            atual['contadores'][nome] = {chave: total - antes.get(chave, 0) for chave, total in valores.items()
+                                         if total != antes.get(chave, 0)}
+        for nome, valores in atual['histogramas'].items():
+            antes = anterior['histogramas'].get(nome, {})
+            diferencas = {}
+            for chave, (contagens, soma, total) in valores.items():
+                contagens_antes, soma_antes, total_antes = antes.get(chave, ([0] * len(contagens), 0.0, 0))
+                if total != total_antes:
+                    diferencas[chave] = ([a - b for a, b in zip(contagens, contagens_antes)],
+                                         soma - soma_antes, total - total_antes)
+            atual['histogramas'][nome] = diferencas
+        return atual
+
+    def mesclar(self, dados):
+        """Soma os valores de um instantaneo()/diferenca() de outro processo"""
+        for nome, valores in dados['contadores'].items():
+            if nome in self._contadores:
+                self._contadores[nome][3].update(valores)
+        for nome, valores in dados['histogramas'].items():
+            if nome not in self._histogramas:
+                continue
+            histogramas = self._histogramas[nome][3]
+            for chave, (contagens, soma, total) in valores.items():
+                histograma = histogramas[chave]
+                histograma.contagens = [a + b for a, b in zip(histograma.contagens, contagens)]
+                histograma.soma += soma
+                histograma.total += total
+
+    def resumo(self):
+        """
+        Valores atuais por métrica
+
+        Returns:
+            dict: {contador: {rótulo: total}} e, para os histogramas,
+                {histograma: {rótulo: {'total', 'soma', 'media'}}}
+        """
+        resultado = {}
+        for nome, (_, _, formatar, valores) in self._contadores.items():
+            resultado[nome] = {(None if chave is None else formatar(chave)): total for chave, total in valores.items()}
+        for nome, (_, _, formatar, valores) in self._histogramas.items():
+            resultado[nome] = {(None if chave is None else formatar(chave)): {
+                'total': h.total, 'soma': h.soma, 'media': h.soma / h.total if h.total else 0.0,
+            } for chave, h in valores.items()}
+        return resultado
+
+    def texto_resumo(self):
+        """Resumo legível de uma linha por métrica, para o console"""
+        linhas = []
+        for nome, valores in self.resumo().items():
+            if not valores:
+                continue
+            if all(isinstance(valor, dict) for valor in valores.values()):
+                partes = [f"{chave or 'total'}: {valor['total']} ({valor['media'] * 1e6:.1f} µs)"
+                          for chave, valor in sorted(valores.items(), key=lambda item: str(item[0]))]
+            else:
+                partes = [f"{chave or 'total'}: {valor}"
+                          for chave, valor in sorted(valores.items(), key=lambda item: -item[1])]
+            linhas.append(f"{nome}: {', '.join(partes)}")
+        return "\n".join(linhas)
+
+    def texto_prometheus(self):
+        """Todas as métricas no formato texto de exposição do Prometheus"""
+        linhas = []
+        for nome, (descricao, rotulo, formatar, valores) in self._contadores.items():
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} counter")
+            for chave, total in valores.items():
+                linhas.append(f"{nome}{_rotulos(rotulo, chave, formatar)} {total}")
+
+        for nome, (descricao, rotulo, formatar, valores) in self._histogramas.items():
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} histogram")
+            for chave, h in valores.items():
+                acumulado = 0
+                for limite, contagem in zip(h.limites + (float('inf'),), h.contagens):
+                    acumulado += contagem
+                    le = '+Inf' if limite == float('inf') else repr(limite)
+                    linhas.append(f"{nome}_bucket{_rotulos(rotulo, chave, formatar, le)} {acumulado}")
+                linhas.append(f"{nome}_sum{_rotulos(rotulo, chave, formatar)} {h.soma!r}")
+                linhas.append(f"{nome}_count{_rotulos(rotulo, chave, formatar)} {h.total}")
+
+        return "\n".join(linhas) + "\n"
+
+    def salvar_prometheus(self, caminho):
+        """
+        Grava texto_prometheus() em um arquivo (textfile collector do
+        node_exporter); a troca é atômica para não expor arquivo pela metade
+        """
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
+
+def _rotulos(rotulo, chave, formatar, le=None):
+    pares = []
+    if rotulo is not None and chave is not None:
+        valor = formatar(chave).replace('\\', '\\\\').replace('"', '\\"')
+        pares.append(f'{rotulo}="{valor}"')
+    if le is not None:
+        pares.append(f'le="{le}"')
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+# Registro compartilhado por decoder, gravação e servidor
+metricas = RegistroMetricas()
+
+erros = metricas.contador("gt06_erros_total", "Exceções no decoder e na gravação, por classe", "classe")
+bytes_saida = metricas.contador("gt06_bytes_saida_total", "Bytes gravados ou enviados, por destino", "destino")
+
+def registrar_erro(excecao, mensagem):
+    """Conta a exceção pela classe; a mensagem só aparece no nível de debug"""
+    erros[type(excecao).__name__] += 1
+    debug(mensagem)
@@ -0,0 +1,134 @@
+import os
+import shutil
+import uuid
+from collections import defaultdict
+import pandas as pd
+from decoder_gt06V4 import COLUNAS_DECODED
+from datas_gt06 import FORMATO_DATA_HORA, interpretar_data_hora
+
+# pyarrow é opcional: sem ele, apenas a saída em CSV fica disponível
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Partição das linhas cuja data/hora de inclusão não pôde ser interpretada
+PARTICAO_INVALIDA = "invalida"
+
+def esquema_decoded():
+    """Esquema Arrow das colunas do CSV decodificado, com tipos nativos"""
+    if pa is None:
+        raise ImportError("pyarrow é necessário para gravar Parquet (pip install pyarrow)")
+
+    tipos = {
+        "Data/Hora Inclusão": pa.timestamp('ms'),
+        "Data/Hora Evento": pa.timestamp('ms'),
+        "IMEI": pa.string(),
+        "Sequência": pa.uint16(),
+        "Tipo Mensagem": pa.string(),
+        "Tipo Dispositivo": pa.uint8(),
+        "Versão Protocolo": pa.string(),
+        "Versão Firmware": pa.uint16(),
+        "Alimentação Externa": pa.float32(),
+        "Bateria interna interna": pa.string(),
+        "Analog Input Status": pa.uint8(),
+        "Satélites": pa.uint8(),
+        "Duração da Ignição": pa.uint32(),
+        "Velocidade": pa.uint8(),
+        "Azimuth": pa.uint16(),
+        "Latitude": pa.float64(),
+        "Longitude": pa.float64(),
+        "MCC": pa.uint16(),
+        "MNC": pa.uint8(),
+        "LAC": pa.uint16(),
+        "Cell ID": pa.string(),
+        "Realtime positioning": pa.uint8(),
+        "GPS valido": pa.uint8(),
+        "Hodômetro Total": pa.float64(),
+        "Horímetro Total": pa.uint32(),
+        "Tipo de Rede": pa.uint8(),
+        "Qualidade do sinal de GSM": pa.uint8(),
+        "Terminal information": pa.string(),
+        "Carregamento": pa.string(),
+        "Funcionamento": pa.string(),
+        "Alarmes internos": pa.string(),
+        "Rastramento": pa.string(),
+        "Gás/Oléo": pa.string(),
+    }
+    return pa.schema([(nome, tipos[nome]) for nome in COLUNAS_DECODED])
+
+class GravadorParquet:
+    """
+    Grava RegistroGT06 em Parquet particionado por IMEI e data de inclusão
+
+    Os registros são acumulados por partição e convertidos em lote para um
+    RecordBatch Arrow, coluna a coluna, quando a partição atinge
+    tamanho_lote ou em flush()/fechar(). Cada lote vira um arquivo
+    {pasta}/imei={imei}/data={AAAA-MM-DD}/part-{execução}-{n}.parquet, no
+    layout de partições Hive lido por pyarrow.dataset e pandas.read_parquet.
+    Registros com data/hora de inclusão inválida (gravada como nula) ficam
+    na partição data=invalida.
+    """
+
+    def __init__(self, pasta, tamanho_lote=50000, compressao='zstd'):
+        self.esquema = esquema_decoded()
+        self.pasta = pasta
+        self.tamanho_lote = tamanho_lote
+        self.compressao = compressao
+        self.linhas_gravadas = 0
+        self._pendentes = defaultdict(list)
+        self._execucao = uuid.uuid4().hex[:12]
+        self._arquivos = 0
+
+    def escrever(self, imei, registro):
+        """Acrescenta um registro à partição do IMEI e da data de inclusão"""
+        inclusao = registro.data_hora_inclusao
+        # A partição usa a mesma interpretação de _lote, para a pasta e a coluna concordarem
+        if isinstance(inclusao, str):
+            inclusao = interpretar_data_hora(inclusao)
+        data = PARTICAO_INVALIDA if inclusao is None else inclusao.strftime("%Y-%m-%d")
+        pendentes = self._pendentes[(imei, data)]
+        pendentes.append(registro)
+        if len(pendentes) >= self.tamanho_lote:
+            self._gravar(imei, data)
+
+    def remover_imei(self, imei):
+        """Apaga a partição de um IMEI, antes de uma decodificação completa"""
+        self._pendentes = defaultdict(list, {chave: registros for chave, registros in self._pendentes.items()
+                                             if chave[0] != imei})
+        shutil.rmtree(os.path.join(self.pasta, f"imei={imei}"), ignore_errors=True)
+
+    def flush(self):
+        """Grava todos os lotes pendentes"""
+        for imei, data in list(self._pendentes):
+            self._gravar(imei, data)
+
+    def fechar(self):
+        self.flush()
+
+    def _lote(self, registros):
+        colunas = []
+        for nome, valores in zip(COLUNAS_DECODED, zip(*registros)):
+            tipo = self.esquema.field(nome).type
+            if nome == "Data/Hora Inclusão":
+                inclusao = pd.to_datetime(pd.Series(valores, dtype=object), format=FORMATO_DATA_HORA, errors='coerce')
+                colunas.append(pa.Array.from_pandas(inclusao, type=tipo))
+            else:
+                colunas.append(pa.array(valores, type=tipo))
+        return pa.RecordBatch.from_arrays(colunas, schema=self.esquema)
+
+    def _gravar(self, imei, data):
+        registros = self._pendentes.pop((imei, data), None)
+        if not registros:
+            return
+
+        pasta_particao = os.path.join(self.pasta, f"imei={imei}", f"data={data}")
+        os.makedirs(pasta_particao, exist_ok=True)
+        self._arquivos += 1
+        caminho = os.path.join(pasta_particao, f"part-{self._execucao}-{self._arquivos:05d}.parquet")
+
+        tabela = pa.Table.from_batches([self._lote(registros)])
+        pq.write_table(tabela, caminho, compression=self.compressao)
+        self.linhas_gravadas += len(registros)
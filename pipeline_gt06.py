@@ -0,0 +1,162 @@
+import os
+import csv
+import pandas as pd
+from decoder_gt06V4 import COLUNAS_DECODED, registro_nao_decodificado
+from recordMessages import (ler_mensagens_csv, decodificar_linha, imei_do_arquivo,
+                            record_registro_decoded, gerenciador_escrita)
+from analise_tempo import analisar_dataframe, montar_relatorio, salvar_analise
+from parquet_gt06 import GravadorParquet
+from metricas_gt06 import debug, registrar_erro
+from datas_gt06 import FORMATO_DATA_HORA, InterpretadorDataHora, converter_coluna, datas_invalidas
+
+def decodificar_log(input_file, file_imei, pasta_decoded=None, pasta_parquet=None):
+    """
+    Decodifica um log {imei}.csv direto para uma lista de RegistroGT06
+
+    Os registros vão para a análise sem passar pelo CSV decodificado. Com
+    pasta_decoded, o {imei}_decoded.csv também é gravado, no mesmo formato de
+    process_gt06_folder, como saída secundária; com pasta_parquet, os
+    registros são gravados em Parquet particionado por IMEI e data.
+    """
+    registros = []
+    output_file = None
+    if pasta_decoded:
+        os.makedirs(pasta_decoded, exist_ok=True)
+        output_file = os.path.join(pasta_decoded, f"{file_imei}_decoded.csv")
+
+    with open(input_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        colunas = next(reader, [])
+
+        # Verifica colunas obrigatórias
+        if 'lmsmensagem' not in colunas or 'lmsdatahorainc' not in colunas:
+            raise ValueError(f"Colunas obrigatórias não encontradas em {os.path.basename(input_file)}")
+
+        # Remove arquivo de saída se existir
+        if output_file:
+            gerenciador_escrita.fechar(output_file)
+            if os.path.exists(output_file):
+                os.remove(output_file)
+
+        gravador_parquet = None
+        if pasta_parquet:
+            gravador_parquet = GravadorParquet(pasta_parquet)
+            gravador_parquet.remover_imei(file_imei)
+
+        datas = InterpretadorDataHora()
+        try:
+            for mensagem, timestamp_inc in ler_mensagens_csv(reader, colunas):
+                try:
+                    linha = decodificar_linha(mensagem, timestamp_inc, file_imei, datas)
+                except Exception as e:
+                    registrar_erro(e, f"Erro ao processar linha: {e}")
+                    continue
+
+                if linha is None:
+                    continue
+
+                timestamp_inclusao, registro = linha
+                if registro is None:
+                    registro = registro_nao_decodificado(file_imei, timestamp_inclusao)
+                registros.append(registro)
+
+                if output_file:
+                    record_registro_decoded(file_imei, registro, pasta_decoded)
+                if gravador_parquet is not None:
+                    gravador_parquet.escrever(file_imei, registro)
+        finally:
+            if output_file:
+                gerenciador_escrita.fechar(output_file)
+            if gravador_parquet is not None:
+                gravador_parquet.fechar()
+
+    return registros
+
+def registros_para_dataframe(registros):
+    """
+    Monta o DataFrame da análise a partir dos registros, coluna a coluna
+
+    As colunas têm os nomes do CSV decodificado. Datas de evento chegam como
+    datetime, e a de inclusão é convertida uma única vez com formato fixo
+    (datas_gt06.converter_coluna, que conta as inválidas em datas_invalidas).
+    """
+    if not registros:
+        return pd.DataFrame(columns=list(COLUNAS_DECODED))
+
+    df = pd.DataFrame({nome: list(valores) for nome, valores in zip(COLUNAS_DECODED, zip(*registros))})
+    df["Data/Hora Inclusão"] = converter_coluna(df["Data/Hora Inclusão"], "Data/Hora Inclusão", FORMATO_DATA_HORA)
+    return df
+
+def processar_log(input_path, csv_file, pasta_analises, pasta_decoded=None, pasta_parquet=None):
+    """
+    Decodifica e analisa um log {imei}.csv em uma única etapa
+
+    Gera os mesmos analise_{imei}_decoded.txt/.csv de
+    analise_tempo.processar_pasta sem reler o CSV decodificado.
+
+    Returns:
+        bool: True se o arquivo foi processado com sucesso
+    """
+    debug(f"\n{'='*100}")
+    debug(f"🔍 PROCESSANDO: {csv_file}")
+    debug(f"{'='*100}")
+
+    try:
+        file_imei = imei_do_arquivo(csv_file)
+        registros = decodificar_log(os.path.join(input_path, csv_file), file_imei, pasta_decoded, pasta_parquet)
+        invalidas_antes = datas_invalidas["Data/Hora Inclusão"]
+        df = registros_para_dataframe(registros)
+        debug(f"✅ Arquivo decodificado: {len(df)} registros")
+        invalidas = datas_invalidas["Data/Hora Inclusão"] - invalidas_antes
+        if invalidas:
+            print(f"⚠️ {csv_file}: {invalidas} datas/horas sem formato conhecido (tratadas como vazias)")
+
+        analise = analisar_dataframe(df)
+        relatorio_txt = montar_relatorio(file_imei, len(df), analise)
+        salvar_analise(f"{file_imei}_decoded", relatorio_txt, analise['df_com_diffs'], pasta_analises)
+
+        debug(f"✅ Processamento concluído com sucesso!\n")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro ao processar arquivo: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def processar_pasta_pipeline(input_path, pasta_analises, pasta_decoded=None, pasta_parquet=None):
+    """
+    Decodifica e analisa todos os logs de uma pasta sem CSV intermediário
+
+    Args:
+        input_path: pasta com os arquivos {imei}.csv
+        pasta_analises: pasta onde serão salvos os relatórios
+        pasta_decoded: se informada, grava também os {imei}_decoded.csv
+        pasta_parquet: se informada, grava também Parquet por IMEI e data
+    """
+    if not os.path.isdir(input_path):
+        print(f"Erro: Pasta de entrada inválida: {input_path}")
+        return False
+
+    csv_files = sorted(f for f in os.listdir(input_path)
+                       if f.endswith('.csv') and not f.endswith('_decoded.csv'))
+
+    if not csv_files:
+        print("Aviso: Nenhum arquivo CSV encontrado na pasta")
+        return False
+
+    falhas = []
+    for i, csv_file in enumerate(csv_files, 1):
+        print(f"\n[{i}/{len(csv_files)}] Processando: {csv_file}")
+        if not processar_log(input_path, csv_file, pasta_analises, pasta_decoded, pasta_parquet):
+            falhas.append(csv_file)
+
+    print(f"Processamento concluído: {len(csv_files) - len(falhas)}/{len(csv_files)} arquivos processados")
+    if falhas:
+        print(f"Arquivos com erro ({len(falhas)}): {', '.join(falhas)}")
+    return True
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    processar_pasta_pipeline('Decoder_GT06/logs', 'Decoder_GT06/analises', pasta_decoded='Decoder_GT06/decoded')
@@ -1,16 +1,95 @@
-import datetime
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
+import csv
+import time
+import json
+import hashlib
+import atexit
+from collections import OrderedDict, Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 from decoder_gt06V4 import *
-from datetime import datetime, timedelta
+from parquet_gt06 import GravadorParquet
+from datas_gt06 import InterpretadorDataHora
+from metricas_gt06 import metricas, registrar_erro, bytes_saida
+
+CABECALHO_DECODED = ",".join(COLUNAS_DECODED) + "\n"
+
+class GerenciadorEscrita:
+    """
+    Pool de arquivos abertos para escrita em modo append
+
+    Mantém um handle bufferizado por arquivo em vez de abrir/fechar a cada
+    mensagem. O cabeçalho é gravado uma única vez, quando o arquivo ainda não
+    existe. Os buffers são descarregados quando enchem (tamanho_buffer) ou
+    quando passam intervalo_flush segundos sem flush. Quando há mais de
+    max_abertos arquivos, o menos usado recentemente é fechado.
+    """
+
+    def __init__(self, max_abertos=256, tamanho_buffer=64 * 1024, intervalo_flush=5.0):
+        self.max_abertos = max_abertos
+        self.tamanho_buffer = tamanho_buffer
+        self.intervalo_flush = intervalo_flush
+        self._abertos = OrderedDict()
+        self._ultimo_flush = time.monotonic()
+
+    def escrever(self, caminho, texto, cabecalho=None):
+        """Acrescenta texto ao arquivo, criando-o com o cabeçalho se necessário"""
+        arquivo = self._abertos.get(caminho)
+
+        if arquivo is None:
+            arquivo = self._abrir(caminho, cabecalho)
+        else:
+            self._abertos.move_to_end(caminho)
+
+        arquivo.write(texto)
+        bytes_saida['arquivo'] += len(texto)
+
+        agora = time.monotonic()
+        if agora - self._ultimo_flush >= self.intervalo_flush:
+            self.flush()
+            self._ultimo_flush = agora
+
+    def _abrir(self, caminho, cabecalho):
+        while len(self._abertos) >= self.max_abertos:
+            _, antigo = self._abertos.popitem(last=False)
+            antigo.close()
+
+        novo = cabecalho is not None and not os.path.exists(caminho)
+        arquivo = open(caminho, "a", encoding='utf-8', buffering=self.tamanho_buffer)
+        if novo:
+            arquivo.write(cabecalho)
+
+        self._abertos[caminho] = arquivo
+        return arquivo
+
+    def flush(self):
+        """Descarrega os buffers de todos os arquivos abertos"""
+        for arquivo in self._abertos.values():
+            arquivo.flush()
+
+    def fechar(self, caminho=None):
+        """Fecha um arquivo específico ou, sem argumento, todos os abertos"""
+        if caminho is None:
+            while self._abertos:
+                _, arquivo = self._abertos.popitem()
+                arquivo.close()
+        else:
+            arquivo = self._abertos.pop(caminho, None)
+            if arquivo is not None:
+                arquivo.close()
+
+    def __len__(self):
+        return len(self._abertos)
+
+# Gerenciador compartilhado pelas funções record_*; fecha tudo ao sair
+gerenciador_escrita = GerenciadorEscrita()
+atexit.register(gerenciador_escrita.fechar)
 
 def record_raw(file_name, source, msg):
     curr_time = datetime.now()
     date_time = curr_time.strftime("%Y-%m-%d %H:%M:%S,")
-    with open(file_name, "a+") as f:
-        f.write(date_time + source + ',' + msg + "\n")
-        f.close()
+    gerenciador_escrita.escrever(file_name, date_time + source + ',' + msg + "\n")
 
 def record_decoded_by_imei_with_timestamp(imei, msg, timestamp_inclusao=None):
 
@@ -18,45 +97,18 @@ def record_decoded_by_imei_with_timestamp(imei, msg, timestamp_inclusao=None):
     file_name = f"{imei}_decoded.csv"
     
     try:
-        # Verifica se o arquivo já existe
-        if os.path.exists(file_name):
-            # Se existe, apenas adiciona os dados
-            with open(file_name, "a+", encoding='utf-8') as d:
-                # Use o timestamp fornecido ou o atual
-                if timestamp_inclusao:
-                    date_time_inclusao = timestamp_inclusao
-                else:
-                    curr_time = datetime.now()
-                    date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-                
-                d.write(f"{date_time_inclusao},{msg}\n")
+        # Use o timestamp fornecido ou o atual
+        if timestamp_inclusao:
+            date_time_inclusao = timestamp_inclusao
         else:
-            # Se não existe, cria o arquivo com cabeçalho
-            # print(f"Criando novo arquivo de log para IMEI: {imei}")
-            with open(file_name, "w", encoding='utf-8') as d:
-                # Escreve o cabeçalho
-                d.write("Data/Hora Inclusão,Data/Hora Evento,IMEI,Sequência,"
-                        "Tipo Mensagem,Tipo Dispositivo,Versão Protocolo,Versão Firmware,"
-                        "Alimentação Externa,Bateria interna interna,Analog Input Status,"
-                        "Satélites,Duração da Ignição,"
-                        "Velocidade,Azimuth,Latitude,Longitude,MCC,MNC,LAC,Cell ID,Realtime positioning,GPS valido,"
-                        "Hodômetro Total,Horímetro Total,"
-                        "Tipo de Rede,Qualidade do sinal de GSM,Terminal information,Carregamento,Funcionamento,Alarmes internos,Rastramento,Gás/Oléo\n")
-                
-                # Adiciona o primeiro registro
-                # Use o timestamp fornecido ou o atual
-                if timestamp_inclusao:
-                    date_time_inclusao = timestamp_inclusao
-                else:
-                    curr_time = datetime.now()
-                    date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            curr_time = datetime.now()
+            date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
-                
-                d.write(f"{date_time_inclusao},{msg}\n")
+        # O cabeçalho é escrito apenas na criação do arquivo
+        gerenciador_escrita.escrever(file_name, f"{date_time_inclusao},{msg}\n", CABECALHO_DECODED)
                 
     except Exception as e:
-        print(f"Erro ao escrever no arquivo {file_name}: {e}")
+        registrar_erro(e, f"Erro ao escrever no arquivo {file_name}: {e}")
 
 def record_decoded_by_imei(imei, msg):
     """
@@ -73,92 +125,86 @@ def record_decoded(file_name, msg, imei=None, timestamp_inclusao=None):
         record_decoded_by_imei_with_timestamp(imei, msg, timestamp_inclusao)
         return
     
-    # Código original
-    try:
-        open(file_name, "r")
-        with open(file_name, "a+") as d:
-            # Use o timestamp fornecido ou o atual
-            if timestamp_inclusao:
-                date_time = timestamp_inclusao + ","
-            else:
-                curr_time = datetime.now()
-                date_time = curr_time.strftime("%Y-%m-%d %H:%M:%S,")
-            
-            d.write(date_time + msg + "\n")
-            d.close()
-    except:
-        # print("Arquivo não existe, um novo log será criado.")
-        with open(file_name, "a+") as d:
-            d.write("Data/Hora Inclusão,Data/Hora Evento,IMEI,Sequência,"
-                        "Tipo Mensagem,Tipo Dispositivo,Versão Protocolo,Versão Firmware,"
-                        "Alimentação Externa,Bateria interna interna,Analog Input Status,"
-                        "Satélites,Duração da Ignição,"
-                        "Velocidade,Azimuth,Latitude,Longitude,MCC,MNC,LAC,Cell ID,Realtime positioning,GPS valido,"
-                        "Hodômetro Total,Horímetro Total,"
-                        "Tipo de Rede,Qualidade do sinal de GSM,Terminal information,Carregamento,Funcionamento,Alarmes internos,Rastramento,Gás/Oléo\n")
-
-            # Use o timestamp fornecido ou o atual
-            if timestamp_inclusao:
-                date_time = timestamp_inclusao
-            else:
-                curr_time = datetime.now()
-                date_time = curr_time.strftime("%Y-%m-%d %H:%M:%S")
-            
-            d.write(f"{date_time},{msg}\n")
-            d.close()
+    # Use o timestamp fornecido ou o atual
+    if timestamp_inclusao:
+        date_time = timestamp_inclusao
+    else:
+        curr_time = datetime.now()
+        date_time = curr_time.strftime("%Y-%m-%d %H:%M:%S")
+    
+    gerenciador_escrita.escrever(file_name, f"{date_time},{msg}\n", CABECALHO_DECODED)
 
 
-def record_decoded_organized_with_timestamp(imei, msg, timestamp_inclusao=None):
+def record_decoded_organized_with_timestamp(imei, msg, timestamp_inclusao=None, pasta="Decoder_GT06/decoded"):
     """
-    Versão organizada que salva na pasta logs/ com timestamp personalizado
+    Versão organizada que salva na pasta de decodificados com timestamp personalizado
     """
-    # Garante que a pasta existe
-    
-    # Cria o nome do arquivo dentro da pasta logs
-    file_name = f"Decoder_GT06/decoded/{imei}_decoded.csv"
+    # Cria o nome do arquivo dentro da pasta de decodificados
+    file_name = os.path.join(pasta, f"{imei}_decoded.csv")
     
     try:
-        # Verifica se o arquivo já existe
-        if os.path.exists(file_name):
-            # Se existe, apenas adiciona os dados
-            with open(file_name, "a+", encoding='utf-8') as d:
-                # Use o timestamp fornecido ou o atual
-                if timestamp_inclusao:
-                    date_time_inclusao = timestamp_inclusao
-                else:
-                    curr_time = datetime.now()
-                    date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-                
-                d.write(f"{date_time_inclusao},{msg}\n")
+        # Use o timestamp fornecido ou o atual
+        if timestamp_inclusao:
+            date_time_inclusao = timestamp_inclusao
         else:
-            # Se não existe, cria o arquivo com cabeçalho
-            # print(f"Criando novo arquivo de log para IMEI: {imei} em {file_name}")
-            with open(file_name, "w", encoding='utf-8') as d:
-                # Escreve o cabeçalho
-                d.write("Data/Hora Inclusão,Data/Hora Evento,IMEI,Sequência,"
-                        "Tipo Mensagem,Tipo Dispositivo,Versão Protocolo,Versão Firmware,"
-                        "Alimentação Externa,Bateria interna interna,Analog Input Status,"
-                        "Satélites,Duração da Ignição,"
-                        "Velocidade,Azimuth,Latitude,Longitude,MCC,MNC,LAC,Cell ID,Realtime positioning,GPS valido,"
-                        "Hodômetro Total,Horímetro Total,"
-                        "Tipo de Rede,Qualidade do sinal de GSM,Terminal information,Carregamento,Funcionamento,Alarmes internos,Rastramento,Gás/Oléo\n")
-                
-                # Adiciona o primeiro registro
-                # Use o timestamp fornecido ou o atual
-                if timestamp_inclusao:
-                    date_time_inclusao = timestamp_inclusao
-                else:
-                    curr_time = datetime.now()
-                    date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            curr_time = datetime.now()
+            date_time_inclusao = curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
-                
-                d.write(f"{date_time_inclusao},{msg}\n")
+        # O cabeçalho é escrito apenas na criação do arquivo
+        gerenciador_escrita.escrever(file_name, f"{date_time_inclusao},{msg}\n", CABECALHO_DECODED)
                 
     except Exception as e:
-        print(f"Erro ao escrever no arquivo {file_name}: {e}")
-
+        registrar_erro(e, f"Erro ao escrever no arquivo {file_name}: {e}")
+
+def _texto_data_hora(valor):
+    """datetime no formato 'YYYY-MM-DD HH:MM:SS.mmm'; textos passam inalterados"""
+    if isinstance(valor, str):
+        return valor
+    return valor.isoformat(' ', 'milliseconds')
+
+def _texto_horimetro(segundos):
+    """Segundos de ignição ligada no formato 'DD-HH:MM:SS'"""
+    dias, resto = divmod(segundos, 86400)
+    horas, resto = divmod(resto, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{dias:02d}-{horas:02d}:{minutos:02d}:{segundos:02d}"
+
+# Formatação de cada campo do RegistroGT06 ao gravar o CSV decodificado
+FORMATADORES_CSV = (
+    _texto_data_hora, _texto_data_hora, str, str,
+    str, str, str, str,
+    "{:.2f}".format, str, str,
+    str, str,
+    str, str, "{:.6f}".format, "{:.6f}".format, "{:04X}".format, "{:02X}".format, "{:04X}".format, str, str, str,
+    str, _texto_horimetro,
+    "{:X}".format, "{:02X}".format, str, str, str, str, str, str,
+)
+
+def formatar_registro_csv(registro):
+    """Linha do CSV decodificado (sem quebra de linha) para um RegistroGT06"""
+    return ",".join(['' if valor is None else formatar(valor)
+                     for formatar, valor in zip(FORMATADORES_CSV, registro)])
+
+def record_registro_decoded(imei, registro, pasta="Decoder_GT06/decoded"):
+    """
+    Grava um RegistroGT06 no {imei}_decoded.csv da pasta de decodificados
 
+    A formatação dos campos acontece só aqui, e toda linha tem as mesmas
+    colunas do cabeçalho. Sem data/hora de inclusão no registro, usa o
+    horário atual.
+    """
+    file_name = os.path.join(pasta, f"{imei}_decoded.csv")
+    
+    try:
+        if registro.data_hora_inclusao is None:
+            curr_time = datetime.now()
+            registro = registro._replace(data_hora_inclusao=curr_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3])
+        
+        # O cabeçalho é escrito apenas na criação do arquivo
+        gerenciador_escrita.escrever(file_name, formatar_registro_csv(registro) + "\n", CABECALHO_DECODED)
+    
+    except Exception as e:
+        registrar_erro(e, f"Erro ao escrever no arquivo {file_name}: {e}")
 
 def record_combined_message_with_timestamp(file_name, direction, msg_type, hex_data, timestamp_inclusao=None):
     """Grava mensagem no arquivo combinado com timestamp personalizado"""
@@ -170,83 +216,14 @@ def record_combined_message_with_timestamp(file_name, direction, msg_type, hex_d
             curr_time = datetime.now()
             date_time = curr_time.strftime("%Y-%m-%d %H:%M:%S")
         
-        with open(file_name, "a+", encoding='utf-8') as f:
-            f.write(f"{date_time},{direction},{msg_type},{hex_data}\n")
+        gerenciador_escrita.escrever(file_name, f"{date_time},{direction},{msg_type},{hex_data}\n")
     except Exception as e:
-        print(f"Erro ao gravar mensagem combinada: {e}")
+        registrar_erro(e, f"Erro ao gravar mensagem combinada: {e}")
 
 def record_combined_message(file_name, direction, msg_type, hex_data):
     """Versão original mantida para compatibilidade"""
     record_combined_message_with_timestamp(file_name, direction, msg_type, hex_data, None)
 
-def hex_to_timestamp(hex_value):
-    hex_value = str(hex_value)
-
-    try:
-        if len(hex_value) == 12:
-            # Formato padrão: 6 bytes (YYMMDDHHMMSS)
-            year = 2000 + int(hex_value[0:2], 16)
-            month = int(hex_value[2:4], 16)
-            day = int(hex_value[4:6], 16)
-            hour = int(hex_value[6:8], 16)
-            minute = int(hex_value[8:10], 16)
-            second = int(hex_value[10:12], 16)
-
-        elif len(hex_value) == 14:
-            # Formato alternativo: 7 bytes (YYYYMMDDHHMMSS)
-            year = int(hex_value[0:4], 16)
-            month = int(hex_value[4:6], 16)
-            day = int(hex_value[6:8], 16)
-            hour = int(hex_value[8:10], 16)
-            minute = int(hex_value[10:12], 16)
-            second = int(hex_value[12:14], 16)
-
-        else:
-            # Formato inválido
-            raise ValueError("Tamanho inválido de string hexadecimal para data/hora.")
-
-        # Validação segura de data
-        dt = datetime(year, month, day, hour, minute, second)
-
-    except Exception:
-        # Fallback seguro
-        dt = datetime(2020, 1, 1, 0, 0, 0)
-
-    return dt
-
-def converter_para_brasil(dt_utc):
-    """
-    Converte uma data/hora UTC (string ou datetime) para o timezone do Brasil (UTC-3)
-    e retorna no formato 'YYYY-MM-DD HH:MM:SS.mmm' (com milissegundos).
-    """
-
-    # Se for string, tenta converter
-    if isinstance(dt_utc, str):
-        formatos = [
-            "%Y%m%d%H%M%S",        # 20250408223920
-            "%Y-%m-%d %H:%M:%S",   # 2025-04-08 22:39:20
-            "%y-%m-%d %H:%M:%S",   # 25-04-08 22:39:20
-            "%Y-%m-%d %H:%M:%S.%f" # 2025-04-08 22:39:20.123456
-        ]
-        for formato in formatos:
-            try:
-                dt_utc = datetime.strptime(dt_utc, formato)
-                break
-            except ValueError:
-                continue
-        else:
-            return f"Erro: Não foi possível converter '{dt_utc}' para datetime"
-
-    # Se ainda não for datetime, erro
-    if not isinstance(dt_utc, datetime):
-        return f"Erro: Tipo inválido para conversão ({type(dt_utc)})"
-
-    # Ajuste fuso horário UTC -> Brasil (UTC-3)
-    dt_brasil = dt_utc - timedelta(hours=3)
-
-    # Retorna com milissegundos
-    return dt_brasil.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
 def separar_partes_comando(command_string):
     # Verifica se existe o caracter ":" na string
     if ":" in command_string:
@@ -272,120 +249,379 @@ def separar_partes_comando(command_string):
         # Retorna erro se não encontrar ":"
         return False, "Comando não contém o caracter ':'", "", ""
 
-def process_gt06_folder(input_path, output_path):
+# Valores que o pandas.read_csv interpreta como NaN por padrão
+VALORES_NULOS_CSV = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null'
+])
+
+def ler_mensagens_csv(reader, colunas):
+    """
+    Percorre o csv.reader linha a linha, devolvendo (lmsmensagem, lmsdatahorainc)
+
+    Mantém memória constante independente do tamanho do arquivo. Linhas com
+    mensagem vazia ou nula são descartadas, como no dropna do modo pandas.
+    """
+    i_msg = colunas.index('lmsmensagem')
+    i_ts = colunas.index('lmsdatahorainc')
+
+    for row in reader:
+        mensagem = row[i_msg] if i_msg < len(row) else ''
+        if mensagem in VALORES_NULOS_CSV or mensagem.strip() == '':
+            continue
+
+        timestamp_inc = row[i_ts] if i_ts < len(row) else ''
+        if timestamp_inc in VALORES_NULOS_CSV:
+            timestamp_inc = 'nan'
+
+        yield mensagem, timestamp_inc
+
+def decodificar_linha(mensagem, timestamp_inc, file_imei, datas=None):
+    """
+    Decodifica uma linha do log (mensagem hex e data/hora de inclusão)
+
+    O frame é validado (hex, moldura, tamanho e CRC) antes de qualquer
+    decodificação; frames corrompidos são contados em frames_invalidos e
+    descartados sem passar pelo parser. A data/hora é normalizada por datas
+    (um InterpretadorDataHora por arquivo, que detecta o formato uma vez).
+
+    Returns:
+        tuple: (timestamp de inclusão formatado, RegistroGT06 ou None se o
+            protocolo não foi decodificado), ou None quando a linha não é um
+            frame GT06 válido
+    """
+    hex_data = str(mensagem).strip().strip('"\'')
     
-    # Cria pasta de saída se não existir
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
+    # Valida hexadecimal
+    try:
+        frame = bytes.fromhex(hex_data)
+    except ValueError:
+        frames_invalidos['hex'] += 1
+        return None
     
-    # Valida pasta de entrada
-    if not os.path.exists(input_path) or not os.path.isdir(input_path):
-        print(f"Erro: Pasta de entrada inválida: {input_path}")
-        return False
+    motivo = validar_frame(frame)
+    if motivo is not None:
+        frames_invalidos[motivo] += 1
+        return None
     
-    # Lista arquivos CSV
-    csv_files = [f for f in os.listdir(input_path) 
-                 if f.endswith('.csv') and not f.endswith('_decoded.csv')]
+    # Formata timestamp
+    if datas is None:
+        datas = InterpretadorDataHora()
+    formatted_timestamp = datas.normalizar(timestamp_inc)
     
-    if not csv_files:
-        print("Aviso: Nenhum arquivo CSV encontrado na pasta")
-        return False
+    # Frame já validado: o parser não repete a conferência do CRC
+    return formatted_timestamp, parser_gt06V4_bytes(frame, file_imei, formatted_timestamp, validar=False)
+
+def _processar_linha(mensagem, timestamp_inc, file_imei, pasta_saida, gravador_parquet=None, datas=None):
+    """Decodifica uma linha do log e grava o resultado no arquivo do IMEI (e no Parquet, se houver)"""
+    try:
+        linha = decodificar_linha(mensagem, timestamp_inc, file_imei, datas)
+        if linha is None:
+            return
+        
+        formatted_timestamp, registro = linha
+        
+        # Se não retornou dados válidos, grava uma entrada básica
+        if registro is None:
+            registro = registro_nao_decodificado(file_imei, formatted_timestamp)
+        
+        record_registro_decoded(file_imei, registro, pasta_saida)
+        if gravador_parquet is not None:
+            gravador_parquet.escrever(file_imei, registro)
     
-    total_files = len(csv_files)
-    processed_files = 0
+    except Exception as e:
+        registrar_erro(e, f"Erro ao processar linha: {e}")
+
+class LeitorIncremental:
+    """
+    Itera as linhas completas de um arquivo binário a partir de um offset
+
+    Mantém em self.offset a posição logo após a última linha entregue. Uma
+    linha final sem quebra de linha é tratada como ainda em gravação e fica
+    para a próxima execução.
+    """
+
+    def __init__(self, f, offset):
+        self.f = f
+        self.offset = offset
+        f.seek(offset)
+
+    def __iter__(self):
+        for linha in self.f:
+            if not linha.endswith(b'\n'):
+                break
+            self.offset += len(linha)
+            yield linha.decode('utf-8')
+
+def assinatura_arquivo(f, offset):
+    """Hash do início do arquivo e dos 4 KB anteriores ao offset, para detectar troca ou truncamento"""
+    sha = hashlib.sha1()
+    f.seek(0)
+    sha.update(f.read(min(offset, 64 * 1024)))
+    inicio_janela = max(0, offset - 4096)
+    f.seek(inicio_janela)
+    sha.update(f.read(offset - inicio_janela))
+    return sha.hexdigest()
+
+def carregar_checkpoint(checkpoint_file):
+    try:
+        with open(checkpoint_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def salvar_checkpoint(checkpoint_file, checkpoint):
+    temporario = checkpoint_file + ".tmp"
+    with open(temporario, "w", encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(temporario, checkpoint_file)
+
+def _decodificar_incremental(input_file, output_file, checkpoint_file, file_imei, output_path, resultado,
+                             gravador_parquet=None):
+    """Decodifica só as linhas acrescentadas ao log desde o último checkpoint"""
+    with open(input_file, 'rb') as f:
+        cabecalho = f.readline()
+        colunas = next(csv.reader([cabecalho.decode('utf-8')]), [])
+        
+        # Verifica colunas obrigatórias
+        if 'lmsmensagem' not in colunas or 'lmsdatahorainc' not in colunas:
+            resultado['erro'] = f"Erro: Colunas obrigatórias não encontradas em {os.path.basename(input_file)}"
+            return
+        
+        tamanho = os.fstat(f.fileno()).st_size
+        checkpoint = carregar_checkpoint(checkpoint_file)
+        offset = len(cabecalho)
+        ultimo_timestamp = None
+        
+        # O checkpoint só vale se o início do arquivo não mudou e a saída ainda existe
+        if (checkpoint and checkpoint.get('offset', 0) <= tamanho
+                and os.path.exists(output_file)
+                and assinatura_arquivo(f, checkpoint['offset']) == checkpoint.get('assinatura')):
+            offset = checkpoint['offset']
+            ultimo_timestamp = checkpoint.get('ultimo_lmsdatahorainc')
+            resultado['retomado'] = True
+        else:
+            # Remove arquivo de saída se existir
+            gerenciador_escrita.fechar(output_file)
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            if gravador_parquet is not None:
+                gravador_parquet.remover_imei(file_imei)
+        
+        leitor = LeitorIncremental(f, offset)
+        datas = InterpretadorDataHora()
+        linhas_novas = 0
+        for mensagem, timestamp_inc in ler_mensagens_csv(csv.reader(leitor), colunas):
+            _processar_linha(mensagem, timestamp_inc, file_imei, output_path, gravador_parquet, datas)
+            ultimo_timestamp = timestamp_inc
+            linhas_novas += 1
+        
+        # O checkpoint só é gravado depois que os dados chegaram ao disco
+        gerenciador_escrita.fechar(output_file)
+        if gravador_parquet is not None:
+            gravador_parquet.flush()
+        salvar_checkpoint(checkpoint_file, {
+            'arquivo': os.path.basename(input_file),
+            'offset': leitor.offset,
+            'assinatura': assinatura_arquivo(f, leitor.offset),
+            'ultimo_lmsdatahorainc': ultimo_timestamp,
+        })
+        resultado['linhas_novas'] = linhas_novas
+        resultado['sucesso'] = True
+
+def imei_do_arquivo(csv_file):
+    """IMEI a partir do nome do log {imei}.csv, sem o zero à esquerda"""
+    file_imei = os.path.splitext(csv_file)[0]
+    
+    # Remove zero à esquerda se existir
+    if file_imei.startswith('0') and len(file_imei) == 16:
+        file_imei = file_imei[1:]
     
-    # Processa cada arquivo CSV
-    for csv_file in csv_files:
-        input_file = os.path.join(input_path, csv_file)
-        file_imei = os.path.splitext(csv_file)[0]
+    return file_imei
+
+def processar_arquivo_gt06(input_path, csv_file, output_path, streaming=True, incremental=False, pasta_parquet=None):
+    """
+    Decodifica um único log {imei}.csv para {imei}_decoded.csv
+
+    Cada arquivo é independente, por isso esta função também é usada como
+    tarefa dos workers no modo paralelo de process_gt06_folder. No modo
+    incremental, o offset já decodificado fica em
+    {imei}_decoded.checkpoint.json e apenas as linhas novas são acrescentadas.
+    Com pasta_parquet, os registros também são gravados em Parquet
+    particionado por IMEI e data (ver parquet_gt06.GravadorParquet).
+
+    Returns:
+        dict: arquivo de entrada, arquivo de saída, sucesso e mensagem de erro
+    """
+    input_file = os.path.join(input_path, csv_file)
+    file_imei = imei_do_arquivo(csv_file)
+    
+    output_file = os.path.join(output_path, f"{file_imei}_decoded.csv")
+    checkpoint_file = os.path.join(output_path, f"{file_imei}_decoded.checkpoint.json")
+    resultado = {'arquivo': csv_file, 'saida': output_file, 'sucesso': False, 'erro': None}
+    gravador_parquet = None
+    datas = InterpretadorDataHora()
+    metricas_antes = metricas.instantaneo()
+    
+    try:
+        if pasta_parquet:
+            gravador_parquet = GravadorParquet(pasta_parquet)
         
-        # Remove zero à esquerda se existir
-        if file_imei.startswith('0') and len(file_imei) == 16:
-            file_imei = file_imei[1:]
+        if incremental:
+            _decodificar_incremental(input_file, output_file, checkpoint_file, file_imei, output_path, resultado,
+                                     gravador_parquet)
+            return resultado
         
-        output_file = os.path.join(output_path, f"{file_imei}_decoded.csv")
+        # Uma decodificação completa invalida o checkpoint anterior
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        if gravador_parquet is not None:
+            gravador_parquet.remover_imei(file_imei)
         
-        try:
+        if streaming:
+            with open(input_file, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                colunas = next(reader, [])
+                
+                # Verifica colunas obrigatórias
+                if 'lmsmensagem' not in colunas or 'lmsdatahorainc' not in colunas:
+                    resultado['erro'] = f"Erro: Colunas obrigatórias não encontradas em {csv_file}"
+                    return resultado
+                
+                # Remove arquivo de saída se existir
+                gerenciador_escrita.fechar(output_file)
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                
+                # Processa cada linha sem carregar o arquivo em memória
+                for mensagem, timestamp_inc in ler_mensagens_csv(reader, colunas):
+                    _processar_linha(mensagem, timestamp_inc, file_imei, output_path, gravador_parquet, datas)
+        else:
             # Lê o arquivo CSV
             df = pd.read_csv(input_file)
             
             # Verifica colunas obrigatórias
             if 'lmsmensagem' not in df.columns or 'lmsdatahorainc' not in df.columns:
-                print(f"Erro: Colunas obrigatórias não encontradas em {csv_file}")
-                continue
+                resultado['erro'] = f"Erro: Colunas obrigatórias não encontradas em {csv_file}"
+                return resultado
             
             # Remove linhas vazias
             df_clean = df.dropna(subset=['lmsmensagem'])
             df_clean = df_clean[df_clean['lmsmensagem'].str.strip() != '']
             
-            total_rows = len(df)
-            valid_rows = len(df_clean)
-            
             # Remove arquivo de saída se existir
+            gerenciador_escrita.fechar(output_file)
             if os.path.exists(output_file):
                 os.remove(output_file)
             
             # Processa cada linha
-            for index, row in df_clean.iterrows():
-                try:
-                    hex_message = str(row['lmsmensagem']).strip().strip('"\'')
-                    timestamp_inc = str(row['lmsdatahorainc']).strip()
-                    hex_data = hex_message.replace(" ", "").upper()
-                    
-                    # Valida hexadecimal
-                    if not (hex_data and len(hex_data) % 2 == 0):
-                        try:
-                            int(hex_data, 16)
-                        except ValueError:
-                            continue
-                    
-                    # Formata timestamp
-                    formatted_timestamp = timestamp_inc
-                    for fmt in ["%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", 
-                               "%d/%m/%Y %H:%M:%S", "%Y/%m/%d %H:%M:%S"]:
-                        try:
-                            dt = datetime.strptime(timestamp_inc, fmt)
-                            formatted_timestamp = dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                            break
-                        except ValueError:
-                            continue
-                    
-                    # Analisa mensagem usando o parser
-                    if hex_data.startswith("7878") and hex_data.endswith("0D0A"):
-                        try:
-                            # Chama o parser para processar a mensagem
-                            result = parser_gt06V4(hex_data, file_imei, formatted_timestamp)
-                            
-                            # CORREÇÃO: Extrai a string 'dados' do dicionário retornado pelo parser
-                            if result and 'dados' in result:
-                                dados_string = result['dados']
-                                
-                                # Grava usando a função organizada
-                                record_decoded_organized_with_timestamp(file_imei, dados_string, formatted_timestamp)
-                            else:
-                                # Se não retornou dados válidos, cria uma entrada básica
-                                dados_basicos = f",{file_imei},,,Protocolo não decodificado,,,,,,,,,,,,,,,,,,,,,,,"
-                                record_decoded_organized_with_timestamp(file_imei, dados_basicos, formatted_timestamp)
-                                
-                        except Exception as e:
-                            print(f"Erro no parser para mensagem {hex_data}: {e}")
-                            # Em caso de erro, grava uma entrada de erro
-                            dados_erro = f",{file_imei},,,Erro no parser: {str(e)},,,,,,,,,,,,,,,,,,,,,,,"
-                            record_decoded_organized_with_timestamp(file_imei, dados_erro, formatted_timestamp)
-                            continue
-                
-                except Exception as e:
-                    print(f"Erro ao processar linha: {e}")
-                    continue
-            
-            processed_files += 1
-            print(f"Processado: {csv_file} -> {os.path.basename(output_file)}")
+            for mensagem, timestamp_inc in zip(df_clean['lmsmensagem'], df_clean['lmsdatahorainc']):
+                _processar_linha(mensagem, timestamp_inc, file_imei, output_path, gravador_parquet, datas)
         
-        except Exception as e:
-            print(f"Erro ao processar {csv_file}: {e}")
-    print("Processamento concluído")
+        resultado['sucesso'] = True
+    
+    except Exception as e:
+        resultado['erro'] = f"Erro ao processar {csv_file}: {e}"
+    
+    finally:
+        # Descarrega o arquivo decodificado antes de seguir para o próximo
+        gerenciador_escrita.fechar(output_file)
+        if gravador_parquet is not None:
+            gravador_parquet.fechar()
+        # Métricas do arquivo, para o resumo (e para somar as dos processos do pool)
+        resultado['metricas'] = metricas.diferenca(metricas_antes)
+
+    return resultado
+
+def process_gt06_folder(input_path, output_path, streaming=True, workers=1, incremental=False, pasta_parquet=None,
+                        arquivo_metricas=None):
+    """
+    Decodifica todos os logs CSV de uma pasta
+
+    Args:
+        input_path: pasta com os arquivos {imei}.csv
+        output_path: pasta onde serão gravados os {imei}_decoded.csv
+        streaming: lê o CSV linha a linha com memória constante; se False,
+            carrega o arquivo inteiro com pandas
+        workers: número de processos; com mais de 1, os arquivos são
+            distribuídos em um pool de processos (None usa todos os núcleos)
+        incremental: decodifica apenas as linhas novas desde a última
+            execução, a partir do checkpoint de cada arquivo (sempre lê em
+            streaming)
+        pasta_parquet: se informada, grava também Parquet particionado por
+            IMEI e data (requer pyarrow)
+        arquivo_metricas: se informado, grava ao final as métricas
+            (metricas_gt06) no formato texto do Prometheus
+    """
+    
+    # Cria pasta de saída se não existir
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    
+    # Valida pasta de entrada
+    if not os.path.exists(input_path) or not os.path.isdir(input_path):
+        print(f"Erro: Pasta de entrada inválida: {input_path}")
+        return False
+    
+    # Lista arquivos CSV
+    csv_files = sorted(f for f in os.listdir(input_path) 
+                       if f.endswith('.csv') and not f.endswith('_decoded.csv'))
+    
+    if not csv_files:
+        print("Aviso: Nenhum arquivo CSV encontrado na pasta")
+        return False
+    
+    total_files = len(csv_files)
+    resultados = []
 
-    # print(f"Processamento concluído: {processed_files}/{total_files} arquivos processados")
+    def registrar(resultado):
+        resultados.append(resultado)
+        if resultado['sucesso']:
+            print(f"[{len(resultados)}/{total_files}] Processado: {resultado['arquivo']} -> {os.path.basename(resultado['saida'])}")
+        else:
+            print(f"[{len(resultados)}/{total_files}] {resultado['erro']}")
+    
+    if workers is None or workers > 1:
+        # Processa os arquivos em paralelo, um arquivo por tarefa
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tarefas = [executor.submit(processar_arquivo_gt06, input_path, csv_file, output_path, streaming, incremental,
+                                       pasta_parquet)
+                       for csv_file in csv_files]
+            for tarefa in as_completed(tarefas):
+                resultado = tarefa.result()
+                metricas.mesclar(resultado['metricas'])
+                registrar(resultado)
+    else:
+        # Processa cada arquivo CSV
+        for csv_file in csv_files:
+            registrar(processar_arquivo_gt06(input_path, csv_file, output_path, streaming, incremental, pasta_parquet))
+
+    # Resumo final em ordem de arquivo, independente da ordem de conclusão
+    falhas = sorted(r['arquivo'] for r in resultados if not r['sucesso'])
+    processed_files = total_files - len(falhas)
+
+    invalidos = Counter()
+    erros_arquivos = Counter()
+    datas_invalidas = Counter()
+    for resultado in resultados:
+        invalidos.update(resultado['metricas']['contadores']['gt06_frames_invalidos_total'])
+        erros_arquivos.update(resultado['metricas']['contadores']['gt06_erros_total'])
+        datas_invalidas.update(resultado['metricas']['contadores']['gt06_datas_invalidas_total'])
+
+    print(f"Processamento concluído: {processed_files}/{total_files} arquivos processados")
+    if invalidos:
+        detalhes = ', '.join(f"{motivo}: {total}" for motivo, total in invalidos.most_common())
+        print(f"Frames inválidos descartados: {sum(invalidos.values())} ({detalhes})")
+    if datas_invalidas:
+        print(f"Datas/horas de inclusão sem formato conhecido (mantidas como no log): {sum(datas_invalidas.values())}")
+    if erros_arquivos:
+        detalhes = ', '.join(f"{classe}: {total}" for classe, total in erros_arquivos.most_common())
+        print(f"Erros durante a decodificação: {sum(erros_arquivos.values())} ({detalhes}; GT06_DEBUG=1 para detalhes)")
+    if falhas:
+        print(f"Arquivos com erro ({len(falhas)}): {', '.join(falhas)}")
+    if arquivo_metricas:
+        metricas.salvar_prometheus(arquivo_metricas)
     return True
 
 
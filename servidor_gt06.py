@@ -0,0 +1,325 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decoder_gt06V4 import parser_gt06V4_bytes, crc_itu, registro_nao_decodificado, validar_frame, frames_invalidos
+from recordMessages import record_registro_decoded, gerenciador_escrita
+from metricas_gt06 import metricas, bytes_saida, registrar_erro
+
+# Protocolos que o dispositivo espera ver confirmados pelo servidor
+PROTOCOLOS_COM_ACK = frozenset([0x01, 0x13, 0x16, 0x26])
+
+INICIO_CURTO = b'\x78\x78'
+INICIO_LONGO = b'\x79\x79'
+FIM_FRAME = b'\x0d\x0a'
+
+# Registros por ida à thread de gravação
+LOTE_GRAVACAO = 1000
+
+bytes_recebidos = metricas.contador("gt06_bytes_recebidos_total", "Bytes lidos dos sockets do servidor")
+
+class ExtratorFrames:
+    """
+    Separa frames GT06 de um fluxo TCP
+
+    Os bytes recebidos são acumulados em um buffer e devolvidos como frames
+    completos (0x7878 ... 0x0D0A ou 0x7979 ... 0x0D0A), independente de como
+    chegaram: um frame dividido em várias leituras ou vários frames na mesma
+    leitura. Lixo entre frames é descartado até o próximo start bit.
+    """
+    __slots__ = ('_buffer', 'max_buffer', 'descartados')
+
+    def __init__(self, max_buffer=4096):
+        self._buffer = bytearray()
+        self.max_buffer = max_buffer
+        self.descartados = 0
+
+    def extrair(self, dados):
+        """Acrescenta os bytes recebidos e retorna a lista de frames completos"""
+        buffer = self._buffer
+        buffer += dados
+        frames = []
+        inicio = 0
+        tamanho = len(buffer)
+
+        while tamanho - inicio >= 2:
+            marcador = buffer[inicio:inicio + 2]
+
+            if marcador == INICIO_CURTO:
+                if tamanho - inicio < 3:
+                    break
+                total = buffer[inicio + 2] + 5
+            elif marcador == INICIO_LONGO:
+                if tamanho - inicio < 4:
+                    break
+                total = (buffer[inicio + 2] << 8 | buffer[inicio + 3]) + 6
+            else:
+                inicio = self._proximo_inicio(inicio + 1)
+                continue
+
+            if tamanho - inicio < total:
+                break
+
+            if buffer[inicio + total - 2:inicio + total] != FIM_FRAME:
+                # Tamanho não bate com o stop bit: procura o próximo frame
+                inicio = self._proximo_inicio(inicio + 1)
+                continue
+
+            frames.append(bytes(buffer[inicio:inicio + total]))
+            inicio += total
+
+        del buffer[:inicio]
+
+        if len(buffer) > self.max_buffer:
+            self.descartados += len(buffer)
+            buffer.clear()
+
+        return frames
+
+    def _proximo_inicio(self, posicao):
+        buffer = self._buffer
+        candidatos = [p for p in (buffer.find(INICIO_CURTO, posicao), buffer.find(INICIO_LONGO, posicao)) if p >= 0]
+        if candidatos:
+            proximo = min(candidatos)
+        else:
+            # Mantém o último byte, que pode ser a primeira metade de um start bit
+            proximo = max(len(buffer) - 1, posicao)
+        self.descartados += proximo - posicao + 1
+        return proximo
+
+def protocolo_do_frame(frame):
+    """Número do protocolo: byte 3 no frame 0x7878, byte 4 no 0x7979 (tamanho de 2 bytes)"""
+    return frame[3] if frame[0] == 0x78 else frame[4]
+
+def montar_resposta(protocolo, serial):
+    """Monta o ACK 0x7878 05 <protocolo> <serial> <crc> 0x0D0A"""
+    corpo = bytes((0x05, protocolo)) + serial
+    return INICIO_CURTO + corpo + crc_itu(corpo).to_bytes(2, 'big') + FIM_FRAME
+
+class ServidorGT06:
+    """
+    Servidor TCP asyncio para dispositivos GT06 conectados ao vivo
+
+    Cada conexão tem apenas um ExtratorFrames e o IMEI informado no login, o
+    que permite manter dezenas de milhares de sockets ociosos em um processo.
+    Os frames são decodificados com parser_gt06V4_bytes e gravados nos
+    arquivos por IMEI, no mesmo formato de process_gt06_folder.
+
+    A gravação não roda no event loop: os registros entram em uma fila que
+    uma tarefa descarrega em lotes numa thread dedicada, a única que usa o
+    gerenciador_escrita (aberturas, despejos do LRU e flushes). Quando a
+    fila passa de limite_fila registros, as conexões param de ler até a
+    gravação alcançar, e o TCP segura os dispositivos.
+
+    Com intervalo_metricas, as métricas (metricas_gt06) são gravadas a cada
+    intervalo em arquivo_metricas no formato Prometheus ou, sem arquivo,
+    impressas como resumo no console.
+    """
+
+    def __init__(self, host='0.0.0.0', port=5023, pasta_saida='Decoder_GT06/decoded',
+                 timeout_ocioso=None, intervalo_flush=5.0, backlog=4096,
+                 intervalo_metricas=None, arquivo_metricas=None, limite_fila=100000):
+        self.host = host
+        self.port = port
+        self.pasta_saida = pasta_saida
+        self.timeout_ocioso = timeout_ocioso
+        self.intervalo_flush = intervalo_flush
+        self.backlog = backlog
+        self.intervalo_metricas = intervalo_metricas
+        self.arquivo_metricas = arquivo_metricas
+        self.limite_fila = limite_fila
+        self.conexoes_ativas = 0
+        self.frames_recebidos = 0
+        self._servidor = None
+        self._fila = None
+        self._gravacao = None
+        self._executor = None
+
+    async def iniciar(self):
+        """Inicia a gravação, abre o socket de escuta e retorna o asyncio.Server"""
+        os.makedirs(self.pasta_saida, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gt06-gravacao")
+        self._fila = asyncio.Queue()
+        self._gravacao = asyncio.create_task(self._gravar_fila())
+        self._servidor = await asyncio.start_server(
+            self._atender, self.host, self.port, backlog=self.backlog)
+        self.port = self._servidor.sockets[0].getsockname()[1]
+        return self._servidor
+
+    async def executar(self):
+        """Inicia o servidor e atende conexões até ser cancelado"""
+        servidor = await self.iniciar()
+        tarefas = [asyncio.create_task(self._flush_periodico())]
+        if self.intervalo_metricas:
+            tarefas.append(asyncio.create_task(self._metricas_periodicas()))
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await self.parar()
+
+    async def parar(self):
+        """Para de aceitar conexões, grava o que restou na fila e fecha os arquivos"""
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        if self._gravacao is None:
+            return
+        await self._fila.join()
+        self._gravacao.cancel()
+        await asyncio.get_running_loop().run_in_executor(self._executor, gerenciador_escrita.fechar)
+        self._executor.shutdown()
+        self._gravacao = None
+
+    async def _gravar_fila(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._fila.get()]
+            while len(lote) < LOTE_GRAVACAO and not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+            try:
+                await loop.run_in_executor(self._executor, self._gravar_lote, lote)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+    def _gravar_lote(self, lote):
+        # Roda na thread de gravação
+        for imei, registro in lote:
+            try:
+                record_registro_decoded(imei, registro, self.pasta_saida)
+            except Exception as e:
+                registrar_erro(e, f"Erro ao gravar registro de {imei}: {e}")
+
+    async def _flush_periodico(self):
+        # Sem mensagens novas o gerenciador não dispara o flush por tempo
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.intervalo_flush)
+            await loop.run_in_executor(self._executor, gerenciador_escrita.flush)
+
+    async def _metricas_periodicas(self):
+        while True:
+            await asyncio.sleep(self.intervalo_metricas)
+            if self.arquivo_metricas:
+                metricas.salvar_prometheus(self.arquivo_metricas)
+            else:
+                print(f"Conexões ativas: {self.conexoes_ativas}, frames recebidos: {self.frames_recebidos}")
+                print(metricas.texto_resumo())
+
+    async def _atender(self, reader, writer):
+        extrator = ExtratorFrames()
+        imei = None
+        self.conexoes_ativas += 1
+
+        try:
+            while True:
+                if self.timeout_ocioso:
+                    dados = await asyncio.wait_for(reader.read(1024), self.timeout_ocioso)
+                else:
+                    dados = await reader.read(1024)
+                if not dados:
+                    break
+                bytes_recebidos[None] += len(dados)
+
+                for frame in extrator.extrair(dados):
+                    imei = self.processar_frame(frame, imei, writer)
+
+                await writer.drain()
+
+                # Fila cheia: para de ler até a thread de gravação alcançar
+                if self._fila.qsize() >= self.limite_fila:
+                    await self._fila.join()
+
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+        except OSError as e:
+            registrar_erro(e, f"Erro de E/S na conexão: {e}")
+
+        finally:
+            self.conexoes_ativas -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def processar_frame(self, frame, imei, writer=None):
+        """Responde o ACK, decodifica e enfileira a gravação de um frame; retorna o IMEI da conexão"""
+        self.frames_recebidos += 1
+
+        # Frame corrompido não é confirmado: o dispositivo reenvia
+        motivo = validar_frame(frame)
+        if motivo is not None:
+            frames_invalidos[motivo] += 1
+            return imei
+
+        protocolo = protocolo_do_frame(frame)
+
+        if writer is not None and protocolo in PROTOCOLOS_COM_ACK:
+            resposta = montar_resposta(protocolo, frame[-6:-4])
+            writer.write(resposta)
+            bytes_saida['ack'] += len(resposta)
+
+        timestamp_inclusao = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        registro = parser_gt06V4_bytes(frame, imei, timestamp_inclusao, validar=False)
+        if registro and protocolo == 0x01:
+            imei = registro.imei
+
+        # Antes do login não há IMEI para nomear o arquivo
+        if imei is None:
+            return imei
+
+        if registro is None:
+            registro = registro_nao_decodificado(imei, timestamp_inclusao)
+        self._fila.put_nowait((imei, registro))
+
+        return imei
+
+async def simular_dispositivo(host, port, frames, tamanho_pedaco=None, timeout=5.0):
+    """
+    Cliente de teste que se comporta como um dispositivo GT06
+
+    Envia os frames (bytes) em pedaços de tamanho_pedaco bytes, para exercitar
+    leituras parciais e agrupadas no servidor, e retorna os ACKs recebidos.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    fluxo = b''.join(frames)
+    passo = tamanho_pedaco or len(fluxo)
+
+    for i in range(0, len(fluxo), passo):
+        writer.write(fluxo[i:i + passo])
+        await writer.drain()
+
+    # O servidor só confirma frames válidos de protocolos com ACK
+    esperados = sum(1 for frame in frames
+                    if validar_frame(frame) is None and protocolo_do_frame(frame) in PROTOCOLOS_COM_ACK)
+    extrator = ExtratorFrames()
+    respostas = []
+
+    try:
+        while len(respostas) < esperados:
+            dados = await asyncio.wait_for(reader.read(1024), timeout)
+            if not dados:
+                break
+            respostas.extend(extrator.extrair(dados))
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    return respostas
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    servidor = ServidorGT06(port=5023, pasta_saida='Decoder_GT06/decoded')
+    try:
+        asyncio.run(servidor.executar())
+    except KeyboardInterrupt:
+        pass